@@ -1,6 +1,9 @@
 from flask import Flask, jsonify
 from app.api import register_blueprints
+from app.services.container import ServiceContainer
+from app.utils.access_log import register_access_log
 from app.utils.error_handlers import register_error_handlers
+from app.utils.rate_limiting import register_rate_limiting
 
 def create_app(config=None):
 
@@ -21,9 +24,19 @@ def create_app(config=None):
     if config:
         app.config.update(config)
 
+    services = app.config.get('SERVICES') or ServiceContainer(app.config)
+    app.extensions['api_membership'] = services
+    if app.config.get('PREFORK'):
+        from app.utils.prefork import warm_start
+        warm_start(services)
+
     register_blueprints(app)
 
     register_error_handlers(app)
 
+    register_access_log(app)
+
+    register_rate_limiting(app)
+
 
     return app
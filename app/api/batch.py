@@ -0,0 +1,152 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask
+
+from app.api.schemas import SubRequestBody
+from app.api.serializers import api_response
+
+DEFAULT_BATCH_MAX_REQUESTS = 50
+DEFAULT_BATCH_MAX_WORKERS = 4
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+_executor_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SubRequest:
+    """
+    Represents one call of a batch.
+
+    Attributes:
+        method: HTTP method
+        path: Absolute path of the route, query string included
+        body: JSON body, if any
+        headers: Request headers, as sorted (name, value) pairs
+    """
+
+    method: str
+    path: str
+    body: Optional[Dict] = None
+    headers: Tuple[Tuple[str, str], ...] = ()
+
+    @property
+    def is_read(self) -> bool:
+        return self.method in READ_METHODS
+
+
+def parse_sub_requests(items: List[SubRequestBody], batch_path: str, max_requests: int) -> List[SubRequest]:
+    """
+    Checks the validated sub-requests of a batch against the batch limits.
+
+    Args:
+        items: The 'requests' of the batch body
+        batch_path: Path of the batch endpoint, which sub-requests can't target
+        max_requests: Maximum number of sub-requests
+
+    Returns:
+        The sub-requests, in order
+
+    Raises:
+        ValueError: If there are too many sub-requests or one targets the batch endpoint
+    """
+    if len(items) > max_requests:
+        raise ValueError(f"A batch can't contain more than {max_requests} requests")
+
+    sub_requests = []
+    for index, item in enumerate(items):
+        if item.path.split('?', 1)[0].rstrip('/') == batch_path.rstrip('/'):
+            raise ValueError(f"Request {index} can't target the batch endpoint")
+        sub_requests.append(SubRequest(
+            method=item.method,
+            path=item.path,
+            body=item.body,
+            headers=tuple(sorted(item.headers.items()))
+        ))
+    return sub_requests
+
+
+def dispatch_sub_request(app: Flask, sub_request: SubRequest) -> Dict:
+    """
+    Runs a sub-request through the app's routing, hooks and error handlers,
+    without going through WSGI.
+
+    Returns:
+        The status code and JSON body of the response
+    """
+    with app.app_context(), app.test_request_context(sub_request.path, method=sub_request.method,
+                                                     json=sub_request.body,
+                                                     headers=list(sub_request.headers)):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as error:
+            response = app.make_response(api_response(message=f"Internal server error: {error}",
+                                                      success=False, status_code=500))
+        if response.is_streamed:
+            response.close()
+            return {
+                "status": 400,
+                "body": {"success": False, "message": "Streaming responses are not supported in a batch"}
+            }
+        body = response.get_json(silent=True)
+        if body is None and response.data:
+            body = response.get_data(as_text=True)
+        return {"status": response.status_code, "body": body}
+
+
+def _get_executor(app: Flask) -> ThreadPoolExecutor:
+    """Returns the thread pool of the app, created on first use."""
+    executor = app.extensions.get('batch_executor')
+    if executor is None:
+        with _executor_lock:
+            executor = app.extensions.get('batch_executor')
+            if executor is None:
+                executor = app.extensions['batch_executor'] = ThreadPoolExecutor(
+                    max_workers=app.config.get('BATCH_MAX_WORKERS', DEFAULT_BATCH_MAX_WORKERS),
+                    thread_name_prefix="batch"
+                )
+    return executor
+
+
+def execute_batch(app: Flask, sub_requests: List[SubRequest], parallel: bool = False) -> List[Dict]:
+    """
+    Executes the sub-requests of a batch and returns their results in order.
+
+    Writes run one at a time, in order. The reads between two writes are
+    independent: identical ones are executed once, and they run
+    concurrently on the app's thread pool when `parallel` is set.
+
+    Args:
+        app: Flask app serving the sub-requests
+        sub_requests: Validated sub-requests
+        parallel: Run independent reads concurrently
+
+    Returns:
+        The status code and body of each sub-request
+    """
+    results: List[Optional[Dict]] = [None] * len(sub_requests)
+    reads: Dict[SubRequest, List[int]] = {}
+
+    def run_reads():
+        if parallel and len(reads) > 1:
+            executor = _get_executor(app)
+            futures = {sub_request: executor.submit(dispatch_sub_request, app, sub_request)
+                       for sub_request in reads}
+            outcomes = {sub_request: future.result() for sub_request, future in futures.items()}
+        else:
+            outcomes = {sub_request: dispatch_sub_request(app, sub_request) for sub_request in reads}
+        for sub_request, indexes in reads.items():
+            for index in indexes:
+                results[index] = outcomes[sub_request]
+        reads.clear()
+
+    for index, sub_request in enumerate(sub_requests):
+        if sub_request.is_read and sub_request.body is None:
+            reads.setdefault(sub_request, []).append(index)
+            continue
+        run_reads()
+        results[index] = dispatch_sub_request(app, sub_request)
+    run_reads()
+    return results
@@ -1,40 +1,38 @@
+import json
+import time
 from datetime import datetime
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, request, stream_with_context
+from pydantic import ValidationError
+from app.api.batch import DEFAULT_BATCH_MAX_REQUESTS, execute_batch, parse_sub_requests
+from app.api.schemas import (AdvertisersQuery, ApplicationBody, BatchBody, CampaignReportQuery,
+                             EventsQuery, LeaderboardQuery, OrdersQuery, PublisherQuery, TrackOrderBody,
+                             UniqueBuyersQuery, WebhookBody, parse_body, parse_query, validation_error_response)
 from app.api.serializers import (api_response, serialize_advertiser,
-                                serialize_order)
-from app.services import AdvertiserService, ApplicationService, OrderService
-import asyncio
+                                serialize_event, serialize_order)
+from app.services.container import ServiceContainer
+from app.services.leaderboard_service import period_of
+from app.utils.access_log import record_order
+from app.utils.id_generator import encode_id
+from app.utils.publisher_auth import authenticated_publisher
+from app.utils.rate_limiting import release_in_flight_slot
 
 api_blueprint = Blueprint('api_membership', __name__, url_prefix='/api_membership/')
 
-advertiser_service = AdvertiserService()
-application_service = ApplicationService(advertiser_service)
-order_service = OrderService(application_service)
+def get_services() -> ServiceContainer:
+    """Returns the services of the current app, created by create_app."""
+    return current_app.extensions['api_membership']
 
-def handle_missing_param(param_name):
-    """Call this function if a required parameter is missing from the request"""
-    return api_response(
-        message=f"{param_name} are required",
-        success=False,
-        status_code=400
-    )
-
-def parse_date(date_str, date_name="Date"):
-    """Parse a date string into a datetime object"""
-    try:
-        return datetime.fromisoformat(date_str)
-    except (ValueError, TypeError):
-        return jsonify(
-            message=f"Invalid {date_name} format (ISO 8601 required)",
-            success=False
-        ), 400
+@api_blueprint.errorhandler(ValidationError)
+def handle_validation_error(error):
+    """Returns the invalid fields of a request body or query string."""
+    return validation_error_response(error)
 
 @api_blueprint.route('/advertisers', methods=['GET'])
 def get_advertisers():
     """Retrieves the list of advertisers available to a publisher"""
-    publisher_id = request.args.get('publisher_id')
+    query = parse_query(AdvertisersQuery)
 
-    advertisers = advertiser_service.get_all_advertisers(publisher_id)
+    advertisers = get_services().advertiser_service.get_all_advertisers(query.publisher_id)
     serialized_advertisers = [serialize_advertiser(adv) for adv in advertisers]
 
     return api_response(
@@ -46,7 +44,7 @@ def get_advertisers():
 def get_details_advertiser(advertiser_id):
     """Retrieves the details of an advertiser"""
 
-    advertiser = advertiser_service.get_advertiser(advertiser_id)
+    advertiser = get_services().advertiser_service.get_advertiser(advertiser_id)
     if not advertiser:
         return api_response(
             message="Advertiser not found",
@@ -61,13 +59,11 @@ def get_details_advertiser(advertiser_id):
 @api_blueprint.route('/applications', methods=['POST'])
 def apply_to_advertiser():
     """Allows a publisher to apply to an advertiser."""
-    publisher_id = request.json.get('publisher_id')
-    advertiser_id = request.json.get('advertiser_id')
-
-    if not publisher_id or not advertiser_id:
-        return handle_missing_param("Publisher and advertiser IDs")
+    body = parse_body(ApplicationBody)
 
-    success, message, application = application_service.apply_to_advertiser(publisher_id, advertiser_id)
+    application_service = get_services().application_service
+    success, message, application = application_service.apply_to_advertiser(body.publisher_id, body.advertiser_id,
+                                                                            body.notes)
 
     if not success:
         return api_response(
@@ -79,33 +75,19 @@ def apply_to_advertiser():
     return api_response(
         message=message,
         success=success,
-        data={'application_id': application.id, 'advertiser_id': application.advertiser_id},
+        data={'application_id': encode_id(application.id), 'advertiser_id': application.advertiser_id},
         status_code=201
     )
 
 @api_blueprint.route('/orders', methods=['GET'])
 def get_orders():
     """Retrieves the orders of a publisher with optional filters."""
-    publisher_id = request.args.get('publisher_id')
-    if not publisher_id:
-        return handle_missing_param("Publisher login")
-
-    advertiser_id = request.args.get('advertiser_id')
-
-    from_date = request.args.get('from_date')
-    to_date = request.args.get('to_date')
-
-    if from_date:
-        from_date = parse_date(from_date, "Start Date")
-        if isinstance(from_date, tuple):
-            return from_date
-
-    if to_date:
-        to_date = parse_date(to_date, "End Date")
-        if isinstance(to_date, tuple):
-            return to_date
+    query = parse_query(OrdersQuery)
 
-    orders = order_service.get_orders_for_publisher(publisher_id, advertiser_id, from_date, to_date)
+    order_service = get_services().order_service
+    orders = order_service.get_orders_for_publisher(query.publisher_id, query.advertiser_id,
+                                                    query.from_date, query.to_date,
+                                                    after_id=query.after_id, limit=query.limit)
     serialized_orders = [serialize_order(order) for order in orders]
 
     return api_response(
@@ -116,43 +98,227 @@ def get_orders():
 @api_blueprint.route('/orders/track', methods=['POST'])
 def track_order():
     """Simulates an order."""
-    data = request.json
-    if not data:
+    body = parse_body(TrackOrderBody)
+    idempotency_key = request.headers.get('Idempotency-Key') or body.order_reference
+
+    order_service = get_services().order_service
+    if idempotency_key:
+        existing_order = order_service.get_order_by_idempotency_key(body.advertiser_id, idempotency_key)
+        if existing_order:
+            record_order(existing_order.id)
+            return api_response(
+                data=serialize_order(existing_order),
+                message="Order already tracked"
+            )
+
+    order = order_service.track_order(body.advertiser_id, body.publisher_id, body.user_id, body.amount,
+                                      body.tracking_params, idempotency_key=idempotency_key)
+
+    if not order:
         return api_response(
-            message="JSON data required",
+            message="Unable to save the order",
             success=False,
             status_code=400
         )
 
-    advertiser_id = data.get('advertiser_id')
-    publisher_id = data.get('publisher_id')
-    user_id = data.get('user_id')
-    amount = data.get('amount')
-    tracking_params = data.get('tracking_params')
+    record_order(order.id)
+    return api_response(
+        data=serialize_order(order),
+        message="Order successfully created",
+        status_code=201
+    )
+
+@api_blueprint.route('/fraud/metrics', methods=['GET'])
+def get_fraud_metrics():
+    """Retrieves the hit counts of the velocity rules."""
+    return api_response(
+        data=get_services().fraud_service.get_metrics(),
+        message="Fraud detection metrics"
+    )
+
+@api_blueprint.route('/reports/campaigns', methods=['GET'])
+def get_campaign_report():
+    """Aggregates a publisher's orders by tracking parameter (campaign by default)."""
+    query = parse_query(CampaignReportQuery)
+
+    report = get_services().report_service.get_campaign_report(
+        query.publisher_id,
+        group_by=query.group_by,
+        filters=query.filters,
+        advertiser_id=query.advertiser_id,
+        from_date=query.from_date,
+        to_date=query.to_date
+    )
+
+    return api_response(
+        data=report,
+        message=f"{len(report)} groups found"
+    )
+
+@api_blueprint.route('/reports/unique-buyers', methods=['GET'])
+def get_unique_buyers():
+    """Estimates the distinct buyers of a publisher and/or advertiser over a date range."""
+    query = parse_query(UniqueBuyersQuery)
+
+    report = get_services().report_service.get_unique_buyers(
+        publisher_id=query.publisher_id,
+        advertiser_id=query.advertiser_id,
+        from_date=query.from_date,
+        to_date=query.to_date,
+        by_day=query.by_day
+    )
+
+    return api_response(
+        data=report,
+        message=f"About {report['unique_buyers']} unique buyers"
+    )
 
-    if not all([advertiser_id, publisher_id, user_id, amount]):
-        return handle_missing_param("All mandatory fields")
+@api_blueprint.route('/leaderboards', methods=['GET'])
+def get_leaderboard():
+    """Retrieves the top publishers of an advertiser, or the top advertisers of a category, for a month."""
+    query = parse_query(LeaderboardQuery)
+    period = query.period or period_of(datetime.now())
+    if query.advertiser_id:
+        dimension, value = 'advertiser', query.advertiser_id
+    else:
+        dimension, value = 'category', query.category
+
+    leaderboard = get_services().leaderboard_service.get_leaderboard(dimension, value, period, query.limit)
+
+    return api_response(
+        data={"period": period, dimension: value, "entries": leaderboard},
+        message=f"{len(leaderboard)} entries found"
+    )
+
+MAX_EVENTS_WAIT = 30
+SSE_KEEPALIVE = 15
+
+def _stream_events(event_log, publisher_id, since, duration):
+    """Yields Server-Sent Events until the duration elapses."""
+    deadline = time.monotonic() + duration
+    while True:
+        events, since, resync = event_log.read(since, publisher_id)
+        if resync:
+            yield f"event: resync\ndata: {json.dumps({'next_seq': since})}\n\n"
+        for event in events:
+            yield f"id: {event.seq}\nevent: {event.type}\ndata: {json.dumps(serialize_event(event))}\n\n"
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if not event_log.wait(since, min(remaining, SSE_KEEPALIVE)):
+            yield ": keep-alive\n\n"
+
+@api_blueprint.route('/events', methods=['GET'])
+def get_events():
+    """Retrieves a publisher's order and application events after a sequence number."""
+    query = parse_query(EventsQuery, since=request.headers.get('Last-Event-ID') or None)
+    publisher_id = query.publisher_id
+    since = query.since
+
+    event_log = get_services().event_log
+
+    if query.stream or 'text/event-stream' in request.headers.get('Accept', ''):
+        # Streams are limited on their own, so they can't take every in-flight slot of the API
+        stream_shedder = current_app.extensions.get('event_stream_shedder')
+        if stream_shedder is not None:
+            if not stream_shedder.enter():
+                return api_response(message="Too many event streams", success=False, status_code=503)
+            release_in_flight_slot()
+        response = Response(stream_with_context(_stream_events(event_log, publisher_id, since, query.duration)),
+                            mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+        if stream_shedder is not None:
+            response.call_on_close(stream_shedder.exit)
+        return response
+
+    deadline = time.monotonic() + min(query.wait, MAX_EVENTS_WAIT)
+    while True:
+        events, next_seq, resync = event_log.read(since, publisher_id, query.limit)
+        remaining = deadline - time.monotonic()
+        if events or resync or remaining <= 0:
+            break
+        since = next_seq
+        event_log.wait(since, remaining)
+
+    return api_response(
+        data={
+            "events": [serialize_event(event) for event in events],
+            "next_seq": next_seq,
+            "resync": resync
+        },
+        message="Resync required" if resync else f"{len(events)} events found"
+    )
+
+def _check_publisher(publisher_id: str):
+    """Returns an error response unless the request's API key belongs to the publisher."""
+    caller = authenticated_publisher()
+    if caller is None:
+        return api_response(message="Valid API key required", success=False, status_code=401)
+    if caller != publisher_id:
+        return api_response(message="API key doesn't belong to this publisher", success=False, status_code=403)
+    return None
+
+@api_blueprint.route('/webhooks', methods=['POST'])
+def register_webhook():
+    """Registers the URL receiving a publisher's order events."""
+    body = parse_body(WebhookBody)
+    denied = _check_publisher(body.publisher_id)
+    if denied:
+        return denied
 
     try:
-        amount = float(amount)
-    except (ValueError, TypeError):
+        get_services().webhook_dispatcher.register(body.publisher_id, body.url)
+    except ValueError as error:
         return api_response(
-            message="The amount must be a number",
+            message=str(error),
             success=False,
             status_code=400
         )
 
-    order = order_service.track_order(advertiser_id, publisher_id, user_id, amount, tracking_params)
+    return api_response(
+        data={"publisher_id": body.publisher_id, "url": body.url},
+        message="Webhook registered",
+        status_code=201
+    )
 
-    if not order:
+@api_blueprint.route('/webhooks/dead-letters', methods=['GET'])
+def get_webhook_dead_letters():
+    """Retrieves the event batches that couldn't be delivered to a publisher."""
+    query = parse_query(PublisherQuery)
+    denied = _check_publisher(query.publisher_id)
+    if denied:
+        return denied
+
+    dispatcher = get_services().webhook_dispatcher
+    url = dispatcher.subscriptions.get(query.publisher_id)
+    dead_letters = [letter for letter in list(dispatcher.dead_letters) if url and letter['url'] == url]
+
+    return api_response(
+        data=dead_letters,
+        message=f"{len(dead_letters)} undelivered batches"
+    )
+
+@api_blueprint.route('/batch', methods=['POST'])
+def batch():
+    """Executes several API calls in a single request."""
+    body = parse_body(BatchBody)
+
+    try:
+        sub_requests = parse_sub_requests(
+            body.requests,
+            batch_path=request.path,
+            max_requests=current_app.config.get('BATCH_MAX_REQUESTS', DEFAULT_BATCH_MAX_REQUESTS)
+        )
+    except ValueError as error:
         return api_response(
-            message="Unable to save the order",
+            message=str(error),
             success=False,
             status_code=400
         )
 
+    results = execute_batch(current_app._get_current_object(), sub_requests, parallel=body.parallel)
+
     return api_response(
-        data=serialize_order(order),
-        message="Order successfully created",
-        status_code=201
+        data=results,
+        message=f"{len(results)} requests executed"
     )
@@ -0,0 +1,242 @@
+from datetime import datetime
+from typing import Annotated, Any, ClassVar, Dict, FrozenSet, List, Optional, Tuple, Type, TypeVar
+
+from flask import jsonify, request
+from pydantic import (AfterValidator, BaseModel, ConfigDict, Field, StringConstraints, ValidationError,
+                      model_validator)
+from pydantic_core import PydanticCustomError
+
+from app.utils.id_generator import decode_id
+
+RequiredStr = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+
+
+def _to_naive(value: datetime) -> datetime:
+    """Converts dates with a UTC offset to naive local time, like order dates."""
+    if value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+IsoDatetime = Annotated[datetime, AfterValidator(_to_naive)]
+EncodedId = Annotated[str, AfterValidator(decode_id)]
+TrackingFilter = Annotated[str, StringConstraints(pattern=r'^[^:]+:')]
+
+# Bounds of an order's tracking parameters; values must be strings, numbers aren't coerced
+MAX_TRACKING_PARAMS = 32
+TrackingParams = Dict[Annotated[str, StringConstraints(min_length=1, max_length=64)],
+                      Annotated[str, Field(strict=True, max_length=256)]]
+# Upper bound of an order amount; infinities and NaN are rejected, so responses stay valid JSON
+MAX_ORDER_AMOUNT = 1_000_000_000
+
+
+class RequestSchema(BaseModel):
+    """
+    Base of the request schemas.
+
+    Each field's title is the label used in error messages; a description
+    tells which format is expected.
+    """
+
+    model_config = ConfigDict(extra='ignore', frozen=True, coerce_numbers_to_str=True)
+
+    # Query parameters that can be repeated
+    list_fields: ClassVar[FrozenSet[str]] = frozenset()
+
+
+class AdvertisersQuery(RequestSchema):
+    publisher_id: Optional[str] = None
+
+
+class ApplicationBody(RequestSchema):
+    publisher_id: RequiredStr = Field(title="Publisher ID")
+    advertiser_id: RequiredStr = Field(title="Advertiser ID")
+    notes: Optional[str] = None
+
+
+class PublisherOrdersQuery(RequestSchema):
+    publisher_id: RequiredStr = Field(title="Publisher login")
+    advertiser_id: Optional[str] = None
+    from_date: Optional[IsoDatetime] = Field(None, title="Start Date", description="ISO 8601 required")
+    to_date: Optional[IsoDatetime] = Field(None, title="End Date", description="ISO 8601 required")
+
+
+class OrdersQuery(PublisherOrdersQuery):
+    after_id: Optional[EncodedId] = Field(None, title="after_id", description="order ID required")
+    limit: Optional[int] = Field(None, ge=1, title="limit")
+
+
+class TrackOrderBody(RequestSchema):
+    advertiser_id: RequiredStr = Field(title="Advertiser ID")
+    publisher_id: RequiredStr = Field(title="Publisher ID")
+    user_id: RequiredStr = Field(title="User ID")
+    amount: float = Field(gt=0, le=MAX_ORDER_AMOUNT, allow_inf_nan=False, title="Amount")
+    tracking_params: Optional[TrackingParams] = Field(None, max_length=MAX_TRACKING_PARAMS,
+                                                      title="Tracking parameters")
+    order_reference: Optional[str] = None
+
+
+class CampaignReportQuery(PublisherOrdersQuery):
+    list_fields: ClassVar[FrozenSet[str]] = frozenset({'filter'})
+
+    group_by: RequiredStr = Field('campaign', title="Group by")
+    filter: List[TrackingFilter] = Field(default_factory=list, title="filter", description="key:value required")
+
+    @property
+    def filters(self) -> List[Tuple[str, str]]:
+        """The tracking parameter filters as (key, value) pairs."""
+        return [tuple(param_filter.split(':', 1)) for param_filter in self.filter]
+
+
+class UniqueBuyersQuery(RequestSchema):
+    publisher_id: Optional[RequiredStr] = Field(None, title="Publisher login")
+    advertiser_id: Optional[RequiredStr] = Field(None, title="Advertiser ID")
+    from_date: Optional[IsoDatetime] = Field(None, title="Start Date", description="ISO 8601 required")
+    to_date: Optional[IsoDatetime] = Field(None, title="End Date", description="ISO 8601 required")
+    by_day: bool = False
+
+    @model_validator(mode='after')
+    def check_scope(self):
+        if self.publisher_id is None and self.advertiser_id is None:
+            raise PydanticCustomError('scope_required', "Publisher login or Advertiser ID required")
+        return self
+
+
+# Longest Server-Sent Events stream, in seconds; clients reconnect with Last-Event-ID
+MAX_STREAM_DURATION = 300
+
+
+class EventsQuery(RequestSchema):
+    publisher_id: RequiredStr = Field(title="Publisher login")
+    since: int = Field(0, ge=0, title="since")
+    wait: float = Field(0, ge=0, title="wait")
+    limit: int = Field(1000, ge=1, title="limit")
+    duration: float = Field(MAX_STREAM_DURATION, ge=0, le=MAX_STREAM_DURATION, title="duration")
+    stream: bool = False
+
+
+class WebhookBody(RequestSchema):
+    publisher_id: RequiredStr = Field(title="Publisher ID")
+    url: RequiredStr = Field(title="URL")
+
+
+class PublisherQuery(RequestSchema):
+    publisher_id: RequiredStr = Field(title="Publisher login")
+
+
+class LeaderboardQuery(RequestSchema):
+    advertiser_id: Optional[RequiredStr] = Field(None, title="Advertiser ID")
+    category: Optional[RequiredStr] = Field(None, title="Category")
+    period: Optional[str] = Field(None, pattern=r'^\d{4}-(0[1-9]|1[0-2])$', title="period",
+                                  description="YYYY-MM required")
+    limit: int = Field(50, ge=1, le=1000, title="limit")
+
+    @model_validator(mode='after')
+    def check_board(self):
+        if (self.advertiser_id is None) == (self.category is None):
+            raise PydanticCustomError('board_required', "Advertiser ID or Category required (not both)")
+        return self
+
+
+class SubRequestBody(RequestSchema):
+    method: Annotated[str, StringConstraints(to_upper=True)] = 'GET'
+    path: str = Field(pattern=r'^/', title="path", description="absolute path required")
+    body: Optional[Any] = None
+    headers: Dict[str, str] = Field(default_factory=dict)
+
+
+class BatchBody(RequestSchema):
+    requests: List[SubRequestBody] = Field(min_length=1, title="requests")
+    parallel: bool = False
+
+
+Schema = TypeVar('Schema', bound=RequestSchema)
+
+
+def parse_body(schema: Type[Schema]) -> Schema:
+    """
+    Validates the JSON body of the current request in a single pass.
+
+    Raises:
+        ValidationError: If the body doesn't match the schema
+    """
+    return schema.model_validate_json(request.get_data() or b'null')
+
+
+def parse_query(schema: Type[Schema], **overrides) -> Schema:
+    """
+    Validates the query string of the current request.
+
+    Args:
+        schema: Schema of the query parameters
+        **overrides: Values taken from elsewhere (e.g. headers), replacing query parameters
+
+    Raises:
+        ValidationError: If the parameters don't match the schema
+    """
+    data: Dict[str, Any] = {
+        key: values if key in schema.list_fields else values[0]
+        for key, values in request.args.lists()
+    }
+    data.update((key, value) for key, value in overrides.items() if value is not None)
+    return schema.model_validate(data)
+
+
+def _error_message(schema: Optional[Type[RequestSchema]], errors: List[Dict]) -> str:
+    """Summarizes validation errors in the API's usual wording."""
+    fields = getattr(schema, 'model_fields', {})
+
+    def title(error: Dict) -> str:
+        if len(error['loc']) > 1:
+            return ".".join(str(part) for part in error['loc'])
+        field = fields.get(error['loc'][0])
+        return (field.title if field and field.title else None) or str(error['loc'][0])
+
+    missing = [error for error in errors
+               if error['type'] == 'missing' or (error['type'] == 'string_too_short' and len(error['loc']) == 1)]
+    if missing:
+        titles = [title(error) for error in missing]
+        label = titles[0] if len(titles) == 1 else f"{', '.join(titles[:-1])} and {titles[-1]}"
+        return f"{label} are required"
+
+    error = errors[0]
+    if error['type'] == 'json_invalid':
+        return "Invalid JSON data"
+    if not error['loc'] and error['input'] is None:
+        return "JSON data required"
+    if not error['loc']:
+        return f"Invalid request: {error['msg']}"
+
+    field = fields.get(error['loc'][0])
+    if field is not None and field.description:
+        return f"Invalid {field.title or error['loc'][0]} format ({field.description})"
+    return f"Invalid {title(error)}: {error['msg']}"
+
+
+def validation_error_response(error: ValidationError, schema: Optional[Type[RequestSchema]] = None):
+    """
+    Builds the 400 response of a validation error.
+
+    Args:
+        error: The validation error
+        schema: Schema that failed, looked up from the error if None
+
+    Returns:
+        Tuple with response JSON + status code, listing each invalid field
+    """
+    errors = error.errors(include_url=False, include_context=False)
+    if schema is None:
+        schema = _SCHEMAS.get(error.title)
+    return jsonify({
+        "success": False,
+        "message": _error_message(schema, errors),
+        "errors": [
+            {"field": ".".join(str(part) for part in item['loc']), "type": item['type'], "message": item['msg']}
+            for item in errors
+        ]
+    }), 400
+
+
+_SCHEMAS = {schema.__name__: schema for schema in (AdvertisersQuery, ApplicationBody, OrdersQuery, TrackOrderBody,
+                                                     CampaignReportQuery, EventsQuery, WebhookBody, PublisherQuery,
+                                                     LeaderboardQuery, UniqueBuyersQuery, BatchBody)}
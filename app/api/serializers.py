@@ -4,6 +4,8 @@ from flask import jsonify
 from app.models.advertiser import Advertiser
 from app.models.application import Application
 from app.models.order import Order
+from app.services.event_log import ChangeEvent
+from app.utils.id_generator import encode_id
 
 def serialize_datetime(dt: datetime) -> str:
     """Convert datetime in ISO format"""
@@ -40,7 +42,7 @@ def serialize_application(application: Application) -> Dict:
         Dictionary representing an application
     """
     return {
-        "id": application.id,
+        "id": encode_id(application.id),
         "advertiser_id": application.advertiser_id,
         "publisher_id": application.publisher_id,
         "status": application.status.values,
@@ -59,7 +61,7 @@ def serialize_order(order: Order) -> Dict:
         Dictionary representing an order
     """
     return {
-        "id": order.id,
+        "id": encode_id(order.id),
         "advertiser_id": order.advertiser_id,
         "publisher_id": order.publisher_id,
         "user_id": order.user_id,
@@ -68,7 +70,31 @@ def serialize_order(order: Order) -> Dict:
         "status": order.status.value,
         "order_date": serialize_datetime(order.order_date),
         "validation_date": serialize_datetime(order.validation_date),
-        "tracking_params": order.tracking_params
+        "closing_date": serialize_datetime(order.closing_date),
+        "tracking_params": order.tracking_params,
+        "hold_reason": order.hold_reason
+    }
+
+def serialize_event(event: ChangeEvent) -> Dict:
+    """
+    Convert ChangeEvent for JSON serializer
+
+    Args:
+        Object ChangeEvent
+    Returns:
+        Dictionary representing a change event
+    """
+    return {
+        "seq": event.seq,
+        "type": event.type,
+        "publisher_id": event.publisher_id,
+        "advertiser_id": event.advertiser_id,
+        "entity_id": encode_id(event.entity_id),
+        "status": event.status,
+        "previous_status": event.previous_status,
+        "timestamp": serialize_datetime(event.timestamp),
+        "data": {key: serialize_datetime(value) if isinstance(value, datetime) else value
+                 for key, value in event.data.items()}
     }
 
 def api_response(data: Union[Dict, List, None] = None, message: str = "",
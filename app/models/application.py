@@ -24,7 +24,7 @@ class Application:
         notes (str): Notes justifying the application
     """
 
-    id: str
+    id: int
     advertiser_id: str
     publisher_id: str
     status: ApplicationStatus = ApplicationStatus.PENDING
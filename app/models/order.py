@@ -9,6 +9,8 @@ class OrderStatus(Enum):
     CONFIRMED = "confirmed"
     CANCELLED = "cancelled"
     REJECTED = "rejected"
+    # Held for fraud review: can't be confirmed until released (set back to pending)
+    HELD = "held"
 
 
 @dataclass
@@ -26,10 +28,12 @@ class Order:
         status: Status of the order
         order_date: Date of the order
         validation_date: Date of order validation
+        closing_date: Date the order was cancelled or rejected
         tracking_params: Additional tracking parameters
+        hold_reason: Why the order is held for review, if it is
     """
 
-    id: str
+    id: int
     advertiser_id: str
     publisher_id: str
     user_id: str
@@ -38,9 +42,11 @@ class Order:
     status: OrderStatus = OrderStatus.PENDING
     order_date: datetime = None
     validation_date: Optional[datetime] = None
+    closing_date: Optional[datetime] = None
     tracking_params: Optional[Dict[str, str]] = None
+    hold_reason: Optional[str] = None
 
-    def _post_init__(self):
+    def __post_init__(self):
         if self.order_date is None:
             self.order_date = datetime.now()
         if self.tracking_params is None:
@@ -1,5 +1,27 @@
-from app.services.advertiser_service import AdvertiserService
-from app.services.application_service import ApplicationService
-from app.services.order_service import OrderService
+"""
+Services are exported lazily so that importing the package (e.g. through
+the app factory) doesn't import every service module up front.
+"""
+from importlib import import_module
 
-__all__ = ['AdvertiserService', 'ApplicationService', 'OrderService']
+_EXPORTS = {
+    'AdvertiserService': 'app.services.advertiser_service',
+    'ApplicationService': 'app.services.application_service',
+    'OrderService': 'app.services.order_service',
+    'FraudService': 'app.services.fraud_service',
+    'ReportService': 'app.services.report_service',
+    'PayoutService': 'app.services.payout_service',
+    'LeaderboardService': 'app.services.leaderboard_service',
+    'WebhookDispatcher': 'app.services.webhook_dispatcher',
+    'ServiceContainer': 'app.services.container',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
@@ -1,10 +1,12 @@
-import uuid
+import threading
+from dataclasses import replace
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
 
 from app.models import Application, ApplicationStatus
 from app.services import AdvertiserService
+from app.services.event_log import EventLog
+from app.utils.id_generator import IdGenerator, SnowflakeIdGenerator
 
 """Decorator for validate an Advertiser"""
 def validate_advertiser(func):
@@ -17,18 +19,30 @@ def validate_advertiser(func):
 class ApplicationService:
     """
     Service to manage applications for advertisers.
+
+    Applications and each publisher's index are copy-on-write: writers
+    (serialized by a lock) store new objects instead of mutating published
+    ones, so readers never lock and never see a half-updated application
+    or an index changing under iteration.
     """
-    def __init__(self, advertiser_service: AdvertiserService):
+    def __init__(self, advertiser_service: AdvertiserService, event_log: Optional[EventLog] = None,
+                 id_generator: Optional[IdGenerator] = None,
+                 publisher_filter: Optional[Callable[[str], bool]] = None):
         self.advertiser_service = advertiser_service
-        self.applications: Dict[str, Application] = {}
-        self.publisher_applications: Dict[str, Dict[str, str]] = defaultdict(dict)
-        self._load_sample_data()
+        self.event_log = event_log
+        self.id_generator = id_generator or SnowflakeIdGenerator()
+        self.applications: Dict[int, Application] = {}
+        self.publisher_applications: Dict[str, Dict[str, int]] = {}
+        self._write_lock = threading.Lock()
+        self._load_sample_data(publisher_filter)
 
-    def _load_sample_data(self):
-        """Load sample applications."""
+    def _load_sample_data(self, publisher_filter: Optional[Callable[[str], bool]] = None):
+        """Load sample applications (of the publishers accepted by the filter, if any)."""
         for publisher_id, advertiser_id in [("publisher_1", "user_1"), ("publisher_2", "user_2")]:
+            if publisher_filter and not publisher_filter(publisher_id):
+                continue
             app = Application(
-                id=str(uuid.uuid4()),
+                id=self.id_generator.next_id(),
                 publisher_id=publisher_id,
                 advertiser_id=advertiser_id,
                 status=ApplicationStatus.APPROVED,
@@ -37,31 +51,52 @@ class ApplicationService:
             self._store_application(app)
 
     def _store_application(self, application: Application):
-        """Stores an application in memory."""
+        """Stores an application in memory, publishing a new index for its publisher."""
         self.applications[application.id] = application
-        self.publisher_applications[application.publisher_id][application.advertiser_id] = application.id
+        index = self.publisher_applications.get(application.publisher_id, {})
+        self.publisher_applications[application.publisher_id] = {**index, application.advertiser_id: application.id}
 
     @validate_advertiser
     def apply_to_advertiser(self, publisher_id: str, advertiser_id: str, notes: Optional[str] = None) -> Tuple[bool, str, Optional[Application]]:
         """Creates an application for an advertiser."""
-        existing_app_id = self.publisher_applications[publisher_id].get(advertiser_id)
-        if existing_app_id:
-            existing_app = self.applications[existing_app_id]
-            messages = {
-                ApplicationStatus.APPROVED: "You are already affiliated with this advertiser",
-                ApplicationStatus.PENDING: "Your application is already awaiting validation"
-            }
-            return False, messages.get(existing_app.status, "Application already exists"), existing_app
+        with self._write_lock:
+            existing_app_id = self.publisher_applications.get(publisher_id, {}).get(advertiser_id)
+            if existing_app_id:
+                existing_app = self.applications[existing_app_id]
+                messages = {
+                    ApplicationStatus.APPROVED: "You are already affiliated with this advertiser",
+                    ApplicationStatus.PENDING: "Your application is already awaiting validation"
+                }
+                return False, messages.get(existing_app.status, "Application already exists"), existing_app
 
-        new_app = Application(
-            id=str(uuid.uuid4()),
-            advertiser_id=advertiser_id,
-            publisher_id=publisher_id,
-            notes=notes
-        )
-        self._store_application(new_app)
+            new_app = Application(
+                id=self.id_generator.next_id(),
+                advertiser_id=advertiser_id,
+                publisher_id=publisher_id,
+                notes=notes
+            )
+            self._store_application(new_app)
+            if self.event_log:
+                self.event_log.append("application.created", publisher_id, advertiser_id, new_app.id,
+                                      new_app.status.value)
         return True, "Successful application", new_app
 
+    def update_application_status(self, application_id: int, status: ApplicationStatus) -> Optional[Application]:
+        """Approves or rejects an application."""
+        with self._write_lock:
+            application = self.applications.get(application_id)
+            if not application:
+                return None
+
+            previous_status = application.status
+            application = replace(application, status=status, response_date=datetime.now())
+            self.applications[application_id] = application
+            if self.event_log:
+                self.event_log.append("application.status_changed", application.publisher_id,
+                                      application.advertiser_id, application.id, status.value,
+                                      previous_status=previous_status.value)
+        return application
+
     def get_publisher_application(self, publisher_id: str):
         """Retrieves all applications from a publisher lazily (generator for large volume)."""
         for app_id in self.publisher_applications.get(publisher_id, {}).values():
@@ -69,9 +104,9 @@ class ApplicationService:
 
     def check_publisher_access(self, publisher_id: str, advertiser_id: str) -> bool:
         """Checks if a publisher has access to an advertiser (approved application)."""
-        app_id = self.publisher_applications[publisher_id].get(advertiser_id)
+        app_id = self.publisher_applications.get(publisher_id, {}).get(advertiser_id)
         return bool(app_id and self.applications[app_id].status == ApplicationStatus.APPROVED)
 
-    def get_application(self, application_id: str) -> Optional[Application]:
+    def get_application(self, application_id: int) -> Optional[Application]:
         """Retrieves an application by its identifier."""
         return self.applications.get(application_id)
@@ -0,0 +1,156 @@
+import pickle
+import threading
+import zlib
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.models import Order
+from app.utils.hyperloglog import DEFAULT_PRECISION, HyperLogLog, relative_error
+
+PairKey = Tuple[str, str]
+
+
+def unique_buyers_report(daily: Dict[date, HyperLogLog], precision: int = DEFAULT_PRECISION,
+                         by_day: bool = False) -> Dict:
+    """
+    Summarizes daily sketches into a unique buyers estimate.
+
+    Args:
+        daily: Merged sketch of each day
+        precision: Precision of the sketches
+        by_day: Also estimate each day separately
+
+    Returns:
+        Estimated unique buyers over the whole range, the relative standard
+        error of the estimates and, if requested, the estimate of each day
+    """
+    total = HyperLogLog(precision)
+    for sketch in daily.values():
+        total.merge(sketch)
+    report = {"unique_buyers": total.count(), "relative_error": round(relative_error(precision), 4)}
+    if by_day:
+        report["days"] = [{"date": day.isoformat(), "unique_buyers": daily[day].count()} for day in sorted(daily)]
+    return report
+
+
+class BuyerSketches:
+    """
+    Approximate distinct buyers (order user IDs) per publisher, advertiser and day.
+
+    Each (publisher, advertiser, day) has a HyperLogLog sketch, merged at
+    query time over the advertisers of a publisher, the publishers of an
+    advertiser and the days of a range. A sketch costs at most 2^precision
+    bytes however many buyers it counts; a buyer ordering again is never
+    counted twice, even across days. Cancelled orders are not removed.
+    """
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, retention_days: int = 400):
+        """
+        Initializes the sketches.
+
+        Args:
+            precision: Precision of the HyperLogLog sketches
+            retention_days: Days kept after the most recent one
+        """
+        self.precision = precision
+        self.retention_days = retention_days
+        self.sketches: Dict[PairKey, Dict[date, HyperLogLog]] = {}
+        self._advertisers: Dict[str, Set[str]] = {}
+        self._publishers: Dict[str, Set[str]] = {}
+        self._last_day: Optional[date] = None
+        self._lock = threading.Lock()
+
+    def add(self, order: Order):
+        """Counts the buyer of an order."""
+        day = order.order_date.date()
+        pair = (order.publisher_id, order.advertiser_id)
+        with self._lock:
+            days = self.sketches.get(pair)
+            if days is None:
+                days = self.sketches[pair] = {}
+                self._advertisers.setdefault(order.publisher_id, set()).add(order.advertiser_id)
+                self._publishers.setdefault(order.advertiser_id, set()).add(order.publisher_id)
+            sketch = days.get(day)
+            if sketch is None:
+                sketch = days[day] = HyperLogLog(self.precision)
+                if self._last_day is None or day > self._last_day:
+                    self._last_day = day
+                    self._expire(day - timedelta(days=self.retention_days))
+            sketch.add(order.user_id)
+
+    def _expire(self, before: date):
+        for days in self.sketches.values():
+            for day in [day for day in days if day < before]:
+                del days[day]
+
+    def daily_sketches(self, publisher_id: Optional[str] = None, advertiser_id: Optional[str] = None,
+                       from_date: Optional[datetime] = None,
+                       to_date: Optional[datetime] = None) -> Dict[date, HyperLogLog]:
+        """
+        Merges the sketches of a publisher and/or advertiser, per day.
+
+        Args:
+            publisher_id: Restrict to one publisher
+            advertiser_id: Restrict to one advertiser
+            from_date: First day included
+            to_date: Last day included
+
+        Returns:
+            A new merged sketch for each day with orders
+        """
+        first_day = from_date.date() if from_date else None
+        last_day = to_date.date() if to_date else None
+        selected: List[Tuple[date, HyperLogLog]] = []
+        # Only the sketches are picked under the lock (add takes it under the order write lock);
+        # they are merged outside it
+        with self._lock:
+            if publisher_id is not None:
+                advertisers = [advertiser_id] if advertiser_id else self._advertisers.get(publisher_id, ())
+                pairs = [(publisher_id, advertiser) for advertiser in advertisers]
+            elif advertiser_id is not None:
+                pairs = [(publisher, advertiser_id) for publisher in self._publishers.get(advertiser_id, ())]
+            else:
+                pairs = list(self.sketches)
+
+            for pair in pairs:
+                for day, sketch in self.sketches.get(pair, {}).items():
+                    if (first_day and day < first_day) or (last_day and day > last_day):
+                        continue
+                    # Dense registers only ever grow in place, so a concurrent add can't corrupt a merge;
+                    # sparse entries are inserted and shifted, so small sketches are copied
+                    selected.append((day, sketch if sketch.registers is not None else sketch.copy()))
+
+        daily: Dict[date, HyperLogLog] = {}
+        for day, sketch in selected:
+            merged = daily.get(day)
+            if merged is None:
+                daily[day] = sketch.copy()
+            else:
+                merged.merge(sketch)
+        return daily
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the sketches' registers."""
+        return sum(sketch.nbytes for days in self.sketches.values() for sketch in days.values())
+
+    def to_bytes(self) -> bytes:
+        """Serializes every sketch, e.g. to snapshot them next to frozen segments."""
+        with self._lock:
+            state = {pair: {day.toordinal(): sketch.to_bytes() for day, sketch in days.items()}
+                     for pair, days in self.sketches.items()}
+        return zlib.compress(pickle.dumps((self.precision, state), protocol=pickle.HIGHEST_PROTOCOL))
+
+    @classmethod
+    def from_bytes(cls, data: bytes, retention_days: int = 400) -> "BuyerSketches":
+        """Restores sketches serialized with to_bytes."""
+        precision, state = pickle.loads(zlib.decompress(data))
+        sketches = cls(precision, retention_days)
+        for (publisher_id, advertiser_id), days in state.items():
+            sketches.sketches[(publisher_id, advertiser_id)] = {
+                date.fromordinal(day): HyperLogLog.from_bytes(sketch) for day, sketch in days.items()
+            }
+            sketches._advertisers.setdefault(publisher_id, set()).add(advertiser_id)
+            sketches._publishers.setdefault(advertiser_id, set()).add(publisher_id)
+            sketches._last_day = max([sketches._last_day or date.min, *map(date.fromordinal, days)])
+        return sketches
@@ -0,0 +1,124 @@
+from functools import cached_property
+from typing import Any, Mapping, Optional
+
+
+class ServiceContainer:
+    """
+    Builds the services of one app instance on first use.
+
+    Nothing is created (and no sample data loaded) until a service is
+    requested, and each app gets its own independent state.
+    """
+
+    def __init__(self, config: Optional[Mapping[str, Any]] = None):
+        """
+        Initializes the container.
+
+        Args:
+            config: App configuration read when building the services
+        """
+        self.config = config or {}
+
+    @cached_property
+    def id_generator(self):
+        generator = self.config.get('ID_GENERATOR')
+        if generator is None:
+            from app.utils.id_generator import SnowflakeIdGenerator
+            generator = SnowflakeIdGenerator(shard_id=self.config.get('SHARD_ID', 0))
+        return generator
+
+    @cached_property
+    def advertiser_service(self):
+        from app.services.advertiser_service import AdvertiserService
+        return AdvertiserService()
+
+    @cached_property
+    def event_log(self):
+        from app.services.event_log import EventLog
+        return EventLog(retention=self.config.get('EVENT_LOG_RETENTION', 100_000))
+
+    @property
+    def is_sharded(self) -> bool:
+        """Whether orders and applications are partitioned across shard processes."""
+        return self.config.get('ORDER_SHARDS', 1) > 1
+
+    @cached_property
+    def shard_router(self):
+        if self.config.get('PREFORK'):
+            raise ValueError("ORDER_SHARDS can't be combined with PREFORK: shards serve a single web process")
+        import atexit
+        from app.services.sharding import ShardRouter
+        router = ShardRouter(self.config['ORDER_SHARDS'], config=self.config, event_log=self.event_log)
+        atexit.register(router.close)
+        return router
+
+    @cached_property
+    def application_service(self):
+        if self.is_sharded:
+            return self.shard_router.application_service
+        from app.services.application_service import ApplicationService
+        return ApplicationService(self.advertiser_service, event_log=self.event_log, id_generator=self.id_generator)
+
+    @cached_property
+    def fraud_service(self):
+        if self.is_sharded:
+            return self.shard_router.fraud_service
+        from app.services.fraud_service import FraudService
+        return FraudService()
+
+    @cached_property
+    def order_service(self):
+        service = self._order_store
+        # Leaderboards follow the change log from the moment orders can be tracked, so no request
+        # ever waits for them to scan the order history with writes held
+        self.leaderboard_service
+        return service
+
+    @cached_property
+    def _order_store(self):
+        if self.is_sharded:
+            return self.shard_router.order_service
+        from app.services.order_service import OrderService
+        return OrderService(
+            self.application_service,
+            fraud_service=self.fraud_service,
+            cold_storage_dir=self.config.get('ORDER_COLD_STORAGE_DIR'),
+            event_log=self.event_log,
+            id_generator=self.id_generator
+        )
+
+    @cached_property
+    def report_service(self):
+        if self.is_sharded:
+            return self.shard_router.report_service
+        from app.services.report_service import ReportService
+        return ReportService(self.order_service)
+
+    @cached_property
+    def payout_service(self):
+        from app.services.payout_service import PayoutService
+        return PayoutService(self.order_service, **self.config.get('PAYOUT_OPTIONS', {}))
+
+    @cached_property
+    def leaderboard_service(self):
+        from app.services.leaderboard_service import LeaderboardService
+        service = LeaderboardService(self.advertiser_service, **self.config.get('LEADERBOARD_OPTIONS', {}))
+        service.attach(self._order_store, self.event_log)
+        return service
+
+    @cached_property
+    def webhook_dispatcher(self):
+        from app.services.webhook_dispatcher import WebhookDispatcher
+        dispatcher = WebhookDispatcher(**self.config.get('WEBHOOK_OPTIONS', {}))
+        self.event_log.subscribe(dispatcher.handle_event)
+        return dispatcher
+
+    def build_all(self):
+        """Creates every service up front, e.g. in the master before forking workers."""
+        for name in ('id_generator', 'advertiser_service', 'event_log', 'application_service', 'fraud_service',
+                     'order_service', 'leaderboard_service', 'report_service'):
+            getattr(self, name)
+
+    def is_built(self, name: str) -> bool:
+        """Checks whether a service has already been created."""
+        return name in self.__dict__
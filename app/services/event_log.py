@@ -0,0 +1,155 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """
+    Represents a change of an order or an application.
+
+    Attributes:
+        seq: Sequence number, strictly increasing
+        type: Event type (order.tracked, order.status_changed, application.created, ...)
+        publisher_id: Publisher the entity belongs to
+        advertiser_id: Advertiser the entity belongs to
+        entity_id: Identifier of the order or application
+        status: Status after the change
+        previous_status: Status before the change, if any
+        timestamp: Date of the change
+        data: Additional event data (amount, commission, ...)
+    """
+
+    seq: int
+    type: str
+    publisher_id: str
+    advertiser_id: str
+    entity_id: int
+    status: str
+    previous_status: Optional[str] = None
+    timestamp: datetime = None
+    data: Dict = field(default_factory=dict)
+
+
+class EventLog:
+    """
+    Append-only, sequence-numbered log of order and application changes.
+
+    Events are kept in a fixed-size ring, so retention is bounded: readers
+    asking for events that were already overwritten are told to resync.
+    Readers can block until new events arrive (long-poll), and listeners
+    are called synchronously on every append. Listeners run while the
+    change is being committed (e.g. under the order write lock), so they
+    must be quick and hand slow work off; a failing listener is logged
+    and counted, never reported to the writer whose change is already
+    stored.
+    """
+
+    def __init__(self, retention: int = 100_000):
+        """
+        Initializes the log.
+
+        Args:
+            retention: Number of most recent events kept
+        """
+        self.retention = retention
+        self._ring: List[Optional[ChangeEvent]] = [None] * retention
+        self._next_seq = 1
+        self._condition = threading.Condition()
+        self._listeners: List[Callable[[ChangeEvent], None]] = []
+        self.listener_errors = 0
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the most recent event (0 if none)."""
+        return self._next_seq - 1
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest event still retained."""
+        return max(1, self._next_seq - self.retention)
+
+    def subscribe(self, listener: Callable[[ChangeEvent], None]):
+        """Registers a callback invoked with every new event; it must not block."""
+        self._listeners.append(listener)
+
+    def append(self, type: str, publisher_id: str, advertiser_id: str, entity_id: int, status: str,
+               previous_status: Optional[str] = None, data: Optional[Dict] = None) -> ChangeEvent:
+        """
+        Appends an event and wakes up waiting readers.
+
+        Returns:
+            The event with its sequence number
+        """
+        with self._condition:
+            event = ChangeEvent(
+                seq=self._next_seq,
+                type=type,
+                publisher_id=publisher_id,
+                advertiser_id=advertiser_id,
+                entity_id=entity_id,
+                status=status,
+                previous_status=previous_status,
+                timestamp=datetime.now(),
+                data=data or {}
+            )
+            self._ring[event.seq % self.retention] = event
+            self._next_seq += 1
+            self._condition.notify_all()
+
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                self.listener_errors += 1
+                logger.exception("Event listener %r failed on event %d", listener, event.seq)
+        return event
+
+    def read(self, since: int, publisher_id: Optional[str] = None,
+             limit: int = 1000) -> Tuple[List[ChangeEvent], int, bool]:
+        """
+        Reads the events following a sequence number.
+
+        Args:
+            since: Last sequence number seen by the reader
+            publisher_id: Only return the events of this publisher
+            limit: Maximum number of events returned
+
+        Returns:
+            The events, the sequence number to read from next, and whether the reader
+            fell behind the retained window (or is ahead of the log) and must resync
+        """
+        with self._condition:
+            next_seq = self._next_seq
+            first_seq = self.first_seq
+            ring = self._ring
+            retention = self.retention
+
+        if since < first_seq - 1 or since >= next_seq:
+            return [], next_seq - 1, True
+
+        events = []
+        seq = since + 1
+        while seq < next_seq and len(events) < limit:
+            event = ring[seq % retention]
+            if event.seq != seq:
+                # Overwritten while reading: the reader fell behind
+                return [], next_seq - 1, True
+            if publisher_id is None or event.publisher_id == publisher_id:
+                events.append(event)
+            seq += 1
+        return events, seq - 1, False
+
+    def wait(self, since: int, timeout: float) -> bool:
+        """
+        Blocks until an event newer than `since` exists or the timeout expires.
+
+        Returns:
+            True if new events are available
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._next_seq - 1 > since, timeout)
@@ -0,0 +1,139 @@
+import math
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Dict, List, Optional
+
+from app.models import Order, OrderStatus
+from app.utils.velocity import COUNT, TOTAL, SlidingWindowCounter
+
+SCOPE_KEYS = {
+    'user': attrgetter('user_id'),
+    'publisher': attrgetter('publisher_id'),
+    'publisher_advertiser': attrgetter('publisher_id', 'advertiser_id'),
+}
+
+
+@dataclass(frozen=True)
+class VelocityRule:
+    """
+    Threshold on the orders seen for one scope within a sliding window.
+
+    Attributes:
+        name: Rule name, used as hold reason and in metrics
+        scope: Key the window is counted on ('user', 'publisher' or 'publisher_advertiser')
+        window_seconds: Length of the sliding window
+        max_orders: Maximum number of orders in the window
+        max_amount: Maximum sum of order amounts in the window
+        action: 'hold' puts the order in HELD status with a reason, 'flag' only counts the hit
+    """
+
+    name: str
+    scope: str
+    window_seconds: float = 600
+    max_orders: Optional[int] = None
+    max_amount: Optional[float] = None
+    action: str = 'hold'
+
+
+DEFAULT_VELOCITY_RULES = (
+    VelocityRule(name="user_order_velocity", scope='user', window_seconds=600, max_orders=10),
+    VelocityRule(name="publisher_order_burst", scope='publisher', window_seconds=60, max_orders=1000,
+                 action='flag'),
+    VelocityRule(name="publisher_advertiser_amount", scope='publisher_advertiser', window_seconds=3600,
+                 max_amount=50_000.0),
+)
+
+
+class FraudService:
+    """
+    Streaming velocity detection on the order ingest path.
+
+    Keeps sliding-window counters per user, per publisher and per
+    (publisher, advertiser) pair and checks each incoming order against
+    the configured rules. Ingest threads inspect orders outside the order
+    store's write lock, so window updates and metrics are serialized by the
+    detector's own lock.
+    """
+
+    def __init__(self, rules=DEFAULT_VELOCITY_RULES, buckets_per_window: int = 10, max_keys: int = 100_000):
+        """
+        Initializes the service.
+
+        Args:
+            rules: Velocity rules checked for each order
+            buckets_per_window: Granularity of the sliding windows
+            max_keys: Maximum number of keys tracked per window
+        """
+        for rule in rules:
+            if rule.scope not in SCOPE_KEYS:
+                raise ValueError(f"Unknown velocity rule scope: {rule.scope}")
+        self.rules = tuple(rules)
+        self.windows: Dict[tuple, SlidingWindowCounter] = {}
+        for rule in self.rules:
+            window_key = (rule.scope, rule.window_seconds)
+            if window_key not in self.windows:
+                self.windows[window_key] = SlidingWindowCounter(
+                    rule.window_seconds, rule.window_seconds / buckets_per_window, max_keys)
+        # Thresholds are resolved once: missing limits become infinite, so a check is two comparisons
+        self._checks = tuple(
+            (window.add, SCOPE_KEYS[scope], tuple(
+                (math.inf if rule.max_orders is None else rule.max_orders,
+                 math.inf if rule.max_amount is None else rule.max_amount, rule)
+                for rule in self.rules if (rule.scope, rule.window_seconds) == (scope, window_seconds)))
+            for (scope, window_seconds), window in self.windows.items()
+        )
+        self.rule_hits: Counter = Counter()
+        self.inspected = 0
+        self.held = 0
+        self._lock = threading.Lock()
+
+    def inspect(self, order: Order) -> List[str]:
+        """
+        Records an order in the windows and checks it against the rules.
+
+        Orders hitting a 'hold' rule are put in HELD status with the rule names as hold reason.
+
+        Args:
+            order: Newly tracked order
+
+        Returns:
+            Names of the rules hit by the order
+        """
+        timestamp = order.order_date.timestamp()
+        amount = order.amount
+        hits = None
+        with self._lock:
+            for add, scope_key, thresholds in self._checks:
+                state = add(scope_key(order), timestamp, amount)
+                count, total = state[COUNT], state[TOTAL]
+                for max_orders, max_amount, rule in thresholds:
+                    if count > max_orders or total > max_amount:
+                        if hits is None:
+                            hits = []
+                        hits.append(rule)
+
+            self.inspected += 1
+            if hits is None:
+                return []
+
+            self.rule_hits.update(rule.name for rule in hits)
+            held_by = [rule.name for rule in hits if rule.action == 'hold']
+            if held_by:
+                self.held += 1
+        if held_by:
+            order.status = OrderStatus.HELD
+            order.hold_reason = ", ".join(held_by)
+        return [rule.name for rule in hits]
+
+    def get_metrics(self) -> Dict:
+        """Returns per-rule hit counts and global counters."""
+        with self._lock:
+            return {
+                "inspected": self.inspected,
+                "held": self.held,
+                "rule_hits": {rule.name: self.rule_hits.get(rule.name, 0) for rule in self.rules},
+                "tracked_keys": {f"{scope}:{int(window_seconds)}s": len(window)
+                                 for (scope, window_seconds), window in self.windows.items()}
+            }
@@ -0,0 +1,192 @@
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.models import OrderStatus
+from app.services.event_log import ChangeEvent
+
+# Orders whose commission counts towards a leaderboard by default: pending and held orders aren't validated yet
+COUNTED_STATUSES = (OrderStatus.CONFIRMED,)
+
+BoardKey = Tuple[str, str, str]
+
+
+def period_of(date: datetime) -> str:
+    """Returns the monthly period (YYYY-MM) of a date."""
+    return f"{date.year:04d}-{date.month:02d}"
+
+
+class Leaderboard:
+    """
+    Commission totals of one board, kept sorted from the highest.
+
+    Increases are placed right away with a binary search. Decreases
+    (cancelled or rejected orders) only mark the entry stale; stale entries
+    are moved to their new rank on the next read.
+    """
+
+    def __init__(self):
+        self.commissions: Dict[str, float] = {}
+        self.orders: Dict[str, int] = {}
+        self._ranking: List[Tuple[float, str]] = []
+        self._ranked_commissions: Dict[str, float] = {}
+        self._stale: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.commissions)
+
+    def add(self, entry: str, commission: float):
+        """Counts an order of an entry (publisher or advertiser)."""
+        self.commissions[entry] = self.commissions.get(entry, 0.0) + commission
+        self.orders[entry] = self.orders.get(entry, 0) + 1
+        self._rerank(entry)
+
+    def subtract(self, entry: str, commission: float):
+        """Uncounts an order of an entry; its rank is corrected lazily."""
+        if entry not in self.commissions:
+            return
+        self.commissions[entry] -= commission
+        self.orders[entry] -= 1
+        self._stale.add(entry)
+
+    def _rerank(self, entry: str):
+        """Moves an entry to its rank, removing it once none of its orders count anymore."""
+        self._stale.discard(entry)
+        ranked = self._ranked_commissions.pop(entry, None)
+        if ranked is not None:
+            del self._ranking[bisect_left(self._ranking, (-ranked, entry))]
+        if self.orders[entry] <= 0:
+            del self.commissions[entry], self.orders[entry]
+            return
+        commission = self._ranked_commissions[entry] = self.commissions[entry]
+        insort(self._ranking, (-commission, entry))
+
+    def top(self, limit: int) -> List[Tuple[str, float, int]]:
+        """
+        Returns the entries with the highest commission.
+
+        Args:
+            limit: Number of entries (N)
+
+        Returns:
+            (entry, commission, orders) tuples, highest commission first
+        """
+        for entry in list(self._stale):
+            self._rerank(entry)
+        return [(entry, -commission, self.orders[entry]) for commission, entry in self._ranking[:limit]]
+
+
+class LeaderboardService:
+    """
+    Top publishers per advertiser and top advertisers per category, by month.
+
+    Boards are fed by the order events of the change log, so no request
+    ever groups orders: orders reaching a counted status are added to the
+    boards of their month, and orders leaving it are taken off them.
+    """
+
+    def __init__(self, advertiser_service, retention_periods: int = 12,
+                 counted_statuses: Iterable[OrderStatus] = COUNTED_STATUSES):
+        """
+        Initializes the service.
+
+        Args:
+            advertiser_service: Service giving the advertisers' categories
+            retention_periods: Number of most recent months kept
+            counted_statuses: Statuses of the orders ranked (confirmed only by default)
+        """
+        self.advertiser_service = advertiser_service
+        self.retention_periods = retention_periods
+        self.counted_statuses = frozenset(OrderStatus(status).value for status in counted_statuses)
+        self.boards: Dict[BoardKey, Leaderboard] = {}
+        self._categories: Dict[str, Optional[str]] = {}
+        self._periods: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def attach(self, order_service, event_log):
+        """
+        Loads the orders of the retained months, then follows the change log.
+
+        Order writes are held meanwhile (hold_writes of the order service,
+        sharded or not), so no order is missed or counted twice.
+        """
+        now = datetime.now()
+        month = now.year * 12 + now.month - 1 - (self.retention_periods - 1)
+        from_date = datetime(month // 12, month % 12 + 1, 1)
+        with order_service.hold_writes():
+            for order in order_service.iter_orders(from_date):
+                if order.status.value in self.counted_statuses:
+                    self._count(order.publisher_id, order.advertiser_id, order.order_date, order.commission, 1)
+            event_log.subscribe(self.handle_event)
+
+    def _category(self, advertiser_id: str) -> Optional[str]:
+        if advertiser_id not in self._categories:
+            advertiser = self.advertiser_service.get_advertiser(advertiser_id)
+            self._categories[advertiser_id] = advertiser.category if advertiser else None
+        return self._categories[advertiser_id]
+
+    def _board(self, key: BoardKey) -> Leaderboard:
+        board = self.boards.get(key)
+        if board is None:
+            board = self.boards[key] = Leaderboard()
+            if key[2] not in self._periods:
+                self._periods.add(key[2])
+                self._expire_periods()
+        return board
+
+    def _expire_periods(self):
+        """Drops the boards of the months beyond retention."""
+        if len(self._periods) <= self.retention_periods:
+            return
+        kept = set(sorted(self._periods)[-self.retention_periods:])
+        self._periods = kept
+        self.boards = {key: board for key, board in self.boards.items() if key[2] in kept}
+
+    def _count(self, publisher_id: str, advertiser_id: str, order_date: datetime, commission: float, sign: int):
+        with self._lock:
+            period = period_of(order_date)
+            boards = [(('advertiser', advertiser_id, period), publisher_id)]
+            category = self._category(advertiser_id)
+            if category:
+                boards.append((('category', category, period), advertiser_id))
+            for key, entry in boards:
+                if sign > 0:
+                    self._board(key).add(entry, commission)
+                elif key in self.boards:
+                    self.boards[key].subtract(entry, commission)
+
+    def handle_event(self, event: ChangeEvent):
+        """Updates the boards from an order event (listener of the change log)."""
+        counted = self.counted_statuses
+        if event.type == "order.tracked":
+            sign = 1 if event.status in counted else 0
+        elif event.type == "order.status_changed":
+            sign = (event.status in counted) - (event.previous_status in counted)
+        else:
+            return
+        if sign:
+            self._count(event.publisher_id, event.advertiser_id, event.data["order_date"],
+                        event.data["commission"], sign)
+
+    def get_leaderboard(self, dimension: str, value: str, period: str, limit: int = 50) -> List[Dict]:
+        """
+        Returns the top entries of a board.
+
+        Args:
+            dimension: 'advertiser' (ranks its publishers) or 'category' (ranks its advertisers)
+            value: Advertiser ID or category
+            period: Month (YYYY-MM)
+            limit: Number of entries
+
+        Returns:
+            Ranked rows with commission and order count, empty if the board doesn't exist
+        """
+        entry_key = 'publisher_id' if dimension == 'advertiser' else 'advertiser_id'
+        with self._lock:
+            board = self.boards.get((dimension, value, period))
+            top = board.top(limit) if board else []
+        return [
+            {"rank": rank, entry_key: entry, "commission": round(commission, 2), "orders": orders}
+            for rank, (entry, commission, orders) in enumerate(top, start=1)
+        ]
@@ -0,0 +1,283 @@
+import json
+import os
+import pickle
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.models import Order, OrderStatus
+from app.utils.idempotency import BloomFilter
+from app.utils.mvcc import Version, prune_versions, visible_value
+
+SegmentKey = Tuple[int, int]
+
+FINAL_STATUSES = frozenset({OrderStatus.CONFIRMED, OrderStatus.CANCELLED, OrderStatus.REJECTED})
+
+_STATUSES = list(OrderStatus)
+_STATUS_CODES = {status: code for code, status in enumerate(_STATUSES)}
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_NO_DATE = -(2 ** 63)
+
+
+def segment_key(date: datetime) -> SegmentKey:
+    """Returns the (year, month) key of the segment holding a date."""
+    return date.year, date.month
+
+
+def segment_bounds(key: SegmentKey) -> Tuple[datetime, datetime]:
+    """Returns the start (inclusive) and end (exclusive) of a monthly segment."""
+    year, month = key
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def segment_overlaps(key: SegmentKey, from_date: Optional[datetime], to_date: Optional[datetime]) -> bool:
+    """Checks whether a segment may hold orders within [from_date, to_date]."""
+    start, end = segment_bounds(key)
+    if from_date and end <= from_date:
+        return False
+    if to_date and start > to_date:
+        return False
+    return True
+
+
+def _encode_date(date: Optional[datetime]) -> int:
+    return _NO_DATE if date is None else (date - _EPOCH) // _MICROSECOND
+
+
+def _decode_date(value: int) -> Optional[datetime]:
+    return None if value == _NO_DATE else _EPOCH + timedelta(microseconds=value)
+
+
+def _dictionary_encode(values: List[str]) -> Tuple[List[str], array]:
+    """Encodes a string column as a list of distinct values and an array of codes."""
+    dictionary: Dict[str, int] = {}
+    codes = array('I', (dictionary.setdefault(value, len(dictionary)) for value in values))
+    return list(dictionary), codes
+
+
+class HotSegment:
+    """
+    Orders of one month kept as live objects.
+
+    Orders are never mutated once stored: each order ID maps to a chain of
+    versions, so readers of an older snapshot keep seeing the orders as they
+    were, and the per-publisher ID arrays are append-only.
+    """
+
+    frozen = False
+
+    def __init__(self, key: SegmentKey):
+        self.key = key
+        self.versions: Dict[int, Version] = {}
+        self.publisher_orders: Dict[str, array] = {}
+        self.open_orders = 0
+
+    def __len__(self) -> int:
+        return len(self.versions)
+
+    @property
+    def orders(self) -> Dict[int, Order]:
+        """Latest version of the segment's orders."""
+        return {order_id: head.value for order_id, head in list(self.versions.items())}
+
+    def add(self, order: Order, version: int = 0):
+        """Stores a new order, visible from a snapshot version on."""
+        self.versions[order.id] = Version(order, version)
+        self.publisher_orders.setdefault(order.publisher_id, array('q')).append(order.id)
+        if order.status not in FINAL_STATUSES:
+            self.open_orders += 1
+
+    def replace(self, order: Order, version: int, oldest_pinned: int):
+        """
+        Stores a new version of an order.
+
+        Args:
+            order: Updated copy of the order
+            version: Snapshot version from which the update is visible
+            oldest_pinned: Oldest version still read; older versions are dropped
+        """
+        head = self.versions[order.id] = Version(order, version, self.versions[order.id])
+        prune_versions(head, oldest_pinned)
+
+    def status_changed(self, previous_status: OrderStatus, status: OrderStatus):
+        """Keeps the count of orders awaiting a final status up to date."""
+        self.open_orders += (previous_status in FINAL_STATUSES) - (status in FINAL_STATUSES)
+
+    def is_closed(self) -> bool:
+        """A segment is closed once all its orders have reached a final status."""
+        return self.open_orders == 0
+
+    def get_order(self, order_id: int, version: Optional[int] = None) -> Optional[Order]:
+        return visible_value(self.versions.get(order_id), version)
+
+    def iter_orders(self, version: Optional[int] = None) -> Iterator[Order]:
+        heads = list(self.versions.values())
+        return (order for order in (visible_value(head, version) for head in heads) if order is not None)
+
+    def iter_publisher_orders(self, publisher_id: str, version: Optional[int] = None) -> Iterator[Order]:
+        versions = self.versions
+        orders = (visible_value(versions[order_id], version)
+                  for order_id in self.publisher_orders.get(publisher_id, ()))
+        return (order for order in orders if order is not None)
+
+
+class FrozenSegment:
+    """
+    Orders of a closed month stored as compressed columns.
+
+    A frozen segment is immutable, so it reads the same at every snapshot
+    version. Only the per-publisher row numbers and a Bloom filter of the order IDs
+    stay resident; the columns are decompressed when a query touches the
+    segment. With a storage directory the compressed columns live on disk.
+    """
+
+    frozen = True
+
+    def __init__(self, key: SegmentKey, order_count: int, publisher_rows: Dict[str, array],
+                 id_filter: BloomFilter, blob: Optional[bytes] = None, path: Optional[str] = None):
+        self.key = key
+        self.order_count = order_count
+        self.publisher_rows = publisher_rows
+        self.id_filter = id_filter
+        self._blob = blob
+        self.path = path
+
+    def __len__(self) -> int:
+        return self.order_count
+
+    @classmethod
+    def from_hot(cls, segment: HotSegment, storage_dir: Optional[str] = None) -> "FrozenSegment":
+        """
+        Freezes a hot segment into compressed columns.
+
+        Args:
+            segment: Closed hot segment
+            storage_dir: Directory where the columns are written, kept in memory if None
+
+        Returns:
+            The frozen segment
+        """
+        orders = list(segment.orders.values())
+        columns = {
+            'id': array('q', (order.id for order in orders)),
+            'advertiser_id': _dictionary_encode([order.advertiser_id for order in orders]),
+            'publisher_id': _dictionary_encode([order.publisher_id for order in orders]),
+            'user_id': _dictionary_encode([order.user_id for order in orders]),
+            'amount': array('d', (order.amount for order in orders)),
+            'commission': array('d', (order.commission for order in orders)),
+            'status': bytes(_STATUS_CODES[order.status] for order in orders),
+            'order_date': array('q', (_encode_date(order.order_date) for order in orders)),
+            'validation_date': array('q', (_encode_date(order.validation_date) for order in orders)),
+            'closing_date': array('q', (_encode_date(order.closing_date) for order in orders)),
+            'tracking_params': json.dumps([order.tracking_params for order in orders]),
+            'hold_reason': [order.hold_reason for order in orders],
+        }
+        blob = zlib.compress(pickle.dumps(columns, protocol=pickle.HIGHEST_PROTOCOL), 6)
+
+        publisher_rows: Dict[str, array] = {}
+        id_filter = BloomFilter(len(orders))
+        for row, order in enumerate(orders):
+            publisher_rows.setdefault(order.publisher_id, array('I')).append(row)
+            id_filter.add(order.id)
+
+        path = None
+        if storage_dir:
+            year, month = segment.key
+            path = os.path.join(storage_dir, f"orders-{year:04d}-{month:02d}.seg")
+            # A segment frozen again can't overwrite the file older snapshots may still read
+            generation = 0
+            while os.path.exists(path):
+                generation += 1
+                path = os.path.join(storage_dir, f"orders-{year:04d}-{month:02d}.{generation}.seg")
+            with open(path, 'wb') as segment_file:
+                segment_file.write(blob)
+            blob = None
+
+        return cls(segment.key, len(orders), publisher_rows, id_filter, blob=blob, path=path)
+
+    @property
+    def compressed_size(self) -> int:
+        """Size in bytes of the compressed columns."""
+        if self._blob is not None:
+            return len(self._blob)
+        return os.path.getsize(self.path)
+
+    def _load_columns(self) -> Dict:
+        """Reads and decompresses the columns."""
+        blob = self._blob
+        if blob is None:
+            with open(self.path, 'rb') as segment_file:
+                blob = segment_file.read()
+        columns = pickle.loads(zlib.decompress(blob))
+        columns['tracking_params'] = json.loads(columns['tracking_params'])
+        return columns
+
+    @staticmethod
+    def _build_order(columns: Dict, row: int) -> Order:
+        advertiser_values, advertiser_codes = columns['advertiser_id']
+        publisher_values, publisher_codes = columns['publisher_id']
+        user_values, user_codes = columns['user_id']
+        return Order(
+            id=columns['id'][row],
+            advertiser_id=advertiser_values[advertiser_codes[row]],
+            publisher_id=publisher_values[publisher_codes[row]],
+            user_id=user_values[user_codes[row]],
+            amount=columns['amount'][row],
+            commission=columns['commission'][row],
+            status=_STATUSES[columns['status'][row]],
+            order_date=_decode_date(columns['order_date'][row]),
+            validation_date=_decode_date(columns['validation_date'][row]),
+            # Segment files written before the column existed have no closing dates
+            closing_date=_decode_date(columns['closing_date'][row]) if 'closing_date' in columns else None,
+            tracking_params=columns['tracking_params'][row],
+            hold_reason=columns['hold_reason'][row],
+        )
+
+    def get_order(self, order_id: int, version: Optional[int] = None) -> Optional[Order]:
+        if order_id not in self.id_filter:
+            return None
+        columns = self._load_columns()
+        try:
+            return self._build_order(columns, columns['id'].index(order_id))
+        except ValueError:
+            return None
+
+    def get_orders(self, order_ids: List[int]) -> List[Order]:
+        """Retrieves several orders of the segment with a single decompression."""
+        columns = self._load_columns()
+        rows = {order_id: row for row, order_id in enumerate(columns['id'])}
+        return [self._build_order(columns, rows[order_id]) for order_id in order_ids if order_id in rows]
+
+    def iter_orders(self, version: Optional[int] = None) -> Iterator[Order]:
+        columns = self._load_columns()
+        return (self._build_order(columns, row) for row in range(self.order_count))
+
+    def iter_publisher_orders(self, publisher_id: str, version: Optional[int] = None) -> Iterator[Order]:
+        rows = self.publisher_rows.get(publisher_id)
+        if not rows:
+            return iter(())
+        columns = self._load_columns()
+        return (self._build_order(columns, row) for row in rows)
+
+    def thaw(self, version: int = 0) -> HotSegment:
+        """
+        Rebuilds the hot segment, e.g. to update one of its orders.
+
+        The frozen segment stays readable by older snapshots until discarded.
+
+        Args:
+            version: Snapshot version from which the hot segment's orders are visible
+        """
+        segment = HotSegment(self.key)
+        for order in self.iter_orders():
+            segment.add(order, version)
+        return segment
+
+    def discard(self):
+        """Deletes the segment's file once no snapshot references it."""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,57 +1,217 @@
-import uuid
-from datetime import datetime
-from typing import Dict, List, Optional
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
 from app.models import Order, OrderStatus
 from app.services.application_service import ApplicationService
+from app.services.buyer_sketches import BuyerSketches
+from app.services.event_log import EventLog
+from app.services.fraud_service import FraudService
+from app.services.order_segments import (FrozenSegment, HotSegment, SegmentKey, segment_bounds, segment_key,
+                                         segment_overlaps)
+from app.services.tracking_index import TrackingParamIndex
+from app.utils.id_generator import IdGenerator, SnowflakeIdGenerator
+from app.utils.idempotency import IdempotencyCache
+from app.utils.mvcc import SnapshotManager
+
+
+class OrderSnapshot(NamedTuple):
+    """Immutable view of the order segments at one version."""
+
+    version: int
+    segments: Dict[SegmentKey, Union[HotSegment, FrozenSegment]]
+
 
 class OrderService:
     """
     Order management service
+
+    Orders are partitioned into monthly segments. Past months whose orders
+    have all reached a final status are frozen into compressed columns, so
+    only the hot window is kept as live objects. Freezing runs in one batch
+    on the first write of each month, and after a frozen month was thawed
+    by an update once ``refreeze_delay`` has passed.
+
+    Writes are serialized and publish a new OrderSnapshot; reads pin the
+    current one and never take a lock, so a long listing sees a consistent
+    state without stalling order tracking.
     """
 
-    def __init__(self, application_service: ApplicationService):
+    def __init__(self, application_service: ApplicationService,
+                 idempotency_cache: Optional[IdempotencyCache] = None,
+                 fraud_service: Optional[FraudService] = None,
+                 cold_storage_dir: Optional[str] = None,
+                 tracking_index: Optional[TrackingParamIndex] = None,
+                 event_log: Optional[EventLog] = None,
+                 id_generator: Optional[IdGenerator] = None,
+                 publisher_filter: Optional[Callable[[str], bool]] = None,
+                 buyer_sketches: Optional[BuyerSketches] = None,
+                 refreeze_delay: timedelta = timedelta(hours=1)):
         """
         Initializes the service.
 
         Args:
             application_service: Service for verifying access to advertisers
+            idempotency_cache: Cache of recent idempotency keys used to deduplicate replays
+            fraud_service: Velocity detector run on every tracked order, if any
+            cold_storage_dir: Directory for frozen segments, kept in memory if None
+            tracking_index: Inverted index of the orders' tracking parameters
+            event_log: Change log receiving order events, if any
+            id_generator: Source of the time-ordered order IDs
+            publisher_filter: Publishers whose sample orders are loaded, all if None (used by shards)
+            buyer_sketches: Distinct buyer counters per publisher, advertiser and day
+            refreeze_delay: Time a thawed segment stays hot, so bursts of updates thaw it only once
         """
         self.application_service = application_service
-        self.orders: Dict[str, Order] = {}
-        self.publisher_orders: Dict[str, List[str]] = {}
+        self.orders: Dict[int, Order] = {}
+        self.snapshots = SnapshotManager(OrderSnapshot(0, {}))
+        self.cold_storage_dir = cold_storage_dir
+        self.tracking_index = tracking_index or TrackingParamIndex()
+        self.buyer_sketches = buyer_sketches or BuyerSketches()
+        self.event_log = event_log
+        self.idempotency_cache = idempotency_cache or IdempotencyCache()
+        self.fraud_service = fraud_service
+        self.id_generator = id_generator or SnowflakeIdGenerator()
+        self.refreeze_delay = refreeze_delay
+        self._next_freeze = datetime.min
 
-        self._load_sample_data()
+        self._load_sample_data(publisher_filter)
+        self._freeze_if_due(datetime.now())
 
-    def _load_sample_data(self):
+    def _load_sample_data(self, publisher_filter: Optional[Callable[[str], bool]] = None):
         """Load sample orders for testing."""
+        sample_date = datetime(2025, 2, 28, 10, 0)
         sample_orders = [
             Order(
-                id=str(uuid.uuid4()),
+                id=self.id_generator.next_id(at=sample_date),
                 advertiser_id="user_1",
                 publisher_id="publisher_1",
                 user_id="1",
                 amount=129.99,
                 commission=6.50,
                 status=OrderStatus.CONFIRMED,
-                order_date=datetime(2025, 2, 28, 10, 0),
+                order_date=sample_date,
                 validation_date=datetime.now(),
                 tracking_params={"campaign": "summer_sale"}
             ),
             Order(
-                id=str(uuid.uuid4()),
+                id=self.id_generator.next_id(at=sample_date),
                 advertiser_id="user_2",
                 publisher_id="publisher_2",
                 user_id="2",
                 amount=49.99,
                 commission=2.50,
                 status=OrderStatus.PENDING,
-                order_date=datetime(2025, 2, 28, 10, 0),
+                order_date=sample_date,
                 tracking_params={"campaign": "flash_sale", "source": "mobile_app"}
             )
         ]
         for order in sample_orders:
+            if publisher_filter and not publisher_filter(order.publisher_id):
+                continue
+            self._store_order(order)
+
+    @property
+    def segments(self) -> Dict[SegmentKey, Union[HotSegment, FrozenSegment]]:
+        """Segments of the current snapshot, oldest first."""
+        return self.snapshots.current.segments
+
+    def _store_order(self, order: Order):
+        """Stores an order in the hot segment of its month."""
+        with self.snapshots.write_lock:
+            version = self.snapshots.current.version + 1
+            segments = self.segments
+            key = segment_key(order.order_date)
+            segment = segments.get(key)
+            if segment is None:
+                segment = HotSegment(key)
+                segments = dict(sorted({**segments, key: segment}.items()))
+            elif segment.frozen:
+                segments, segment = self._thaw_segment(key, version)
+            segment.add(order, version)
             self.orders[order.id] = order
-            self.publisher_orders.setdefault(order.publisher_id, []).append(order.id)
+            self.tracking_index.add(order)
+            self.buyer_sketches.add(order)
+            self.snapshots.publish(OrderSnapshot(version, segments))
+
+    def _thaw_segment(self, key: SegmentKey, version: int):
+        """
+        Turns a frozen segment back into live orders (writers only).
+
+        Returns:
+            The segments of the next snapshot and the thawed segment
+        """
+        frozen = self.segments[key]
+        segment = frozen.thaw(version)
+        self.orders.update(segment.orders)
+        self.snapshots.retire(frozen.discard)
+        self._next_freeze = min(self._next_freeze, datetime.now() + self.refreeze_delay)
+        return {**self.segments, key: segment}, segment
+
+    def freeze_closed_segments(self, now: Optional[datetime] = None) -> int:
+        """
+        Freezes past segments whose orders all reached a final status.
+
+        The write lock is taken for one segment at a time, so order tracking
+        only waits for the freezing of one month.
+
+        Args:
+            now: Current date, segments of its month are never frozen
+
+        Returns:
+            Number of segments frozen
+        """
+        current_key = segment_key(now or datetime.now())
+        return sum(self._freeze_segment(key) for key in list(self.segments) if key < current_key)
+
+    def _freeze_if_due(self, now: datetime):
+        """Freezes the closed segments on the first write of a month, or once a thawed segment's delay passed."""
+        if now < self._next_freeze:
+            return
+        with self.snapshots.write_lock:
+            if now < self._next_freeze:
+                return
+            self._next_freeze = segment_bounds(segment_key(now))[1]
+        self.freeze_closed_segments(now)
+
+    def _freeze_segment(self, key: SegmentKey) -> bool:
+        """
+        Freezes a hot segment if it is closed, returning whether it was frozen.
+
+        Readers of older snapshots keep reading the hot segment.
+        """
+        with self.snapshots.write_lock:
+            snapshot = self.snapshots.current
+            segment = snapshot.segments[key]
+            if segment.frozen or not segment.is_closed():
+                return False
+            frozen = FrozenSegment.from_hot(segment, self.cold_storage_dir)
+            self.snapshots.publish(OrderSnapshot(snapshot.version + 1, {**snapshot.segments, key: frozen}))
+            for order_id in segment.versions:
+                del self.orders[order_id]
+            return True
+
+    def iter_orders(self, from_date: Optional[datetime] = None,
+                    to_date: Optional[datetime] = None) -> Iterator[Order]:
+        """
+        Streams all orders of the segments overlapping a date range.
+
+        Args:
+            from_date: Start of the range
+            to_date: End of the range
+
+        Returns:
+            An iterator over the orders within the range, oldest segments first
+        """
+        with self.snapshots.pin() as snapshot:
+            for key, segment in snapshot.segments.items():
+                if not segment_overlaps(key, from_date, to_date):
+                    continue
+                for order in segment.iter_orders(snapshot.version):
+                    if from_date and order.order_date < from_date:
+                        continue
+                    if to_date and order.order_date > to_date:
+                        continue
+                    yield order
 
     def _filter_orders(self, orders: List[Order], advertiser_id: Optional[str], from_date: Optional[datetime],
                         to_date: Optional[datetime]) -> List[Order]:
@@ -68,25 +228,54 @@ class OrderService:
         return filtered_orders
 
     def get_orders_for_publisher(self, publisher_id: str, advertiser_id: Optional[str] = None,
-                                from_date: Optional[datetime] = None, to_date: Optional[datetime] = None) -> List[Order]:
+                                from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                                after_id: Optional[int] = None, limit: Optional[int] = None) -> List[Order]:
         """
         Retrieves orders for a publisher with optional filtering.
 
-        This method uses a generator to efficiently handle large datasets.
+        Segments outside the date range are pruned before any order is read,
+        so frozen months are only decompressed when the range touches them.
+        IDs follow order dates, so a pagination cursor (`after_id`) also
+        prunes the segments older than the last page.
+
+        Args:
+            publisher_id: Publisher identifier
+            advertiser_id: Only return the orders of this advertiser
+            from_date: Start of the date range
+            to_date: End of the date range
+            after_id: Only return orders with a greater ID (last ID of the previous page)
+            limit: Maximum number of orders, oldest first
+
+        Returns:
+            The orders, sorted by ID when paginating
         """
-        if publisher_id not in self.publisher_orders:
-            return []
+        if after_id is not None:
+            cursor_date = self.id_generator.datetime_of(after_id)
+            from_date = max(from_date, cursor_date) if from_date else cursor_date
 
-        publisher_order_ids = self.publisher_orders[publisher_id]
-        orders = (self.orders[order_id] for order_id in publisher_order_ids)
-        filtered_orders = self._filter_orders(list(orders), advertiser_id, from_date, to_date)
+        orders = []
+        with self.snapshots.pin() as snapshot:
+            for key, segment in snapshot.segments.items():
+                if segment_overlaps(key, from_date, to_date):
+                    orders.extend(segment.iter_publisher_orders(publisher_id, snapshot.version))
+        filtered_orders = self._filter_orders(orders, advertiser_id, from_date, to_date)
 
-        return [
-            order for order in filtered_orders
-            if self.application_service.check_publisher_access(publisher_id, order.advertiser_id)
-        ]
+        access = {}
+        for order in filtered_orders:
+            if order.advertiser_id not in access:
+                access[order.advertiser_id] = self.application_service.check_publisher_access(
+                    publisher_id, order.advertiser_id)
+        orders = [order for order in filtered_orders if access[order.advertiser_id]]
+
+        if after_id is not None or limit is not None:
+            orders.sort(key=lambda order: order.id)
+            if after_id is not None:
+                orders = [order for order in orders if order.id > after_id]
+            if limit is not None:
+                orders = orders[:limit]
+        return orders
 
-    def get_order(self, order_id: str) -> Optional[Order]:
+    def get_order(self, order_id: int) -> Optional[Order]:
         """
         Retrieves an order by its identifier.
 
@@ -96,10 +285,157 @@ class OrderService:
         Returns:
             The corresponding order, or None if it doesn't exist.
         """
-        return self.orders.get(order_id)
+        order = self.orders.get(order_id)
+        if order is not None:
+            return order
+
+        with self.snapshots.pin() as snapshot:
+            # The ID gives the order's month; other frozen segments are only checked for imported IDs
+            segment = snapshot.segments.get(segment_key(self.id_generator.datetime_of(order_id)))
+            if segment is not None and segment.frozen:
+                order = segment.get_order(order_id)
+                if order is not None:
+                    return order
+            for segment in snapshot.segments.values():
+                if segment.frozen:
+                    order = segment.get_order(order_id)
+                    if order is not None:
+                        return order
+        return None
+
+    def get_orders_by_ids(self, order_ids: Iterable[int], from_date: Optional[datetime] = None,
+                          to_date: Optional[datetime] = None) -> List[Order]:
+        """
+        Retrieves many orders at once.
+
+        Live orders are looked up directly; the others are read from the frozen
+        segments overlapping the date range, each decompressed at most once.
+
+        Args:
+            order_ids: Order identifiers
+            from_date: Start of the date range the orders belong to
+            to_date: End of the date range the orders belong to
+
+        Returns:
+            The orders found within the date range
+        """
+        orders = []
+        missing = []
+        for order_id in order_ids:
+            order = self.orders.get(order_id)
+            if order is None:
+                missing.append(order_id)
+            else:
+                orders.append(order)
+
+        with self.snapshots.pin() as snapshot:
+            for key, segment in snapshot.segments.items():
+                if not missing:
+                    break
+                if not segment.frozen or not segment_overlaps(key, from_date, to_date):
+                    continue
+                candidates = [order_id for order_id in missing if order_id in segment.id_filter]
+                if candidates:
+                    found = segment.get_orders(candidates)
+                    orders.extend(found)
+                    found_ids = {order.id for order in found}
+                    missing = [order_id for order_id in missing if order_id not in found_ids]
+
+        return [
+            order for order in orders
+            if (not from_date or order.order_date >= from_date) and (not to_date or order.order_date <= to_date)
+        ]
+
+    def _publish(self, event_type: str, order: Order, previous_status: Optional[OrderStatus] = None):
+        """Appends an order event to the change log."""
+        if self.event_log is None:
+            return
+        self.event_log.append(
+            event_type, order.publisher_id, order.advertiser_id, order.id, order.status.value,
+            previous_status=previous_status.value if previous_status else None,
+            data={"amount": order.amount, "commission": order.commission, "order_date": order.order_date}
+        )
+
+    def update_order_status(self, order_id: int, status: OrderStatus) -> Optional[Order]:
+        """
+        Changes the status of an order.
+
+        Confirmed orders get a validation date, cancelled and rejected orders
+        a closing date. Orders held for fraud review can't be confirmed until
+        released (set back to pending, which clears the hold reason), but can
+        be cancelled or rejected. The order is replaced by an updated copy, so readers
+        of older snapshots keep the previous version.
+        Updating an order of a frozen segment thaws it; the segment is frozen
+        again, with any other closed one, once ``refreeze_delay`` has passed.
+
+        Args:
+            order_id: Order identifier
+            status: New status
+
+        Returns:
+            The updated order, or None if it doesn't exist.
+
+        Raises:
+            ValueError: If a held order is confirmed
+        """
+        with self.snapshots.write_lock:
+            order = self.get_order(order_id)
+            if order is None:
+                return None
+            if order.status == OrderStatus.HELD and status == OrderStatus.CONFIRMED:
+                raise ValueError("Held orders must be released before being confirmed")
+
+            version = self.snapshots.current.version + 1
+            segments = self.segments
+            key = segment_key(order.order_date)
+            segment = segments[key]
+            if segment.frozen:
+                segments, segment = self._thaw_segment(key, version)
+
+            previous_status = order.status
+            order = replace(order, status=status)
+            if status == OrderStatus.CONFIRMED:
+                # A cancelled or rejected order confirmed again is payable from its new validation date
+                order.validation_date, order.closing_date = datetime.now(), None
+            elif status == OrderStatus.PENDING:
+                order.hold_reason = None
+            elif status in (OrderStatus.CANCELLED, OrderStatus.REJECTED):
+                order.closing_date = datetime.now()
+            segment.replace(order, version, self.snapshots.oldest_pinned())
+            self.orders[order_id] = order
+            segment.status_changed(previous_status, status)
+            self.snapshots.publish(OrderSnapshot(version, segments))
+            self._publish("order.status_changed", order, previous_status)
+
+        self._freeze_if_due(datetime.now())
+        return order
+
+    def hold_writes(self):
+        """
+        Holds order writes while the returned context is entered, e.g. for a
+        listener loading the orders before subscribing to their events.
+        """
+        return self.snapshots.write_lock
+
+    def get_order_by_idempotency_key(self, advertiser_id: str, idempotency_key: str) -> Optional[Order]:
+        """
+        Retrieves the order already tracked for an idempotency key.
+
+        Keys are scoped by advertiser, since order references are supplied by the advertiser.
+
+        Args:
+            advertiser_id: Advertiser identifier
+            idempotency_key: Advertiser order reference or Idempotency-Key header
+
+        Returns:
+            The original order, or None if the key hasn't been seen recently.
+        """
+        order_id = self.idempotency_cache.get(f"{advertiser_id}:{idempotency_key}")
+        return self.get_order(order_id) if order_id else None
 
     def track_order(self, advertiser_id: str, publisher_id: str, user_id: str, amount: float,
-                    tracking_params: Optional[Dict[str, str]] = None) -> Optional[Order]:
+                    tracking_params: Optional[Dict[str, str]] = None,
+                    idempotency_key: Optional[str] = None) -> Optional[Order]:
         """
         Create and track a new order, ensuring the publisher has access to the advertiser.
 
@@ -109,15 +445,21 @@ class OrderService:
             user_id: User identifier
             amount: Order amount
             tracking_params: Additional tracking parameters
+            idempotency_key: Optional key; replays return the original order
 
         Returns:
-            Order created or None in case of error
+            Order created (or the original order on replay) or None in case of error
         """
+        if idempotency_key:
+            existing_order = self.get_order_by_idempotency_key(advertiser_id, idempotency_key)
+            if existing_order:
+                return existing_order
+
         if not self.application_service.check_publisher_access(publisher_id, advertiser_id):
             return None
 
         commission = amount * 0.05
-        order_id = str(uuid.uuid4())
+        order_id = self.id_generator.next_id()
         order = Order(
             id=order_id,
             advertiser_id=advertiser_id,
@@ -125,10 +467,23 @@ class OrderService:
             user_id=user_id,
             amount=amount,
             commission=commission,
+            order_date=self.id_generator.datetime_of(order_id),
             tracking_params=tracking_params or {}
         )
+        if self.fraud_service:
+            self.fraud_service.inspect(order)
 
-        self.orders[order_id] = order
-        self.publisher_orders.setdefault(publisher_id, []).append(order_id)
+        # Events are published under the write lock, in the order of the snapshot versions
+        with self.snapshots.write_lock:
+            if idempotency_key:
+                # A concurrent retry with the same key may have stored the order since the check above
+                existing_order = self.get_order_by_idempotency_key(advertiser_id, idempotency_key)
+                if existing_order:
+                    return existing_order
+            self._store_order(order)
+            if idempotency_key:
+                self.idempotency_cache.put(f"{advertiser_id}:{idempotency_key}", order_id)
+            self._publish("order.tracked", order)
 
+        self._freeze_if_due(order.order_date)
         return order
@@ -0,0 +1,314 @@
+import csv
+import json
+import multiprocessing
+import os
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.models import Order, OrderStatus
+from app.services.sharding import shard_for
+
+STATEMENT_FORMATS = ('ndjson', 'csv')
+CSV_COLUMNS = ('publisher_id', 'advertiser_id', 'confirmed_orders', 'confirmed_amount', 'commission',
+               'cancelled_orders', 'rejected_orders', 'adjustments', 'net_commission')
+CHECKPOINT_FILE = 'checkpoint.json'
+
+# Order rows sent to the workers: (publisher_id, advertiser_id, kind, amount, commission)
+OrderRow = Tuple[str, str, str, float, float]
+# Totals of one (publisher, advertiser): confirmed orders, confirmed amount, commission,
+# cancelled orders, rejected orders, adjustments
+Totals = List[float]
+PairKey = Tuple[str, str]
+
+# Row kinds: commission paid, commission taken back, order of the period cancelled or rejected
+PAID = 'paid'
+CLAWBACK = 'clawback'
+_CANCELLED = OrderStatus.CANCELLED.value
+_REJECTED = OrderStatus.REJECTED.value
+
+
+def aggregate_rows(rows: List[OrderRow]) -> Dict[PairKey, Totals]:
+    """
+    Map step: totals of a chunk of order rows per (publisher, advertiser).
+
+    Paid rows add to the confirmed totals, clawback rows take their
+    commission back as a negative adjustment, and cancelled or rejected
+    rows are only counted.
+    """
+    totals: Dict[PairKey, Totals] = {}
+    for publisher_id, advertiser_id, kind, amount, commission in rows:
+        pair = totals.get((publisher_id, advertiser_id))
+        if pair is None:
+            pair = totals[(publisher_id, advertiser_id)] = [0, 0.0, 0.0, 0, 0, 0.0]
+        if kind == PAID:
+            pair[0] += 1
+            pair[1] += amount
+            pair[2] += commission
+        elif kind == CLAWBACK:
+            pair[5] -= commission
+        elif kind == _CANCELLED or kind == _REJECTED:
+            pair[3 if kind == _CANCELLED else 4] += 1
+    return totals
+
+
+def is_payable(order: Order, date: datetime) -> bool:
+    """Whether an order's commission was due at a date: confirmed before it, and not cancelled or rejected yet."""
+    return (order.validation_date is not None and order.validation_date < date
+            and (order.closing_date is None or order.closing_date >= date))
+
+
+def statement_row_kind(order: Order, period_start: datetime, period_end: datetime) -> Optional[str]:
+    """
+    Classifies an order for the statement of a period, from its dates as of
+    the period's bounds rather than its current status, so a statement is
+    the same whenever it is generated.
+
+    Statements of consecutive periods pay what became payable during the
+    period (including orders of earlier months confirmed late) and claw
+    back what stopped being payable. Orders of the period cancelled or
+    rejected before its end are only counted.
+
+    Returns:
+        PAID, CLAWBACK, the cancelled or rejected status value, or None if the order isn't on the statement
+    """
+    payable_before, payable_after = is_payable(order, period_start), is_payable(order, period_end)
+    if payable_after != payable_before:
+        return PAID if payable_after else CLAWBACK
+    if order.order_date >= period_start and order.closing_date is not None and order.closing_date < period_end \
+            and order.status.value in (_CANCELLED, _REJECTED):
+        return order.status.value
+    return None
+
+
+def merge_totals(target: Dict[PairKey, Totals], partial: Dict[PairKey, Totals]):
+    """Reduce step: adds the totals of a chunk to the totals of its partition."""
+    for key, values in partial.items():
+        totals = target.get(key)
+        if totals is None:
+            target[key] = values
+        else:
+            for index, value in enumerate(values):
+                totals[index] += value
+
+
+def build_statements(totals: Dict[PairKey, Totals], period_start: datetime,
+                     period_end: datetime) -> List[Dict]:
+    """Turns (publisher, advertiser) totals into one statement per publisher, sorted by publisher."""
+    statements: Dict[str, Dict] = {}
+    for (publisher_id, advertiser_id), values in sorted(totals.items()):
+        confirmed_orders, confirmed_amount, commission, cancelled_orders, rejected_orders, adjustments = values
+        statement = statements.get(publisher_id)
+        if statement is None:
+            statement = statements[publisher_id] = {
+                "publisher_id": publisher_id,
+                "period_start": period_start.isoformat(),
+                "period_end": period_end.isoformat(),
+                "advertisers": [],
+                "commission": 0.0,
+                "adjustments": 0.0,
+                "net_commission": 0.0,
+            }
+        statement["advertisers"].append({
+            "advertiser_id": advertiser_id,
+            "confirmed_orders": int(confirmed_orders),
+            "confirmed_amount": round(confirmed_amount, 2),
+            "commission": round(commission, 2),
+            "cancelled_orders": int(cancelled_orders),
+            "rejected_orders": int(rejected_orders),
+            "adjustments": round(adjustments, 2),
+            "net_commission": round(commission + adjustments, 2),
+        })
+        statement["commission"] = round(statement["commission"] + commission, 2)
+        statement["adjustments"] = round(statement["adjustments"] + adjustments, 2)
+        statement["net_commission"] = round(statement["commission"] + statement["adjustments"], 2)
+    return list(statements.values())
+
+
+def _write_atomically(path: str, write):
+    """Writes a file through a temporary one, so readers and reruns never see a partial file."""
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w', newline='', encoding='utf-8') as output:
+        write(output)
+    os.replace(temporary_path, path)
+
+
+def write_statements(statements: List[Dict], path: str, statement_format: str):
+    """Writes statements as NDJSON (one publisher per line) or CSV (one advertiser per row)."""
+    def write(output):
+        if statement_format == 'ndjson':
+            for statement in statements:
+                output.write(json.dumps(statement) + "\n")
+            return
+        writer = csv.writer(output)
+        writer.writerow(CSV_COLUMNS)
+        for statement in statements:
+            for line in statement["advertisers"]:
+                writer.writerow([statement["publisher_id"]] + [line[column] for column in CSV_COLUMNS[1:]])
+
+    _write_atomically(path, write)
+
+
+class PayoutService:
+    """
+    Month-end payout statements of every publisher.
+
+    The orders of a closed period and of the previous `lookback_months`
+    months are streamed once from a pinned snapshot; each is classified from
+    its validation and closing dates (see statement_row_kind), so earlier
+    orders confirmed during the period are paid and paid ones cancelled
+    during the period are clawed back.
+    Rows are partitioned by publisher and aggregated per (publisher,
+    advertiser) in chunks on a process pool (map), the partial totals are
+    merged per partition (reduce), and each partition's statements are
+    written to one file. A checkpoint lists the partitions written, so a
+    rerun of the same job skips them.
+    """
+
+    def __init__(self, order_service, workers: Optional[int] = None, partitions: int = 16,
+                 chunk_size: int = 20_000, lookback_months: int = 12):
+        """
+        Initializes the service.
+
+        Args:
+            order_service: Service owning the orders
+            workers: Worker processes, one per CPU if None; 0 aggregates in-process
+            partitions: Number of publisher partitions (and statement files)
+            chunk_size: Orders per aggregation task
+            lookback_months: Months before the period whose orders can be paid late or clawed back
+        """
+        self.order_service = order_service
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.partitions = partitions
+        self.chunk_size = chunk_size
+        self.lookback_months = lookback_months
+
+    def _load_checkpoint(self, path: str, job: Dict) -> List[int]:
+        """Returns the partitions already written by the same job."""
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding='utf-8') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint.get('job') != job:
+            raise ValueError("Output directory holds statements of another job")
+        return checkpoint['completed']
+
+    def _save_checkpoint(self, path: str, job: Dict, completed: List[int]):
+        _write_atomically(path, lambda output: json.dump({'job': job, 'completed': sorted(completed)}, output))
+
+    def generate_statements(self, period_start: datetime, period_end: datetime, output_dir: str,
+                            statement_format: str = 'ndjson', now: Optional[datetime] = None) -> Dict:
+        """
+        Computes and writes the statements of a closed period.
+
+        Args:
+            period_start: Start of the period (inclusive)
+            period_end: End of the period (exclusive)
+            output_dir: Directory of the statement files and checkpoint
+            statement_format: 'ndjson' or 'csv'
+            now: Current date, the period must have ended before it
+
+        Returns:
+            Summary with the orders read, statements and files written, and skipped partitions
+
+        Raises:
+            ValueError: If the period isn't closed, the format unknown, or the
+                directory holds another job's checkpoint
+        """
+        if statement_format not in STATEMENT_FORMATS:
+            raise ValueError(f"Unknown statement format: {statement_format}")
+        if period_end <= period_start or period_end > (now or datetime.now()):
+            raise ValueError("Statements can only be generated for a closed period")
+
+        os.makedirs(output_dir, exist_ok=True)
+        job = {
+            'period_start': period_start.isoformat(),
+            'period_end': period_end.isoformat(),
+            'format': statement_format,
+            'partitions': self.partitions,
+        }
+        checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+        completed = self._load_checkpoint(checkpoint_path, job)
+        pending = set(range(self.partitions)) - set(completed)
+
+        totals: Dict[int, Dict[PairKey, Totals]] = {partition: {} for partition in pending}
+        orders_read = 0
+        if pending:
+            executor = self._create_executor()
+            try:
+                orders_read = self._map_reduce(executor, period_start, period_end, pending, totals)
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+
+        statements = 0
+        for partition in sorted(pending):
+            partition_statements = build_statements(totals.pop(partition), period_start, period_end)
+            write_statements(partition_statements, self.statement_path(output_dir, partition, statement_format),
+                             statement_format)
+            statements += len(partition_statements)
+            completed.append(partition)
+            self._save_checkpoint(checkpoint_path, job, completed)
+
+        return {
+            "orders": orders_read,
+            "statements": statements,
+            "files_written": len(pending),
+            "partitions_skipped": self.partitions - len(pending),
+        }
+
+    @staticmethod
+    def statement_path(output_dir: str, partition: int, statement_format: str) -> str:
+        return os.path.join(output_dir, f"statements-{partition:04d}.{statement_format}")
+
+    def _create_executor(self) -> Optional[Executor]:
+        if self.workers <= 0:
+            return None
+        # Spawned workers don't inherit the app's threads and locks
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _map_reduce(self, executor: Optional[Executor], period_start: datetime, period_end: datetime,
+                    pending: set, totals: Dict[int, Dict[PairKey, Totals]]) -> int:
+        """Streams the period's orders into per-partition chunks and merges their aggregates."""
+        buffers: Dict[int, List[OrderRow]] = {partition: [] for partition in pending}
+        in_flight = {}
+        orders_read = 0
+
+        def submit(partition: int):
+            rows, buffers[partition] = buffers[partition], []
+            if executor is None:
+                merge_totals(totals[partition], aggregate_rows(rows))
+                return
+            # Bounded number of chunks in flight, so the stream doesn't outrun the workers
+            while len(in_flight) >= 2 * self.workers:
+                collect(FIRST_COMPLETED)
+            in_flight[executor.submit(aggregate_rows, rows)] = partition
+
+        def collect(return_when):
+            done, _ = wait(in_flight, return_when=return_when)
+            for future in done:
+                merge_totals(totals[in_flight.pop(future)], future.result())
+
+        month = period_start.year * 12 + period_start.month - 1 - self.lookback_months
+        lookback_start = datetime(month // 12, month % 12 + 1, 1)
+        for order in self.order_service.iter_orders(lookback_start, period_end):
+            if order.order_date >= period_end or (order.validation_date is None and order.closing_date is None):
+                continue
+            kind = statement_row_kind(order, period_start, period_end)
+            if kind is None:
+                continue
+            partition = shard_for(order.publisher_id, self.partitions)
+            if partition not in buffers:
+                continue
+            orders_read += 1
+            buffer = buffers[partition]
+            buffer.append((order.publisher_id, order.advertiser_id, kind, order.amount, order.commission))
+            if len(buffer) >= self.chunk_size:
+                submit(partition)
+
+        for partition in pending:
+            if buffers[partition]:
+                submit(partition)
+        if in_flight:
+            collect(ALL_COMPLETED)
+        return orders_read
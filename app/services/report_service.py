@@ -0,0 +1,101 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.models import OrderStatus
+from app.services.buyer_sketches import unique_buyers_report
+from app.services.order_service import OrderService
+
+
+class ReportService:
+    """
+    Performance reports computed from the order indexes.
+    """
+
+    def __init__(self, order_service: OrderService):
+        """
+        Initializes the service.
+
+        Args:
+            order_service: Service owning the orders and their indexes
+        """
+        self.order_service = order_service
+
+    def get_campaign_report(self, publisher_id: str, group_by: str = "campaign",
+                            filters: Sequence[Tuple[str, str]] = (), advertiser_id: Optional[str] = None,
+                            from_date: Optional[datetime] = None,
+                            to_date: Optional[datetime] = None) -> List[Dict]:
+        """
+        Aggregates a publisher's orders by the value of a tracking parameter.
+
+        Only the orders listed in the tracking parameter index for the group key
+        (and matching every filter) are read.
+
+        Args:
+            publisher_id: Publisher identifier
+            group_by: Tracking parameter key to group by (e.g. campaign)
+            filters: (key, value) tracking parameters the orders must all have
+            advertiser_id: Restrict to one advertiser
+            from_date: Start date
+            to_date: End date
+
+        Returns:
+            One row per value with order count, amount and commissions, highest commission first
+        """
+        index = self.order_service.tracking_index
+        matches = index.match(publisher_id, filters)
+        application_service = self.order_service.application_service
+        access = {}
+
+        rows = []
+        for value, order_ids in index.groups(publisher_id, group_by):
+            if matches is not None:
+                order_ids = [order_id for order_id in order_ids if order_id in matches]
+            if not order_ids:
+                continue
+
+            row = {"value": value, "orders": 0, "amount": 0.0, "commission": 0.0, "confirmed_commission": 0.0}
+            for order in self.order_service.get_orders_by_ids(order_ids, from_date, to_date):
+                if advertiser_id and order.advertiser_id != advertiser_id:
+                    continue
+                if order.advertiser_id not in access:
+                    access[order.advertiser_id] = application_service.check_publisher_access(
+                        publisher_id, order.advertiser_id)
+                if not access[order.advertiser_id] or \
+                        order.status in (OrderStatus.CANCELLED, OrderStatus.REJECTED):
+                    continue
+                row["orders"] += 1
+                row["amount"] += order.amount
+                row["commission"] += order.commission
+                if order.status == OrderStatus.CONFIRMED:
+                    row["confirmed_commission"] += order.commission
+            if row["orders"]:
+                rows.append(row)
+
+        for row in rows:
+            for field in ("amount", "commission", "confirmed_commission"):
+                row[field] = round(row[field], 2)
+        return sorted(rows, key=lambda row: row["commission"], reverse=True)
+
+    def daily_buyer_sketches(self, publisher_id: Optional[str] = None, advertiser_id: Optional[str] = None,
+                             from_date: Optional[datetime] = None, to_date: Optional[datetime] = None) -> Dict:
+        """Merged distinct buyer sketches of each day, e.g. to merge them with other shards'."""
+        return self.order_service.buyer_sketches.daily_sketches(publisher_id, advertiser_id, from_date, to_date)
+
+    def get_unique_buyers(self, publisher_id: Optional[str] = None, advertiser_id: Optional[str] = None,
+                          from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                          by_day: bool = False) -> Dict:
+        """
+        Estimates the distinct buyers of a publisher and/or advertiser.
+
+        Args:
+            publisher_id: Publisher identifier
+            advertiser_id: Advertiser identifier
+            from_date: Start date (whole days)
+            to_date: End date (whole days)
+            by_day: Also estimate each day
+
+        Returns:
+            The estimate and its relative standard error, and the daily estimates if requested
+        """
+        daily = self.daily_buyer_sketches(publisher_id, advertiser_id, from_date, to_date)
+        return unique_buyers_report(daily, self.order_service.buyer_sketches.precision, by_day)
@@ -0,0 +1,435 @@
+import heapq
+import inspect
+import multiprocessing
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.models import ApplicationStatus, OrderStatus
+from app.services.buyer_sketches import unique_buyers_report
+from app.utils.hyperloglog import DEFAULT_PRECISION
+from app.utils.id_generator import SnowflakeIdGenerator
+
+MAX_BATCH_SIZE = 256
+CALL_TIMEOUT = 30.0
+
+# Config keys passed to the shard processes
+SHARD_CONFIG_KEYS = ('SHARD_ID', 'ORDER_COLD_STORAGE_DIR', 'EVENT_LOG_RETENTION')
+
+
+def shard_for(publisher_id: str, shard_count: int) -> int:
+    """Returns the shard owning a publisher (stable across processes and restarts)."""
+    return zlib.crc32(publisher_id.encode()) % shard_count
+
+
+class _ForwardingEventLog:
+    """
+    Event log of a shard: events are collected and shipped to the router
+    with the replies of the batch that produced them.
+    """
+
+    def __init__(self):
+        self.pending: List[Tuple[tuple, dict]] = []
+
+    def append(self, *args, **kwargs):
+        self.pending.append((args, kwargs))
+
+
+def _shard_main(connection, shard_index: int, shard_count: int, config: Dict):
+    """
+    Main loop of a shard process: executes batches of calls on the shard's own services.
+
+    A batch is a list of (call_id, service, method, args, kwargs); the reply is
+    the list of (call_id, ok, result or exception) and the events emitted meanwhile.
+    """
+    from app.services.advertiser_service import AdvertiserService
+    from app.services.application_service import ApplicationService
+    from app.services.fraud_service import FraudService
+    from app.services.order_service import OrderService
+    from app.services.report_service import ReportService
+
+    def owns(publisher_id: str) -> bool:
+        return shard_for(publisher_id, shard_count) == shard_index
+
+    event_log = _ForwardingEventLog()
+    id_generator = SnowflakeIdGenerator(shard_id=config.get('SHARD_ID', 0) + 1 + shard_index)
+    application_service = ApplicationService(AdvertiserService(), event_log=event_log, id_generator=id_generator,
+                                             publisher_filter=owns)
+    fraud_service = FraudService()
+    order_service = OrderService(application_service, fraud_service=fraud_service,
+                                 cold_storage_dir=config.get('ORDER_COLD_STORAGE_DIR'), event_log=event_log,
+                                 id_generator=id_generator, publisher_filter=owns)
+    services = {
+        'application_service': application_service,
+        'fraud_service': fraud_service,
+        'order_service': order_service,
+        'report_service': ReportService(order_service),
+    }
+
+    while True:
+        try:
+            batch = connection.recv()
+        except EOFError:
+            break
+        if batch is None:
+            break
+
+        replies = []
+        for call_id, service, method, args, kwargs in batch:
+            try:
+                result = getattr(services[service], method)(*args, **kwargs)
+                if inspect.isgenerator(result):
+                    result = list(result)
+                replies.append((call_id, True, result))
+            except Exception as error:
+                replies.append((call_id, False, error))
+        events, event_log.pending = event_log.pending, []
+        connection.send((replies, events))
+    connection.close()
+
+
+class _ShardClient:
+    """
+    Connection to one shard process.
+
+    Calls are queued and sent by a sender thread: while a batch is in
+    flight, new calls accumulate and leave together in the next message.
+    Once the shard process is gone (its pipe closed), pending and new
+    calls fail right away instead of waiting for CALL_TIMEOUT.
+    """
+
+    def __init__(self, context, shard_index: int, shard_count: int, config: Dict, event_log=None):
+        self.shard_index = shard_index
+        self.event_log = event_log
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_shard_main, name=f"order-shard-{shard_index}",
+                                       args=(child_connection, shard_index, shard_count, config), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+        self._outbox: Deque[tuple] = deque()
+        self._pending: Dict[int, Future] = {}
+        self._next_call_id = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._stopped = False
+        self.batches = 0
+        self.calls = 0
+        threading.Thread(target=self._send_loop, name=f"shard-{shard_index}-sender", daemon=True).start()
+        threading.Thread(target=self._receive_loop, name=f"shard-{shard_index}-receiver", daemon=True).start()
+
+    def call(self, service: str, method: str, *args, **kwargs) -> Future:
+        """Queues a call on the shard and returns the future of its result."""
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Shard is closed")
+            if self._stopped or not self.process.is_alive():
+                raise RuntimeError(f"Shard {self.shard_index} stopped")
+            call_id = self._next_call_id
+            self._next_call_id += 1
+            self._pending[call_id] = future
+            self._outbox.append((call_id, service, method, args, kwargs))
+            self._condition.notify()
+        return future
+
+    def _send_loop(self):
+        while True:
+            with self._condition:
+                while not self._outbox and not self._closed and not self._stopped:
+                    self._condition.wait()
+                if (self._closed or self._stopped) and not self._outbox:
+                    break
+                batch = [self._outbox.popleft() for _ in range(min(MAX_BATCH_SIZE, len(self._outbox)))]
+            self.batches += 1
+            self.calls += len(batch)
+            try:
+                self.connection.send(batch)
+            except OSError:
+                self._stop()
+                return
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+
+    def _receive_loop(self):
+        while True:
+            try:
+                replies, events = self.connection.recv()
+            except (EOFError, OSError):
+                break
+            if self.event_log is not None:
+                for args, kwargs in events:
+                    self.event_log.append(*args, **kwargs)
+            with self._condition:
+                futures = [(self._pending.pop(call_id), ok, result) for call_id, ok, result in replies]
+            for future, ok, result in futures:
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(result)
+        self._stop()
+
+    def _stop(self):
+        """Fails the pending calls once the shard process can't answer anymore."""
+        with self._condition:
+            self._stopped = True
+            futures, self._pending = list(self._pending.values()), {}
+            self._outbox.clear()
+            self._condition.notify()
+        for future in futures:
+            if not future.done():
+                future.set_exception(RuntimeError(f"Shard {self.shard_index} stopped"))
+
+    def close(self, timeout: float = 5.0):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.connection.close()
+
+
+class ShardRouter:
+    """
+    Partitions orders and applications by publisher across worker processes.
+
+    Each shard process owns the orders, applications and fraud counters of
+    the publishers hashed to it. Publisher-scoped calls go to the owning
+    shard, calls by ID to the shard encoded in the ID, and global queries
+    are scattered to every shard and their results merged. Events emitted
+    by the shards are appended to the local event log, so the change feed
+    and webhooks work as in a single process.
+    """
+
+    def __init__(self, shard_count: int, config: Optional[Dict] = None, event_log=None,
+                 start_method: str = 'spawn'):
+        """
+        Starts the shard processes.
+
+        Args:
+            shard_count: Number of shard processes
+            config: App configuration (only SHARD_CONFIG_KEYS are passed to the shards)
+            event_log: Local event log receiving the shards' events
+            start_method: multiprocessing start method of the shards
+        """
+        config = {key: config[key] for key in SHARD_CONFIG_KEYS if config and key in config}
+        self.shard_count = shard_count
+        self.first_id_shard = config.get('SHARD_ID', 0) + 1
+        context = multiprocessing.get_context(start_method)
+        self.shards = [_ShardClient(context, index, shard_count, config, event_log) for index in range(shard_count)]
+
+        self.order_service = ShardedOrderService(self)
+        self.application_service = ShardedApplicationService(self)
+        self.fraud_service = ShardedFraudService(self)
+        self.report_service = ShardedReportService(self)
+
+    def for_publisher(self, publisher_id: str) -> _ShardClient:
+        return self.shards[shard_for(publisher_id, self.shard_count)]
+
+    def for_id(self, entity_id: int) -> Optional[_ShardClient]:
+        """Returns the shard that created an ID, None if it wasn't created by a shard."""
+        index = SnowflakeIdGenerator.shard_of(entity_id) - self.first_id_shard
+        return self.shards[index] if 0 <= index < self.shard_count else None
+
+    def call(self, shard: _ShardClient, service: str, method: str, *args, **kwargs) -> Any:
+        return shard.call(service, method, *args, **kwargs).result(CALL_TIMEOUT)
+
+    def scatter(self, service: str, method: str, *args, **kwargs) -> List[Any]:
+        """Sends a call to every shard at once and gathers the results in shard order."""
+        futures = [shard.call(service, method, *args, **kwargs) for shard in self.shards]
+        return [future.result(CALL_TIMEOUT) for future in futures]
+
+    def close(self):
+        """Stops the shard processes."""
+        for shard in self.shards:
+            shard.close()
+
+
+class _WriteGate:
+    """
+    Lets writes run concurrently, except while the gate is held.
+
+    Holding the gate waits for the writes in progress, whose events have
+    then reached the local event log, and blocks new ones until released.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._writes = 0
+        self._held = False
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            while self._held:
+                self._condition.wait()
+            self._writes += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writes -= 1
+                if not self._writes:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def hold(self):
+        with self._condition:
+            while self._held or self._writes:
+                self._condition.wait()
+            self._held = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._held = False
+                self._condition.notify_all()
+
+
+class ShardedOrderService:
+    """OrderService interface routed to the shards."""
+
+    def __init__(self, router: ShardRouter):
+        self.router = router
+        self._write_gate = _WriteGate()
+
+    def hold_writes(self):
+        """
+        Holds the order writes made through this service while the returned context is entered.
+
+        Shards only write orders on calls from here, so no order event is emitted meanwhile.
+        """
+        return self._write_gate.hold()
+
+    def track_order(self, advertiser_id: str, publisher_id: str, *args, **kwargs):
+        shard = self.router.for_publisher(publisher_id)
+        with self._write_gate.write():
+            return self.router.call(shard, 'order_service', 'track_order', advertiser_id, publisher_id,
+                                    *args, **kwargs)
+
+    def get_orders_for_publisher(self, publisher_id: str, *args, **kwargs):
+        shard = self.router.for_publisher(publisher_id)
+        return self.router.call(shard, 'order_service', 'get_orders_for_publisher', publisher_id, *args, **kwargs)
+
+    def get_order_by_idempotency_key(self, advertiser_id: str, idempotency_key: str):
+        """Idempotency keys are scoped by advertiser, whose orders span every shard."""
+        orders = self.router.scatter('order_service', 'get_order_by_idempotency_key', advertiser_id,
+                                     idempotency_key)
+        return next((order for order in orders if order is not None), None)
+
+    def get_order(self, order_id: int):
+        shard = self.router.for_id(order_id)
+        if shard is not None:
+            return self.router.call(shard, 'order_service', 'get_order', order_id)
+        orders = self.router.scatter('order_service', 'get_order', order_id)
+        return next((order for order in orders if order is not None), None)
+
+    def update_order_status(self, order_id: int, status: OrderStatus):
+        shard = self.router.for_id(order_id)
+        with self._write_gate.write():
+            if shard is not None:
+                return self.router.call(shard, 'order_service', 'update_order_status', order_id, status)
+            orders = self.router.scatter('order_service', 'update_order_status', order_id, status)
+        return next((order for order in orders if order is not None), None)
+
+    def iter_orders(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None):
+        """Streams the orders of every shard within a date range, merged by date."""
+        results = self.router.scatter('order_service', 'iter_orders', from_date, to_date)
+        for result in results:
+            result.sort(key=lambda order: (order.order_date, order.id))
+        return heapq.merge(*results, key=lambda order: (order.order_date, order.id))
+
+    def freeze_closed_segments(self, now: Optional[datetime] = None) -> int:
+        return sum(self.router.scatter('order_service', 'freeze_closed_segments', now))
+
+
+class ShardedApplicationService:
+    """ApplicationService interface routed to the shards."""
+
+    def __init__(self, router: ShardRouter):
+        self.router = router
+
+    def apply_to_advertiser(self, publisher_id: str, advertiser_id: str, notes: Optional[str] = None):
+        shard = self.router.for_publisher(publisher_id)
+        return self.router.call(shard, 'application_service', 'apply_to_advertiser', publisher_id, advertiser_id,
+                                notes)
+
+    def update_application_status(self, application_id: int, status: ApplicationStatus):
+        shard = self.router.for_id(application_id)
+        if shard is not None:
+            return self.router.call(shard, 'application_service', 'update_application_status', application_id,
+                                    status)
+        applications = self.router.scatter('application_service', 'update_application_status', application_id,
+                                           status)
+        return next((application for application in applications if application is not None), None)
+
+    def get_application(self, application_id: int):
+        shard = self.router.for_id(application_id)
+        if shard is None:
+            return None
+        return self.router.call(shard, 'application_service', 'get_application', application_id)
+
+    def get_publisher_application(self, publisher_id: str) -> Iterable:
+        shard = self.router.for_publisher(publisher_id)
+        return iter(self.router.call(shard, 'application_service', 'get_publisher_application', publisher_id))
+
+    def check_publisher_access(self, publisher_id: str, advertiser_id: str) -> bool:
+        shard = self.router.for_publisher(publisher_id)
+        return self.router.call(shard, 'application_service', 'check_publisher_access', publisher_id,
+                                advertiser_id)
+
+
+class ShardedFraudService:
+    """FraudService metrics summed over the shards."""
+
+    def __init__(self, router: ShardRouter):
+        self.router = router
+
+    def get_metrics(self) -> Dict:
+        merged: Dict = {}
+        for metrics in self.router.scatter('fraud_service', 'get_metrics'):
+            for key, value in metrics.items():
+                if isinstance(value, dict):
+                    counters = merged.setdefault(key, {})
+                    for name, count in value.items():
+                        counters[name] = counters.get(name, 0) + count
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+
+class ShardedReportService:
+    """ReportService interface routed to the shard owning the publisher."""
+
+    def __init__(self, router: ShardRouter):
+        self.router = router
+
+    def get_campaign_report(self, publisher_id: str, *args, **kwargs) -> List[Dict]:
+        shard = self.router.for_publisher(publisher_id)
+        return self.router.call(shard, 'report_service', 'get_campaign_report', publisher_id, *args, **kwargs)
+
+    def get_unique_buyers(self, publisher_id: Optional[str] = None, advertiser_id: Optional[str] = None,
+                          from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                          by_day: bool = False) -> Dict:
+        """A publisher's buyers come from its shard; an advertiser's sketches are merged over every shard."""
+        if publisher_id is not None:
+            shard = self.router.for_publisher(publisher_id)
+            return self.router.call(shard, 'report_service', 'get_unique_buyers', publisher_id, advertiser_id,
+                                    from_date, to_date, by_day)
+        daily: Dict = {}
+        for shard_daily in self.router.scatter('report_service', 'daily_buyer_sketches', None, advertiser_id,
+                                               from_date, to_date):
+            for day, sketch in shard_daily.items():
+                if day in daily:
+                    daily[day].merge(sketch)
+                else:
+                    daily[day] = sketch
+        precision = next((sketch.precision for sketch in daily.values()), DEFAULT_PRECISION)
+        return unique_buyers_report(daily, precision, by_day)
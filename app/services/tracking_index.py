@@ -0,0 +1,159 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app.models import Order
+
+OTHER_VALUE = "__other__"
+
+# Campaign keys always indexed, whatever the publishers' other keys
+CAMPAIGN_KEYS = ('campaign', 'source', 'medium')
+
+
+class TrackingParamIndex:
+    """
+    Inverted index from tracking parameters to order IDs, per publisher.
+
+    Parameter keys and values are dictionary-encoded into small integers
+    and each (key, value) pair of a publisher has its own postings list.
+    Postings are arrays of 64-bit order IDs. Cardinality is capped: the
+    campaign keys are always indexed, but each publisher only gets
+    ``max_keys_per_publisher`` other keys (and all publishers together
+    ``max_keys``), so one publisher's junk keys can't crowd out the others.
+    Likewise, each publisher indexes up to ``max_values_per_key`` values of
+    a key; its values beyond that share a single "__other__" value, without
+    affecting the values other publishers can index. Only string keys and
+    values are indexed.
+    """
+
+    def __init__(self, max_keys_per_publisher: int = 32, max_keys: int = 1024, max_values_per_key: int = 10_000,
+                 reserved_keys: Iterable[str] = CAMPAIGN_KEYS):
+        """
+        Initializes the index.
+
+        Args:
+            max_keys_per_publisher: Maximum number of keys indexed per publisher, besides the reserved ones
+            max_keys: Maximum number of distinct parameter keys indexed overall
+            max_values_per_key: Maximum number of distinct values per key and publisher
+            reserved_keys: Keys always indexed, not counted in the publishers' budget
+        """
+        self.max_keys_per_publisher = max_keys_per_publisher
+        self.max_keys = max_keys
+        self.max_values_per_key = max_values_per_key
+        self._key_ids: Dict[str, int] = {}
+        self._value_ids: List[Dict[str, int]] = []
+        self._value_names: List[List[str]] = []
+        self._publisher_keys: Dict[str, Set[int]] = {}
+        self._publisher_value_counts: Dict[Tuple[str, int], int] = {}
+        self.postings: Dict[str, Dict[int, array]] = {}
+        self.dropped_keys = 0
+        self.overflowed_values = 0
+        self.rejected_params = 0
+        for key in reserved_keys:
+            self._register_key(key)
+        self._reserved_count = len(self._key_ids)
+
+    @staticmethod
+    def _posting_key(key_id: int, value_id: int) -> int:
+        return key_id << 32 | value_id
+
+    def _register_key(self, key: str) -> int:
+        key_id = self._key_ids.setdefault(key, len(self._key_ids))
+        if key_id == len(self._value_ids):
+            self._value_ids.append({OTHER_VALUE: 0})
+            self._value_names.append([OTHER_VALUE])
+        return key_id
+
+    def _encode_key(self, publisher_id: str, key: str) -> Optional[int]:
+        key_id = self._key_ids.get(key)
+        if key_id is not None and key_id < self._reserved_count:
+            return key_id
+        publisher_keys = self._publisher_keys.setdefault(publisher_id, set())
+        if key_id is not None and key_id in publisher_keys:
+            return key_id
+        if len(publisher_keys) >= self.max_keys_per_publisher or \
+                (key_id is None and len(self._key_ids) >= self.max_keys):
+            self.dropped_keys += 1
+            return None
+        if key_id is None:
+            key_id = self._register_key(key)
+        publisher_keys.add(key_id)
+        return key_id
+
+    def _encode_value(self, publisher_id: str, publisher_postings: Dict[int, array], key_id: int,
+                      value: str) -> int:
+        value_ids = self._value_ids[key_id]
+        value_id = value_ids.get(value)
+        if value_id is not None and self._posting_key(key_id, value_id) in publisher_postings:
+            return value_id
+        # First order of the publisher with this value: counted in its own budget for the key
+        budget_key = (publisher_id, key_id)
+        value_count = self._publisher_value_counts.get(budget_key, 0)
+        if value_count >= self.max_values_per_key:
+            self.overflowed_values += 1
+            return 0
+        self._publisher_value_counts[budget_key] = value_count + 1
+        if value_id is None:
+            value_id = value_ids[value] = len(value_ids)
+            self._value_names[key_id].append(value)
+        return value_id
+
+    def add(self, order: Order):
+        """
+        Indexes the tracking parameters of an order.
+
+        Parameters whose key or value isn't a string are not indexed (and counted as rejected),
+        so that 1 and "1" don't share a posting and nested values aren't indexed as strings.
+        """
+        if not order.tracking_params:
+            return
+        publisher_postings = self.postings.setdefault(order.publisher_id, {})
+        for key, value in order.tracking_params.items():
+            if not isinstance(key, str) or not isinstance(value, str):
+                self.rejected_params += 1
+                continue
+            key_id = self._encode_key(order.publisher_id, key)
+            if key_id is None:
+                continue
+            value_id = self._encode_value(order.publisher_id, publisher_postings, key_id, value)
+            publisher_postings.setdefault(self._posting_key(key_id, value_id), array('q')).append(order.id)
+
+    def lookup(self, publisher_id: str, key: str, value: str) -> Sequence[int]:
+        """
+        Returns the IDs of a publisher's orders with a given parameter value.
+        """
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            return []
+        value_id = self._value_ids[key_id].get(value)
+        if value_id is None:
+            return []
+        return self.postings.get(publisher_id, {}).get(self._posting_key(key_id, value_id), [])
+
+    def match(self, publisher_id: str, filters: Iterable[Tuple[str, str]]) -> Optional[Set[int]]:
+        """
+        Intersects the postings of several (key, value) filters, smallest first.
+
+        Returns:
+            The matching order IDs, or None if there is no filter
+        """
+        postings = sorted((self.lookup(publisher_id, key, value) for key, value in filters), key=len)
+        if not postings:
+            return None
+        matches = set(postings[0])
+        for posting in postings[1:]:
+            if not matches:
+                break
+            matches.intersection_update(posting)
+        return matches
+
+    def groups(self, publisher_id: str, key: str) -> Iterator[Tuple[str, Sequence[int]]]:
+        """
+        Yields each value of a parameter key with the IDs of a publisher's orders having it.
+        """
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            return
+        value_names = self._value_names[key_id]
+        for posting_key, posting in list(self.postings.get(publisher_id, {}).items()):
+            if posting_key >> 32 == key_id:
+                yield value_names[posting_key & 0xFFFFFFFF], posting
@@ -0,0 +1,370 @@
+import asyncio
+import ipaddress
+import json
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app.api.serializers import serialize_event
+from app.services.event_log import ChangeEvent
+
+ORDER_EVENT_TYPES = frozenset({"order.tracked", "order.status_changed"})
+
+
+def check_addresses(host: str, addresses: List[str], allow_private: bool = False) -> str:
+    """
+    Vets the addresses a webhook host resolves to.
+
+    Args:
+        host: Host name of the webhook URL
+        addresses: Addresses it resolves to
+        allow_private: Accept loopback, private, link-local and reserved addresses (development only)
+
+    Returns:
+        The address to connect to
+
+    Raises:
+        ValueError: If the host doesn't resolve, or resolves to a non-public address
+    """
+    if not addresses:
+        raise ValueError(f"Webhook host {host} doesn't resolve")
+    if not allow_private:
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split('%')[0])
+            ip = getattr(ip, 'ipv4_mapped', None) or ip
+            if not ip.is_global or ip.is_multicast:
+                raise ValueError("Webhook URL must resolve to a public address")
+    return addresses[0]
+
+
+def _addresses(address_infos: List[Tuple]) -> List[str]:
+    return [info[4][0] for info in address_infos]
+
+
+class _HttpConnection:
+    """
+    Minimal persistent HTTP/1.1 client connection used to POST JSON batches.
+    """
+
+    def __init__(self, url: str, timeout: float, allow_private: bool = False):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.secure = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.secure else 80)
+        self.path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        self.timeout = timeout
+        self.allow_private = allow_private
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self):
+        # Resolved and vetted on every connection, so a DNS change can't point it to an internal address
+        address_infos = await asyncio.wait_for(asyncio.get_running_loop().getaddrinfo(
+            self.host, self.port, type=socket.SOCK_STREAM), self.timeout)
+        address = check_addresses(self.host, _addresses(address_infos), self.allow_private)
+        context = ssl.create_default_context() if self.secure else None
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(
+            address, self.port, ssl=context, server_hostname=self.host if self.secure else None), self.timeout)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def post(self, body: bytes) -> int:
+        """
+        Sends a JSON body, reusing the connection when the server keeps it alive.
+
+        Returns:
+            The HTTP status code of the response
+        """
+        if self._writer is None or self._writer.is_closing():
+            await self._connect()
+        try:
+            return await asyncio.wait_for(self._exchange(body), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    async def _exchange(self, body: bytes) -> int:
+        self._writer.write(
+            f"POST {self.path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n".encode() + body
+        )
+        await self._writer.drain()
+
+        status_code, headers = await self._read_head()
+        # Interim responses (e.g. 100 Continue) precede the final one
+        while 100 <= status_code < 200:
+            status_code, headers = await self._read_head()
+
+        if status_code in (204, 304):
+            pass
+        elif 'chunked' in headers.get('transfer-encoding', '').lower():
+            await self._read_chunked()
+        elif 'content-length' in headers:
+            await self._reader.readexactly(int(headers['content-length']))
+        else:
+            await self._reader.read()
+            self.close()
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status_code
+
+    async def _read_head(self) -> Tuple[int, Dict[str, str]]:
+        """Reads a status line and headers, returning the status code and lower-cased headers."""
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by the destination")
+        status_code = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return status_code, headers
+
+    async def _read_chunked(self):
+        """Skips a chunked body and its trailers."""
+        while True:
+            size_line = await self._reader.readline()
+            if not size_line:
+                raise ConnectionError("Connection closed by the destination")
+            size = int(size_line.split(b';')[0], 16)
+            if size == 0:
+                break
+            await self._reader.readexactly(size + 2)
+        while (await self._reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+
+class _Destination:
+    """Queue and connection of one webhook URL."""
+
+    def __init__(self, url: str, timeout: float, allow_private: bool = False):
+        self.url = url
+        self.queue: Deque[Dict] = deque()
+        self.ready = asyncio.Event()
+        self.connection = _HttpConnection(url, timeout, allow_private)
+
+
+class WebhookDispatcher:
+    """
+    Pushes order events to publishers' webhooks in batches.
+
+    Events are received from the change log on the request thread and
+    handed over to an asyncio loop running in a background thread, so the
+    request path never waits on the network. Each destination has its own
+    in-memory queue and persistent connection; several events are sent per
+    POST, failed batches are retried with exponential backoff and end up
+    in a dead-letter store once retries are exhausted. Webhooks can only
+    target public addresses, so the API can't be used to reach internal
+    services.
+    """
+
+    def __init__(self, batch_size: int = 100, batch_interval: float = 0.05, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, timeout: float = 5.0,
+                 queue_limit: int = 10_000, dead_letter_limit: int = 10_000, allow_private: bool = False):
+        """
+        Initializes the dispatcher.
+
+        Args:
+            batch_size: Maximum number of events per POST
+            batch_interval: Time waited for a batch to fill up, in seconds
+            max_retries: Retries of a failed batch before it is dead-lettered
+            backoff_base: Delay before the first retry, doubled at each retry
+            backoff_max: Maximum delay between retries
+            timeout: Connection and response timeout, in seconds
+            queue_limit: Maximum number of queued events per destination
+            dead_letter_limit: Maximum number of dead-lettered batches kept
+            allow_private: Accept webhooks on loopback and private networks (development only)
+        """
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.queue_limit = queue_limit
+        self.allow_private = allow_private
+        self.subscriptions: Dict[str, str] = {}
+        self.dead_letters: Deque[Dict] = deque(maxlen=dead_letter_limit)
+        self.stats = {"enqueued": 0, "delivered": 0, "batches": 0, "retries": 0, "dead_lettered": 0}
+        self._destinations: Dict[str, _Destination] = {}
+        self._inbox: Deque[tuple] = deque()
+        self._wakeup_scheduled = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def register(self, publisher_id: str, url: str):
+        """
+        Registers the webhook URL of a publisher.
+
+        Args:
+            publisher_id: Publisher identifier
+            url: http(s) URL receiving the POSTed batches
+
+        Raises:
+            ValueError: If the URL isn't an http(s) URL of a public host
+        """
+        parts = urlsplit(url)
+        try:
+            port = parts.port
+        except ValueError:
+            port = -1
+        if parts.scheme not in ('http', 'https') or not parts.hostname or port == -1:
+            raise ValueError("Webhook URL must be an http(s) URL")
+        try:
+            address_infos = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+        except (OSError, UnicodeError):
+            address_infos = []
+        check_addresses(parts.hostname, _addresses(address_infos), self.allow_private)
+        self.subscriptions[publisher_id] = url
+        self._start()
+
+    def handle_event(self, event: ChangeEvent):
+        """
+        Change log listener queuing an order event for its publisher's webhook.
+
+        Never blocks: the event is handed over to the dispatcher loop.
+        """
+        url = self.subscriptions.get(event.publisher_id)
+        if url is None or event.type not in ORDER_EVENT_TYPES or self._loop is None:
+            return
+        self._inbox.append((url, event))
+        if not self._wakeup_scheduled:
+            self._wakeup_scheduled = True
+            self._loop.call_soon_threadsafe(self._drain_inbox)
+
+    def _drain_inbox(self):
+        """Moves the events handed over by request threads to their queues (runs in the loop)."""
+        self._wakeup_scheduled = False
+        inbox = self._inbox
+        while inbox:
+            url, event = inbox.popleft()
+            self._enqueue(url, serialize_event(event))
+
+    def _start(self):
+        """Starts the dispatcher loop in a background thread, once."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="webhook-dispatcher",
+                                            daemon=True)
+            self._thread.start()
+
+    def _enqueue(self, url: str, payload: Dict):
+        """Adds an event to the queue of its destination (runs in the loop)."""
+        destination = self._destinations.get(url)
+        if destination is None:
+            destination = self._destinations[url] = _Destination(url, self.timeout, self.allow_private)
+            self._loop.create_task(self._deliver(destination))
+
+        self.stats["enqueued"] += 1
+        if len(destination.queue) >= self.queue_limit:
+            self._dead_letter(url, [payload], "Queue full", 0)
+            return
+        destination.queue.append(payload)
+        destination.ready.set()
+
+    def _dead_letter(self, url: str, events: List[Dict], error: str, attempts: int):
+        self.stats["dead_lettered"] += len(events)
+        self.dead_letters.append({
+            "url": url,
+            "events": events,
+            "error": error,
+            "attempts": attempts,
+            "failed_at": time.time()
+        })
+
+    async def _deliver(self, destination: _Destination):
+        """Sends the queued events of a destination in batches, forever."""
+        queue = destination.queue
+        while True:
+            await destination.ready.wait()
+            if len(queue) < self.batch_size:
+                await asyncio.sleep(self.batch_interval)
+            batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+            if not queue:
+                destination.ready.clear()
+            if batch:
+                try:
+                    await self._send_batch(destination, batch)
+                except Exception as exception:
+                    # An unexpected error must not end the destination's deliveries
+                    self._dead_letter(destination.url, batch, f"{type(exception).__name__}: {exception}", 0)
+
+    async def _send_batch(self, destination: _Destination, batch: List[Dict]):
+        """POSTs one batch, retrying with exponential backoff."""
+        body = json.dumps({"events": batch}).encode()
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                await asyncio.sleep(min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+            try:
+                status_code = await destination.connection.post(body)
+                if 200 <= status_code < 300:
+                    self.stats["delivered"] += len(batch)
+                    self.stats["batches"] += 1
+                    return
+                error = f"HTTP {status_code}"
+            except (OSError, EOFError, asyncio.TimeoutError, ValueError, IndexError) as exception:
+                # EOFError covers asyncio.IncompleteReadError: the destination closed mid-response
+                error = f"{type(exception).__name__}: {exception}"
+        self._dead_letter(destination.url, batch, error, self.max_retries + 1)
+
+    @property
+    def pending(self) -> int:
+        """Number of events neither delivered nor dead-lettered yet."""
+        return self.stats["enqueued"] - self.stats["delivered"] - self.stats["dead_lettered"]
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Waits until every queued event has been delivered or dead-lettered.
+
+        Returns:
+            True if nothing is pending anymore
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._loop is None:
+                return True
+            # Let the events already handed over reach their queues first
+            asyncio.run_coroutine_threadsafe(asyncio.sleep(0), self._loop).result(timeout)
+            if self.pending == 0:
+                return True
+            time.sleep(0.005)
+        return self.pending == 0
+
+    async def _shutdown(self):
+        """Cancels the delivery tasks and closes the connections."""
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for destination in self._destinations.values():
+            destination.connection.close()
+
+    def stop(self):
+        """Stops the dispatcher loop; queued events are dropped."""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(self.timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=self.timeout)
+        self._loop.close()
+        self._loop = self._thread = None
+        self._destinations = {}
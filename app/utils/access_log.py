@@ -0,0 +1,236 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+
+from flask import g, request
+
+from app.utils.id_generator import encode_id
+
+ACCESS_LOG_FILE = 'access.ndjson'
+
+# (time, method, route, status, latency in seconds, publisher_id, advertiser_id, order_id)
+Record = Tuple[float, str, str, int, float, Optional[str], Optional[str], Optional[int]]
+
+
+def format_record(record: Record) -> str:
+    """Serializes a record as one NDJSON line."""
+    timestamp, method, route, status, latency, publisher_id, advertiser_id, order_id = record
+    return json.dumps({
+        'time': datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='milliseconds'),
+        'method': method,
+        'route': route,
+        'status': status,
+        'latency_ms': round(latency * 1000, 3),
+        'publisher_id': publisher_id,
+        'advertiser_id': advertiser_id,
+        'order_id': None if order_id is None else encode_id(order_id),
+    }) + "\n"
+
+
+def _reset_after_fork(reference: "weakref.ref[AccessLog]"):
+    access_log = reference()
+    if access_log is not None:
+        access_log._after_fork()
+
+
+class AccessLog:
+    """
+    Structured access log written off the request path.
+
+    Request threads only append a tuple to a bounded deque (atomic, no
+    lock taken); when the buffer is full the record is dropped and counted
+    instead of making the request wait. A background thread drains the
+    buffer every `flush_interval` seconds, serializes records in batches
+    and appends them to an NDJSON file rotated by size.
+
+    Threads don't survive a fork: a forked process (e.g. a prefork worker)
+    starts its own writer, with an empty buffer, writing to its own
+    access-<pid>.ndjson file.
+    """
+
+    def __init__(self, directory: str, buffer_size: int = 65_536, batch_size: int = 1_000,
+                 flush_interval: float = 0.5, max_bytes: int = 64 * 1024 * 1024, backup_count: int = 5):
+        """
+        Initializes the log.
+
+        Args:
+            directory: Directory of the log files
+            buffer_size: Records buffered before new ones are dropped
+            batch_size: Records serialized and written at once
+            flush_interval: Seconds between two drains of the buffer
+            max_bytes: Size of a file before it is rotated
+            backup_count: Number of rotated files kept (access.ndjson.1 being the most recent)
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, ACCESS_LOG_FILE)
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._buffer: Deque[Record] = deque()
+        self._drop_lock = threading.Lock()
+        self._file = None
+        self._file_size = 0
+        self._write_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.register_at_fork(after_in_child=functools.partial(_reset_after_fork, weakref.ref(self)))
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"buffered": len(self._buffer), "written": self.written, "dropped": self.dropped,
+                "rotations": self.rotations}
+
+    def record(self, record: Record) -> bool:
+        """
+        Buffers a record without blocking.
+
+        Returns:
+            False if the buffer was full and the record dropped
+        """
+        if len(self._buffer) >= self.buffer_size:
+            with self._drop_lock:
+                self.dropped += 1
+            return False
+        self._buffer.append(record)
+        return True
+
+    def start(self):
+        """Starts the background writer, once."""
+        if self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="access-log-writer", daemon=True)
+            self._thread.start()
+
+    def _after_fork(self):
+        """Resets the log in a forked child, whose parent's writer thread and locks didn't survive."""
+        self.path = os.path.join(self.directory, f"access-{os.getpid()}.ndjson")
+        # Records buffered before the fork are the parent's to write
+        self._buffer = deque()
+        self._drop_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._file = None
+        self._file_size = 0
+        self.written = self.dropped = self.rotations = 0
+        if self._thread is not None:
+            self._thread = None
+            self.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered records in batches, rotating the file when it gets too big."""
+        with self._write_lock:
+            buffer = self._buffer
+            while buffer:
+                batch: List[str] = []
+                while buffer and len(batch) < self.batch_size:
+                    batch.append(format_record(buffer.popleft()))
+                self._write(''.join(batch))
+                self.written += len(batch)
+            if self._file is not None:
+                self._file.flush()
+
+    def _write(self, data: str):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._file_size = self._file.tell()
+        self._file.write(data)
+        self._file_size += len(data)
+        if self._file_size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        """Renames access.ndjson to access.ndjson.1, shifting older files and dropping the oldest."""
+        self._file.close()
+        self._file = None
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def close(self):
+        """Stops the writer and writes the records still buffered."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def record_order(order_id: int):
+    """Adds the order a request created or changed to its access log record."""
+    g.access_log_order_id = order_id
+
+
+def _request_field(name: str) -> Optional[str]:
+    """Looks a field up in the URL, the query string, then the JSON body."""
+    value = (request.view_args or {}).get(name) or request.args.get(name)
+    if value is None and request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict) and body.get(name) is not None:
+            value = str(body[name])
+    return value
+
+
+def register_access_log(app):
+    """
+    Logs every request to the access log when configured.
+
+    Config:
+        ACCESS_LOG_DIR: Directory of the NDJSON files, no access log if unset
+        ACCESS_LOG_OPTIONS: AccessLog options (buffer_size, batch_size, flush_interval,
+            max_bytes, backup_count)
+    """
+    directory = app.config.get('ACCESS_LOG_DIR')
+    if not directory:
+        return
+
+    access_log = AccessLog(directory, **app.config.get('ACCESS_LOG_OPTIONS', {}))
+    access_log.start()
+    app.extensions['access_log'] = access_log
+    atexit.register(access_log.close)
+
+    @app.before_request
+    def start_timer():
+        g.access_log_start = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        """Buffers the request's record; serialization and I/O happen in the writer thread."""
+        start = g.get('access_log_start')
+        if start is not None:
+            access_log.record((
+                time.time(),
+                request.method,
+                request.url_rule.rule if request.url_rule is not None else request.path,
+                response.status_code,
+                time.perf_counter() - start,
+                _request_field('publisher_id'),
+                _request_field('advertiser_id'),
+                g.get('access_log_order_id'),
+            ))
+        return response
@@ -0,0 +1,160 @@
+import math
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+from typing import Iterable, Optional
+
+DEFAULT_PRECISION = 12
+_RANK_BITS = 6
+_RANK_MASK = (1 << _RANK_BITS) - 1
+
+
+def relative_error(precision: int = DEFAULT_PRECISION) -> float:
+    """Standard error of a HyperLogLog estimate: 1.04 / sqrt(2^precision)."""
+    return 1.04 / math.sqrt(1 << precision)
+
+
+class HyperLogLog:
+    """
+    Approximate distinct counter (HyperLogLog) in at most 2^precision bytes.
+
+    With the default precision (4096 registers) estimates are within 1.6%
+    of the true count one time in three and within 3.3% 95% of the time.
+    Small sketches are kept sparse, as a sorted array of (register, rank)
+    entries, and switch to one byte per register once that is smaller.
+    Sketches of the same precision merge without loss, e.g. across days
+    or shards, and serialize to bytes.
+    """
+
+    __slots__ = ('precision', 'registers', 'sparse')
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        """
+        Initializes an empty sketch.
+
+        Args:
+            precision: Number of index bits (4 to 16); the sketch has 2^precision registers
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers: Optional[bytearray] = None
+        self.sparse = array('I')
+
+    @property
+    def size(self) -> int:
+        return 1 << self.precision
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the registers."""
+        if self.registers is not None:
+            return len(self.registers)
+        return self.sparse.itemsize * len(self.sparse)
+
+    def _register(self, value: str):
+        """Returns the register index and rank (position of the first 1 bit) of a value."""
+        hashed = int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), 'little')
+        remaining_bits = 64 - self.precision
+        rest = hashed & ((1 << remaining_bits) - 1)
+        return hashed >> remaining_bits, remaining_bits - rest.bit_length() + 1
+
+    def add(self, value: str):
+        """Adds a value (e.g. a user ID) to the sketch."""
+        index, rank = self._register(value)
+        self._update(index, rank)
+
+    def update(self, values: Iterable[str]):
+        for value in values:
+            self.add(value)
+
+    def _update(self, index: int, rank: int):
+        registers = self.registers
+        if registers is not None:
+            if rank > registers[index]:
+                registers[index] = rank
+            return
+
+        sparse = self.sparse
+        position = bisect_left(sparse, index << _RANK_BITS)
+        if position < len(sparse) and sparse[position] >> _RANK_BITS == index:
+            if rank > sparse[position] & _RANK_MASK:
+                sparse[position] = index << _RANK_BITS | rank
+            return
+        sparse.insert(position, index << _RANK_BITS | rank)
+        if len(sparse) * sparse.itemsize >= self.size:
+            self._densify()
+
+    def _densify(self):
+        registers = bytearray(self.size)
+        for entry in self.sparse:
+            registers[entry >> _RANK_BITS] = entry & _RANK_MASK
+        self.registers = registers
+        self.sparse = array('I')
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """
+        Adds the values counted by another sketch of the same precision.
+
+        Returns:
+            This sketch
+        """
+        if other.precision != self.precision:
+            raise ValueError("Only sketches of the same precision can be merged")
+        if other.registers is None:
+            for entry in other.sparse:
+                self._update(entry >> _RANK_BITS, entry & _RANK_MASK)
+            return self
+        if self.registers is None:
+            self._densify()
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def __ior__(self, other: "HyperLogLog") -> "HyperLogLog":
+        return self.merge(other)
+
+    def copy(self) -> "HyperLogLog":
+        sketch = HyperLogLog(self.precision)
+        sketch.registers = None if self.registers is None else bytearray(self.registers)
+        sketch.sparse = array('I', self.sparse)
+        return sketch
+
+    def count(self) -> int:
+        """Estimated number of distinct values added."""
+        size = self.size
+        if self.registers is not None:
+            registers = self.registers
+            zeros = registers.count(0)
+            inverse_sum = sum(registers.count(rank) * 2.0 ** -rank for rank in set(registers))
+        else:
+            zeros = size - len(self.sparse)
+            inverse_sum = zeros + sum(2.0 ** -(entry & _RANK_MASK) for entry in self.sparse)
+
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(size, 0.7213 / (1 + 1.079 / size))
+        estimate = alpha * size * size / inverse_sum
+        if estimate <= 2.5 * size and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = size * math.log(size / zeros)
+        return int(round(estimate))
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def to_bytes(self) -> bytes:
+        """Serializes the sketch: precision, format byte, then registers or sparse entries."""
+        if self.registers is not None:
+            return bytes((self.precision, 1)) + bytes(self.registers)
+        return bytes((self.precision, 0)) + self.sparse.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        """Rebuilds a sketch serialized with to_bytes."""
+        sketch = cls(data[0])
+        if data[1]:
+            sketch.registers = bytearray(data[2:])
+        else:
+            sketch.sparse.frombytes(data[2:])
+        return sketch
+
+    def __reduce__(self):
+        return HyperLogLog.from_bytes, (self.to_bytes(),)
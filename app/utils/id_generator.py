@@ -0,0 +1,138 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional
+
+EPOCH_MS = 1_577_836_800_000  # 2020-01-01T00:00:00Z
+TIMESTAMP_BITS = 41
+IMPORTED_BITS = 1
+SHARD_BITS = 9
+SEQUENCE_BITS = 12
+MAX_SHARD_ID = (1 << SHARD_BITS) - 1
+MAX_ID = (1 << (TIMESTAMP_BITS + IMPORTED_BITS + SHARD_BITS + SEQUENCE_BITS)) - 1
+
+_SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+_SHARD_SHIFT = SEQUENCE_BITS
+_IMPORTED_FLAG = 1 << (SHARD_BITS + SEQUENCE_BITS)
+_TIMESTAMP_SHIFT = IMPORTED_BITS + SHARD_BITS + SEQUENCE_BITS
+
+
+def to_epoch_ms(date: datetime) -> int:
+    """Converts a naive local (or aware) date to milliseconds since the Unix epoch."""
+    return int(date.timestamp()) * 1000 + date.microsecond // 1000
+
+
+def encode_id(entity_id: int) -> str:
+    """Renders an internal ID at the API boundary."""
+    return str(entity_id)
+
+
+def decode_id(value: str) -> int:
+    """
+    Parses an ID received by the API.
+
+    Raises:
+        ValueError: If the value isn't an ID
+    """
+    if not isinstance(value, str) or not value.isdigit() or len(value) > 19 or int(value) > MAX_ID:
+        raise ValueError("Invalid identifier")
+    return int(value)
+
+
+class IdGenerator(ABC):
+    """
+    Source of unique integer IDs whose order follows creation time.
+
+    Services take any implementation of this interface, so the scheme can
+    be swapped (e.g. for deterministic IDs in tests).
+    """
+
+    @abstractmethod
+    def next_id(self, at: Optional[datetime] = None) -> int:
+        """
+        Returns a new ID.
+
+        Args:
+            at: Date encoded in the ID, now if None (used to import past entities)
+        """
+
+    @abstractmethod
+    def datetime_of(self, entity_id: int) -> datetime:
+        """Returns the creation date encoded in an ID, as naive local time."""
+
+    @abstractmethod
+    def min_id(self, date: datetime) -> int:
+        """Returns the smallest ID that can be created at or after a date."""
+
+
+class SnowflakeIdGenerator(IdGenerator):
+    """
+    Snowflake-style 63-bit IDs: milliseconds since 2020 (41 bits), imported
+    flag (1 bit), shard (9 bits) and a per-millisecond sequence (12 bits).
+
+    IDs are strictly increasing within a generator: when the clock goes back
+    or a millisecond's 4096 sequence numbers are used up, the generator keeps
+    counting on its last timestamp. IDs of different shards never collide.
+    IDs of imported (past) entities have the imported flag set, so they
+    never collide with live IDs; their sequence is a counter shared by all
+    imports, unique within a millisecond up to 4096 imports apart.
+    """
+
+    def __init__(self, shard_id: int = 0, clock=None):
+        """
+        Initializes the generator.
+
+        Args:
+            shard_id: Shard (process or node) number, between 0 and 511
+            clock: Function returning the current time in milliseconds since the Unix epoch
+        """
+        if not 0 <= shard_id <= MAX_SHARD_ID:
+            raise ValueError(f"shard_id must be between 0 and {MAX_SHARD_ID}")
+        self.shard_id = shard_id
+        self._clock = clock or (lambda: time.time_ns() // 1_000_000)
+        self._last_ms = -1
+        self._sequence = 0
+        self._import_sequence = 0
+        self._lock = threading.Lock()
+
+    def _compose(self, timestamp_ms: int, sequence: int) -> int:
+        return ((timestamp_ms - EPOCH_MS) << _TIMESTAMP_SHIFT) | (self.shard_id << _SHARD_SHIFT) | sequence
+
+    def next_id(self, at: Optional[datetime] = None) -> int:
+        with self._lock:
+            if at is not None:
+                # Imported entities: no monotonicity, and the imported flag keeps them apart from live IDs
+                self._import_sequence = (self._import_sequence + 1) & _SEQUENCE_MASK
+                return self._compose(to_epoch_ms(at), self._import_sequence) | _IMPORTED_FLAG
+
+            timestamp_ms = self._clock()
+            if timestamp_ms > self._last_ms:
+                self._last_ms, self._sequence = timestamp_ms, 0
+            else:
+                self._sequence += 1
+                if self._sequence > _SEQUENCE_MASK:
+                    self._last_ms, self._sequence = self._last_ms + 1, 0
+            return self._compose(self._last_ms, self._sequence)
+
+    @staticmethod
+    def timestamp_ms(entity_id: int) -> int:
+        """Milliseconds since the Unix epoch encoded in an ID."""
+        return (entity_id >> _TIMESTAMP_SHIFT) + EPOCH_MS
+
+    @staticmethod
+    def shard_of(entity_id: int) -> int:
+        """Shard that generated an ID."""
+        return (entity_id >> _SHARD_SHIFT) & MAX_SHARD_ID
+
+    @staticmethod
+    def is_imported(entity_id: int) -> bool:
+        """Whether an ID was created for an imported entity."""
+        return bool(entity_id & _IMPORTED_FLAG)
+
+    def datetime_of(self, entity_id: int) -> datetime:
+        timestamp_ms = self.timestamp_ms(entity_id)
+        return datetime.fromtimestamp(timestamp_ms // 1000).replace(microsecond=timestamp_ms % 1000 * 1000)
+
+    def min_id(self, date: datetime) -> int:
+        return max(0, to_epoch_ms(date) - EPOCH_MS) << _TIMESTAMP_SHIFT
@@ -0,0 +1,138 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, Hashable, Iterable, Optional, Union
+
+
+class BloomFilter:
+    """
+    Compact probabilistic set used to skip exact lookups for unseen keys.
+
+    A negative answer is always correct; a positive answer may be a false
+    positive with probability close to ``error_rate`` at ``capacity`` items.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Initializes the filter.
+
+        Args:
+            capacity: Expected number of inserted keys
+            error_rate: Target false positive rate at capacity
+        """
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: Union[str, int]) -> Iterable[int]:
+        """Derives the bit positions of a key (string or 64-bit ID) with double hashing."""
+        data = key.to_bytes(8, 'little', signed=True) if isinstance(key, int) else key.encode()
+        digest = blake2b(data, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key: Union[str, int]):
+        """Adds a key to the filter."""
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: Union[str, int]) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class IdempotencyCache:
+    """
+    Bounded map of recently seen idempotency keys.
+
+    Entries expire after ``ttl`` seconds and the oldest entries are evicted
+    once ``capacity`` is reached. A Bloom filter sits in front of the map so
+    that most first-time keys are rejected without touching it; the filter is
+    rebuilt from the live keys when it has absorbed too many insertions.
+    """
+
+    def __init__(self, capacity: int = 100_000, ttl: float = 24 * 3600, error_rate: float = 0.01):
+        """
+        Initializes the cache.
+
+        Args:
+            capacity: Maximum number of keys kept
+            ttl: Lifetime of a key in seconds
+            error_rate: False positive rate of the front filter
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.error_rate = error_rate
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._filter = BloomFilter(capacity * 2, error_rate)
+        self._lock = threading.Lock()
+        self.filter_skips = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Retrieves the value stored for a key.
+
+        Args:
+            key: Idempotency key
+
+        Returns:
+            The stored value, or None if the key is unknown or expired
+        """
+        if key not in self._filter:
+            self.filter_skips += 1
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any):
+        """
+        Records the value of a key, evicting expired and oldest entries.
+
+        Args:
+            key: Idempotency key
+            value: Value returned on replay
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._evict(now)
+
+            if self._filter.count >= self._filter.capacity:
+                self._rebuild_filter(self._entries.keys())
+            self._filter.add(key)
+
+    def _evict(self, now: float):
+        """Drops expired entries and keeps the map under capacity."""
+        entries = self._entries
+        while entries:
+            oldest_key, (expires_at, _) = next(iter(entries.items()))
+            if len(entries) <= self.capacity and expires_at >= now:
+                break
+            del entries[oldest_key]
+
+    def _rebuild_filter(self, keys: Iterable[Hashable]):
+        """Replaces the saturated filter with one holding only the live keys."""
+        new_filter = BloomFilter(self.capacity * 2, self.error_rate)
+        for key in keys:
+            new_filter.add(key)
+        self._filter = new_filter
@@ -0,0 +1,116 @@
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+
+class Version:
+    """
+    One version of a value, linked to the version it replaced.
+
+    Attributes:
+        value: The value, never mutated once published
+        version: Snapshot version from which the value is visible
+        previous: Older version, dropped once no pinned reader can see it
+    """
+
+    __slots__ = ('value', 'version', 'previous')
+
+    def __init__(self, value: Any, version: int, previous: Optional["Version"] = None):
+        self.value = value
+        self.version = version
+        self.previous = previous
+
+
+def visible_value(head: Optional[Version], version: Optional[int] = None) -> Any:
+    """
+    Returns the value a snapshot sees in a version chain.
+
+    Args:
+        head: Latest version
+        version: Snapshot version, the latest value if None
+
+    Returns:
+        The newest value visible at the version, None if it was created later
+    """
+    if version is not None:
+        while head is not None and head.version > version:
+            head = head.previous
+    return None if head is None else head.value
+
+
+def prune_versions(head: Version, oldest_pinned: int):
+    """Drops the versions no pinned snapshot (at or after oldest_pinned) can see anymore."""
+    while head.previous is not None and head.version > oldest_pinned:
+        head = head.previous
+    head.previous = None
+
+
+class SnapshotManager:
+    """
+    Publishes immutable, versioned snapshots to lock-free readers.
+
+    A snapshot is any immutable object with a `version` attribute. Writers
+    hold `write_lock`, build the next snapshot (sharing everything that
+    didn't change) and publish it with a single reference swap. Readers
+    pin the current snapshot without locking and see a consistent state
+    however long they read. Versions and resources replaced by a writer
+    (e.g. files of old segments) are reclaimed once no reader pins a
+    snapshot that may still use them.
+    """
+
+    def __init__(self, snapshot):
+        """
+        Initializes the manager.
+
+        Args:
+            snapshot: Initial snapshot
+        """
+        self.current = snapshot
+        self.write_lock = threading.RLock()
+        self._pins: Dict[int, int] = {}
+        self._tokens = itertools.count()
+        self._retired: Deque[Tuple[int, Callable[[], None]]] = deque()
+
+    @contextmanager
+    def pin(self) -> Iterator:
+        """Pins the current snapshot for the duration of a read."""
+        token = next(self._tokens)
+        # Registered before the snapshot is read, so the pinned version is never newer than the snapshot
+        self._pins[token] = self.current.version
+        try:
+            yield self.current
+        finally:
+            del self._pins[token]
+
+    def oldest_pinned(self) -> int:
+        """Version of the oldest snapshot still being read, the current one if none is."""
+        return min(list(self._pins.values()), default=self.current.version)
+
+    @property
+    def pinned_readers(self) -> int:
+        return len(self._pins)
+
+    def publish(self, snapshot):
+        """Makes a new snapshot visible to readers (writers only)."""
+        self.current = snapshot
+        self.reclaim()
+
+    def retire(self, release: Callable[[], None]):
+        """
+        Schedules the release of a resource the next published snapshot no longer references.
+
+        Args:
+            release: Called once no reader pins an older snapshot
+        """
+        self._retired.append((self.current.version + 1, release))
+
+    def reclaim(self):
+        """Releases the retired resources no pinned snapshot can reach anymore."""
+        if not self._retired:
+            return
+        oldest = self.oldest_pinned()
+        while self._retired and self._retired[0][0] <= oldest:
+            _, release = self._retired.popleft()
+            release()
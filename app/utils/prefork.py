@@ -0,0 +1,96 @@
+import gc
+import os
+import signal
+import socket
+from typing import List
+
+from werkzeug.serving import make_server
+
+
+def warm_start(services):
+    """
+    Builds all services once in the master so workers inherit them.
+
+    Closed past months are frozen into flat buffers and every object alive
+    is moved to the permanent GC generation (gc.freeze), so neither reads
+    nor garbage collections in the workers write to the shared pages.
+    Months with orders still awaiting a final status (the current one
+    included) stay hot: they are the ones being read and updated, and each
+    worker would otherwise decompress a whole frozen segment for each of
+    those reads.
+
+    Args:
+        services: ServiceContainer of the app
+    """
+    services.build_all()
+    services.order_service.freeze_closed_segments()
+    gc.collect()
+    gc.freeze()
+
+
+def _serve_worker(app, host: str, port: int, fd: int):
+    """Runs one worker on the socket inherited from the master."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    server = make_server(host, port, app, fd=fd)
+    try:
+        server.serve_forever()
+    finally:
+        # os._exit skips atexit handlers, so the worker's access log is flushed here
+        access_log = app.extensions.get('access_log')
+        if access_log is not None:
+            access_log.close()
+        os._exit(0)
+
+
+def _assign_shard(app, worker: int):
+    """Gives each worker its own ID shard so IDs created by different workers never collide."""
+    services = app.extensions['api_membership']
+    if services.is_built('id_generator') and hasattr(services.id_generator, 'shard_id'):
+        services.id_generator.shard_id = app.config.get('SHARD_ID', 0) + worker + 1
+
+
+def serve_prefork(app, host: str = '0.0.0.0', port: int = 5000, workers: int = 4):
+    """
+    Serves the app from pre-forked worker processes sharing one listening socket.
+
+    The app should have been created with PREFORK enabled so its services
+    are warm before the fork.
+
+    Workers share nothing written after the fork: each one has its own
+    orders, idempotency keys, change log, webhooks and rate-limit buckets.
+    An order tracked by one worker isn't listed by the others, a replayed
+    Idempotency-Key reaching another worker creates a duplicate order, and
+    per-publisher rate limits are multiplied by the number of workers. Use
+    it for read-mostly deployments whose writes go to a single process.
+
+    Args:
+        app: Flask app
+        host: Interface to bind
+        port: Port to bind
+        workers: Number of worker processes
+    """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(128)
+    listener.set_inheritable(True)
+
+    children: List[int] = []
+    for worker in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            _assign_shard(app, worker)
+            _serve_worker(app, host, port, listener.fileno())
+        children.append(pid)
+
+    def stop(signum, frame):
+        for child in children:
+            os.kill(child, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        for child in children:
+            os.waitpid(child, 0)
+    finally:
+        listener.close()
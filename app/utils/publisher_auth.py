@@ -0,0 +1,38 @@
+import hashlib
+from typing import Dict, Optional
+
+from flask import current_app, request
+
+API_KEY_HEADER = 'X-API-Key'
+
+
+def _key_digest(api_key: str) -> bytes:
+    return hashlib.sha256(api_key.encode()).digest()
+
+
+def _publishers_by_key() -> Dict[bytes, str]:
+    """Maps the digest of each configured API key to its publisher, built once per app."""
+    keys = current_app.extensions.get('publisher_api_keys')
+    if keys is None:
+        keys = current_app.extensions['publisher_api_keys'] = {
+            _key_digest(api_key): publisher_id
+            for publisher_id, api_key in current_app.config.get('PUBLISHER_API_KEYS', {}).items()
+        }
+    return keys
+
+
+def authenticated_publisher() -> Optional[str]:
+    """
+    Identifies the publisher calling from its API key.
+
+    Config:
+        PUBLISHER_API_KEYS: Mapping of publisher ID to API key
+
+    Returns:
+        The publisher owning the key of the X-API-Key header, None if the key is missing or unknown
+    """
+    api_key = request.headers.get(API_KEY_HEADER)
+    if not api_key:
+        return None
+    # Keys are looked up by digest, so the lookup time doesn't depend on how much of a key matches
+    return _publishers_by_key().get(_key_digest(api_key))
@@ -0,0 +1,177 @@
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import current_app, g, jsonify, request
+
+DEFAULT_RATE_LIMITS = {
+    'api_membership.track_order': {'rate': 50.0, 'burst': 100},
+    'api_membership.apply_to_advertiser': {'rate': 5.0, 'burst': 20},
+}
+DEFAULT_MAX_IN_FLIGHT = 256
+DEFAULT_MAX_EVENT_STREAMS = 64
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets refilled lazily from timestamps.
+
+    Each bucket is stored as a single float, the time at which it will be
+    full again (GCRA formulation of the token bucket), so no background
+    thread is needed and memory stays at one dict entry per active key.
+    The read-modify-write of a bucket (and purges) run under a lock, so
+    concurrent requests of one key can't all pass; it only guards a few
+    float operations, so a single lock per limiter doesn't contend.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100_000):
+        """
+        Initializes the limiter.
+
+        Args:
+            rate: Tokens refilled per second
+            burst: Bucket size, i.e. the number of requests allowed at once
+            max_keys: Number of tracked keys before full buckets are purged
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._interval = 1.0 / rate
+        self._tolerance = (burst - 1) * self._interval
+        self._buckets: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """
+        Takes one token from the bucket of a key.
+
+        Args:
+            key: Bucket identifier (e.g. publisher ID)
+            now: Current monotonic time, mainly for tests
+
+        Returns:
+            0.0 if the request is allowed, otherwise the seconds to wait before retrying
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            full_at = self._buckets.get(key, now)
+            if full_at < now:
+                full_at = now
+            if full_at - now > self._tolerance:
+                return full_at - now - self._tolerance
+
+            self._buckets[key] = full_at + self._interval
+            if len(self._buckets) > self.max_keys:
+                self._purge(now)
+        return 0.0
+
+    def _purge(self, now: float):
+        """Forgets buckets that have refilled completely. Called with the lock held."""
+        self._buckets = {key: full_at for key, full_at in self._buckets.items() if full_at > now}
+
+
+class LoadShedder:
+    """Rejects requests once the number of in-flight requests passes a threshold."""
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def enter(self) -> bool:
+        """Registers a request, returning False if it must be shed."""
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def exit(self):
+        """Releases a request previously accepted by enter."""
+        with self._lock:
+            self.in_flight -= 1
+
+
+def release_in_flight_slot():
+    """
+    Stops counting the current request as in flight.
+
+    Long-lived responses (event streams) call it once accepted, so they
+    don't take the slots of regular requests for their whole life.
+    """
+    shedder = current_app.extensions.get('load_shedder')
+    if shedder is not None and g.pop('load_shedder_entered', False):
+        shedder.exit()
+
+
+def _too_many_requests(message: str, status_code: int, retry_after: float):
+    """Builds an error response carrying a Retry-After header."""
+    response = jsonify({
+        'success': False,
+        'message': message,
+        'error': f"Retry after {retry_after:.3f} seconds"
+    })
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, status_code
+
+
+def _request_publisher_id() -> Optional[str]:
+    """Extracts the publisher ID from the JSON body or the query string."""
+    body = request.get_json(silent=True)
+    if isinstance(body, dict) and body.get('publisher_id'):
+        return str(body['publisher_id'])
+    return request.args.get('publisher_id')
+
+
+def register_rate_limiting(app):
+    """
+    Installs per-publisher rate limiting and load shedding on the app.
+
+    Config:
+        RATE_LIMIT_ENABLED: Turns the feature on or off
+        RATE_LIMITS: Mapping of endpoint name to {'rate': float, 'burst': int}
+        MAX_IN_FLIGHT: Number of concurrent requests before shedding with 503
+        MAX_EVENT_STREAMS: Number of concurrent event streams, counted apart from MAX_IN_FLIGHT
+    """
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        return
+
+    limiters = {
+        endpoint: TokenBucketLimiter(limit['rate'], limit['burst'])
+        for endpoint, limit in app.config.get('RATE_LIMITS', DEFAULT_RATE_LIMITS).items()
+    }
+    shedder = LoadShedder(app.config.get('MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT))
+    app.extensions['rate_limiters'] = limiters
+    app.extensions['load_shedder'] = shedder
+    app.extensions['event_stream_shedder'] = LoadShedder(
+        app.config.get('MAX_EVENT_STREAMS', DEFAULT_MAX_EVENT_STREAMS))
+
+    @app.before_request
+    def limit_request():
+        """Sheds load globally, then applies the route's per-publisher limit."""
+        if not shedder.enter():
+            return _too_many_requests("Service overloaded", 503, 1.0)
+        g.load_shedder_entered = True
+
+        limiter = limiters.get(request.endpoint)
+        if limiter is None:
+            return None
+
+        publisher_id = _request_publisher_id()
+        if not publisher_id:
+            return None
+
+        retry_after = limiter.acquire(publisher_id)
+        if retry_after:
+            return _too_many_requests("Too many requests", 429, retry_after)
+        return None
+
+    @app.teardown_request
+    def release_request(error=None):
+        """Releases the in-flight slot taken by the request."""
+        if g.pop('load_shedder_entered', False):
+            shedder.exit()
@@ -0,0 +1,106 @@
+from typing import Dict, Hashable, List, Tuple
+
+# Layout of a key's state list: window count and total, then (bucket, count, sum) per non-empty bucket
+COUNT, TOTAL, FIRST_BUCKET = 0, 1, 2
+
+
+class SlidingWindowCounter:
+    """
+    Sliding-window order counts and amount sums per key.
+
+    The window is split in ``bucket_seconds`` wide buckets. Each key only
+    keeps its non-empty buckets, flattened in one list with the window
+    totals, so an update touches the newest bucket and expires the oldest
+    ones in amortized O(1) without allocating, however sparse the key's
+    events are. The number of keys is bounded: once ``max_keys`` is passed,
+    keys whose window is empty are purged, then the oldest keys if needed.
+
+    Not thread-safe: callers serialize access (see FraudService).
+    """
+
+    def __init__(self, window_seconds: float = 600, bucket_seconds: float = 60, max_keys: int = 100_000):
+        """
+        Initializes the counter.
+
+        Args:
+            window_seconds: Length of the sliding window
+            bucket_seconds: Granularity of the window
+            max_keys: Maximum number of keys tracked at once
+        """
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.size = max(1, -int(-window_seconds // bucket_seconds))
+        self.max_keys = max_keys
+        self._keys: Dict[Hashable, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Hashable, timestamp: float, amount: float = 0.0) -> List:
+        """
+        Records an event for a key.
+
+        Late events are counted in the key's most recent bucket.
+
+        Args:
+            key: Key the event belongs to
+            timestamp: Event time in seconds
+            amount: Amount added to the window sum
+
+        Returns:
+            The key's state list, whose COUNT and TOTAL items include this event
+        """
+        bucket = int(timestamp // self.bucket_seconds)
+        state = self._keys.get(key)
+        if state is None:
+            state = self._keys[key] = [1, amount, bucket, 1, amount]
+            if len(self._keys) > self.max_keys:
+                self._purge(bucket)
+            return state
+
+        if bucket <= state[-3]:
+            state[-2] += 1
+            state[-1] += amount
+        else:
+            if state[FIRST_BUCKET] <= bucket - self.size:
+                self._expire(state, bucket)
+            state += (bucket, 1, amount)
+        state[COUNT] += 1
+        state[TOTAL] += amount
+        return state
+
+    def get(self, key: Hashable, timestamp: float) -> Tuple[int, float]:
+        """
+        Returns the count and sum of the window ending at timestamp for a key.
+        """
+        state = self._keys.get(key)
+        if state is None:
+            return 0, 0.0
+        self._expire(state, int(timestamp // self.bucket_seconds))
+        return state[COUNT], state[TOTAL]
+
+    def _expire(self, state: list, bucket: int):
+        """Drops the buckets that left the window ending at a bucket."""
+        oldest = bucket - self.size
+        while len(state) > FIRST_BUCKET and state[FIRST_BUCKET] <= oldest:
+            state[COUNT] -= state[FIRST_BUCKET + 1]
+            state[TOTAL] -= state[FIRST_BUCKET + 2]
+            del state[FIRST_BUCKET:FIRST_BUCKET + 3]
+        if len(state) == FIRST_BUCKET:
+            # Resets the float total, so rounding errors don't accumulate
+            state[COUNT], state[TOTAL] = 0, 0.0
+            # Keeps a sentinel bucket, so the newest bucket is always at state[-3]
+            state += (oldest, 0, 0.0)
+
+    def _purge(self, bucket: int):
+        """
+        Forgets the keys whose window is empty, then the oldest keys down to
+        90% of max_keys if that wasn't enough, so purges stay infrequent.
+        """
+        oldest = bucket - self.size
+        keys = {key: state for key, state in self._keys.items() if state[-3] > oldest}
+        excess = len(keys) - self.max_keys * 9 // 10
+        if excess > 0:
+            for key in list(keys)[:excess]:
+                del keys[key]
+        self._keys = keys
@@ -0,0 +1,86 @@
+"""
+Measures what logging costs request threads: a synchronous JSON line
+written through a logging.FileHandler (serialization, lock and write on the
+request thread) against buffering a tuple in the AccessLog, whose
+background writer serializes and writes in batches. Reports the
+per-record latency percentiles seen by the request threads.
+
+Usage:
+    python -m benchmarks.bench_access_log [--records 100000] [--threads 8] [--buffer-size 65536]
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from app.utils.access_log import AccessLog
+
+
+def percentile(samples, fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def run_threads(log_record, records: int, threads: int):
+    """Logs records from several threads and returns every call's latency, sorted."""
+    latencies = [[] for _ in range(threads)]
+
+    def worker(samples):
+        for index in range(records // threads):
+            record = (time.time(), 'POST', '/api_membership/orders/track', 201, 0.0012,
+                      f"publisher_{index % 500}", 'user_1', index)
+            start = time.perf_counter()
+            log_record(record)
+            samples.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=worker, args=(samples,)) for samples in latencies]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sorted(sample for samples in latencies for sample in samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--buffer-size', type=int, default=65_536)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        logger = logging.getLogger('bench_access_log')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        handler = logging.FileHandler(os.path.join(directory, 'sync.ndjson'))
+        logger.addHandler(handler)
+        fields = ('time', 'method', 'route', 'status', 'latency', 'publisher_id', 'advertiser_id', 'order_id')
+
+        def log_synchronously(record):
+            logger.info(json.dumps(dict(zip(fields, record))))
+
+        start = time.perf_counter()
+        sync_latencies = run_threads(log_synchronously, args.records, args.threads)
+        sync_time = time.perf_counter() - start
+        handler.close()
+
+        access_log = AccessLog(os.path.join(directory, 'buffered'), buffer_size=args.buffer_size)
+        access_log.start()
+        start = time.perf_counter()
+        buffered_latencies = run_threads(access_log.record, args.records, args.threads)
+        buffered_time = time.perf_counter() - start
+        access_log.close()
+        drain_time = time.perf_counter() - start
+
+    for label, latencies, elapsed in (("synchronous", sync_latencies, sync_time),
+                                      ("buffered", buffered_latencies, buffered_time)):
+        print(f"{label:<12} p50 {percentile(latencies, 0.5) * 1e6:8.2f} us   "
+              f"p99 {percentile(latencies, 0.99) * 1e6:8.2f} us   "
+              f"max {latencies[-1] * 1e6:10.2f} us   {len(latencies) / elapsed:>10,.0f} records/s")
+    print(f"buffered: {access_log.written} written, {access_log.dropped} dropped, "
+          f"all written after {drain_time:.2f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares counting unique buyers per (publisher, advertiser, day) with exact
+sets of user IDs against HyperLogLog sketches: ingest time, memory, and the
+error of the merged estimates (one publisher over every day and advertiser).
+
+Usage:
+    python -m benchmarks.bench_buyer_sketches [--orders 300000] [--buyers 100000] [--publishers 50] [--days 30]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.models import Order
+from app.services.buyer_sketches import BuyerSketches
+from app.utils.hyperloglog import relative_error
+
+
+def set_bytes(sets) -> int:
+    """Memory of the exact sets: set tables plus the user ID strings they hold."""
+    return sum(sys.getsizeof(buyers) + sum(sys.getsizeof(buyer) for buyer in buyers) for buyers in sets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=300_000)
+    parser.add_argument('--buyers', type=int, default=100_000)
+    parser.add_argument('--publishers', type=int, default=50)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--precision', type=int, default=12)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    start_date = datetime(2025, 1, 1)
+    orders = [
+        Order(id=index, advertiser_id=rng.choice(["user_1", "user_2", "user_3"]),
+              publisher_id=f"publisher_{rng.randrange(args.publishers)}", user_id=str(rng.randrange(args.buyers)),
+              amount=10.0, commission=1.0, order_date=start_date + timedelta(days=rng.randrange(args.days)))
+        for index in range(args.orders)
+    ]
+
+    exact = {}
+    start = time.perf_counter()
+    for order in orders:
+        key = (order.publisher_id, order.advertiser_id, order.order_date.date())
+        buyers = exact.get(key)
+        if buyers is None:
+            buyers = exact[key] = set()
+        buyers.add(order.user_id)
+    exact_time = time.perf_counter() - start
+
+    sketches = BuyerSketches(args.precision)
+    start = time.perf_counter()
+    for order in orders:
+        sketches.add(order)
+    sketch_time = time.perf_counter() - start
+
+    errors = []
+    for publisher in range(args.publishers):
+        publisher_id = f"publisher_{publisher}"
+        truth = len(set().union(*(buyers for key, buyers in exact.items() if key[0] == publisher_id)))
+        daily = sketches.daily_sketches(publisher_id)
+        estimate = next(iter(daily.values())).copy()
+        for sketch in daily.values():
+            estimate.merge(sketch)
+        errors.append(abs(estimate.count() - truth) / truth)
+    errors.sort()
+
+    rows = [
+        ("exact sets, ingest (us/order)", exact_time / args.orders * 1e6),
+        ("sketches, ingest (us/order)", sketch_time / args.orders * 1e6),
+        ("exact sets, memory (MB)", set_bytes(exact.values()) / 1e6),
+        ("sketches, memory (MB)", sketches.nbytes / 1e6),
+        ("expected standard error (%)", relative_error(args.precision) * 100),
+        ("publisher estimate, median error (%)", errors[len(errors) // 2] * 100),
+        ("publisher estimate, max error (%)", errors[-1] * 100),
+    ]
+    for label, value in rows:
+        print(f"{label:<40}{value:>10.3f}")
+
+if __name__ == '__main__':
+    main()
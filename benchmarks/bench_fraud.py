@@ -0,0 +1,43 @@
+"""
+Measures the cost added to each tracked order by the velocity detector.
+
+Usage:
+    python -m benchmarks.bench_fraud [--orders 200000] [--users 50000]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.models import Order
+from app.services.fraud_service import FraudService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=50_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    start = datetime(2025, 3, 1)
+    orders = [
+        Order(id=i, advertiser_id=f"user_{rng.randrange(50)}", publisher_id=f"publisher_{rng.randrange(500)}",
+              user_id=str(rng.randrange(args.users)), amount=rng.uniform(5, 300), commission=0.0,
+              order_date=start + timedelta(seconds=i * 0.05))
+        for i in range(args.orders)
+    ]
+
+    fraud_service = FraudService()
+    inspect = fraud_service.inspect
+    began = time.perf_counter()
+    for order in orders:
+        inspect(order)
+    elapsed = time.perf_counter() - began
+
+    print(f"inspect: {elapsed / args.orders * 1e6:.2f} us/order")
+    print(fraud_service.get_metrics())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares random UUID strings with time-ordered snowflake IDs: memory per ID,
+dict lookups, generation, and insertion into a sorted index.
+
+Usage:
+    python -m benchmarks.bench_ids [--ids 200000]
+"""
+import argparse
+import bisect
+import sys
+import time
+import uuid
+
+from app.utils.id_generator import SnowflakeIdGenerator
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def sorted_insert(ids) -> int:
+    """Inserts IDs into a sorted list, returning how many didn't go at the end."""
+    index = []
+    displaced = 0
+    for entity_id in ids:
+        position = bisect.bisect_right(index, entity_id)
+        displaced += position != len(index)
+        index.insert(position, entity_id)
+    return displaced
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ids', type=int, default=200_000)
+    args = parser.parse_args()
+
+    generator = SnowflakeIdGenerator()
+    uuid_time = timed(lambda: [str(uuid.uuid4()) for _ in range(args.ids)])
+    snowflake_time = timed(lambda: [generator.next_id() for _ in range(args.ids)])
+    uuids = [str(uuid.uuid4()) for _ in range(args.ids)]
+    snowflakes = [generator.next_id() for _ in range(args.ids)]
+
+    print(f"{'':<24}{'uuid4 str':>14}{'snowflake int':>16}")
+    print(f"{'bytes per ID':<24}{sys.getsizeof(uuids[0]):>14}{sys.getsizeof(snowflakes[0]):>16}")
+    print(f"{'generate (us/ID)':<24}{uuid_time / args.ids * 1e6:>14.2f}{snowflake_time / args.ids * 1e6:>16.2f}")
+
+    uuid_map = dict.fromkeys(uuids)
+    snowflake_map = dict.fromkeys(snowflakes)
+    # Look up IDs as received in requests: fresh strings, so cached string hashes don't help
+    uuid_keys = [''.join(key) for key in uuids]
+    snowflake_keys = [str(key) for key in snowflakes]
+    lookup_uuid = timed(lambda: [uuid_map[key] for key in uuid_keys])
+    lookup_snowflake = timed(lambda: [snowflake_map[int(key)] for key in snowflake_keys])
+    print(f"{'lookup (us/ID)':<24}{lookup_uuid / args.ids * 1e6:>14.2f}{lookup_snowflake / args.ids * 1e6:>16.2f}")
+
+    sample = min(args.ids, 50_000)
+    uuid_displaced = sorted_insert(uuids[:sample])
+    snowflake_displaced = sorted_insert(snowflakes[:sample])
+    print(f"{'non-append inserts':<24}{uuid_displaced / sample:>13.0%}{snowflake_displaced / sample:>15.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Compares serving "top N publishers of an advertiser this month" by grouping
+the month's orders on every request with the incrementally maintained
+leaderboards, and measures the cost of maintaining them per order event.
+
+Usage:
+    python -m benchmarks.bench_leaderboards [--orders 200000] [--publishers 5000] [--top 50]
+"""
+import argparse
+import heapq
+import random
+import time
+from datetime import datetime
+
+from app.services.advertiser_service import AdvertiserService
+from app.services.event_log import ChangeEvent
+from app.services.leaderboard_service import LeaderboardService, period_of
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=200_000)
+    parser.add_argument('--publishers', type=int, default=5_000)
+    parser.add_argument('--top', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    now = datetime.now()
+    events = [
+        ChangeEvent(seq=seq, type="order.status_changed", publisher_id=f"publisher_{rng.randrange(args.publishers)}",
+                    advertiser_id=rng.choice(["user_1", "user_2", "user_3"]), entity_id=seq, status="confirmed",
+                    previous_status="pending", data={"commission": round(rng.uniform(1, 50), 2), "order_date": now})
+        for seq in range(1, args.orders + 1)
+    ]
+    cancellations = [
+        ChangeEvent(seq=event.seq, type="order.status_changed", publisher_id=event.publisher_id,
+                    advertiser_id=event.advertiser_id, entity_id=event.entity_id, status="cancelled",
+                    previous_status="confirmed", data=event.data)
+        for event in rng.sample(events, args.orders // 20)
+    ]
+
+    service = LeaderboardService(AdvertiserService())
+    start = time.perf_counter()
+    for event in events:
+        service.handle_event(event)
+    track_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for event in cancellations:
+        service.handle_event(event)
+    cancel_time = time.perf_counter() - start
+
+    def group_on_request():
+        totals = {}
+        for event in events:
+            if event.advertiser_id == "user_1":
+                totals[event.publisher_id] = totals.get(event.publisher_id, 0.0) + event.data["commission"]
+        return heapq.nlargest(args.top, totals.items(), key=lambda item: item[1])
+
+    period = period_of(now)
+    start = time.perf_counter()
+    service.get_leaderboard('advertiser', "user_1", period, args.top)
+    first_read = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        service.get_leaderboard('advertiser', "user_1", period, args.top)
+    read_time = (time.perf_counter() - start) / args.requests
+    start = time.perf_counter()
+    for _ in range(max(1, args.requests // 20)):
+        group_on_request()
+    group_time = (time.perf_counter() - start) / max(1, args.requests // 20)
+
+    rows = [
+        ("confirmed order event (us)", track_time / len(events) * 1e6),
+        ("cancellation event (us)", cancel_time / len(cancellations) * 1e6),
+        (f"top {args.top}, first read after cancellations (ms)", first_read * 1e3),
+        (f"top {args.top}, leaderboard (ms)", read_time * 1e3),
+        (f"top {args.top}, group on request (ms)", group_time * 1e3),
+    ]
+    for label, value in rows:
+        print(f"{label:<48}{value:>10.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Compares resident memory of the order store before and after freezing closed months.
+
+Usage:
+    python -m benchmarks.bench_order_segments [--orders 200000] [--months 24]
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from app.models import Order, OrderStatus
+from app.services.application_service import ApplicationService
+from app.services.order_service import OrderService
+
+
+def build_service(orders: int, months: int, application_service=None) -> OrderService:
+    """Fills an OrderService with synthetic orders spread over the last months."""
+    if application_service is None:
+        application_service = MagicMock(spec=ApplicationService)
+        application_service.check_publisher_access.return_value = True
+    service = OrderService(application_service)
+
+    rng = random.Random(42)
+    now = datetime.now()
+    for _ in range(orders):
+        order_date = now - timedelta(days=rng.uniform(0, months * 30))
+        is_hot = (now - order_date).days < 45
+        status = OrderStatus.PENDING if is_hot else rng.choice([OrderStatus.CONFIRMED, OrderStatus.CANCELLED])
+        final_date = order_date + timedelta(days=rng.uniform(0, 20))
+        service._store_order(Order(
+            id=service.id_generator.next_id(at=order_date),
+            advertiser_id=f"user_{rng.randrange(50)}",
+            publisher_id=f"publisher_{rng.randrange(1000)}",
+            user_id=str(rng.randrange(100_000)),
+            amount=round(rng.uniform(5, 300), 2),
+            commission=0.0,
+            status=status,
+            order_date=order_date,
+            validation_date=final_date if status == OrderStatus.CONFIRMED else None,
+            closing_date=final_date if status == OrderStatus.CANCELLED else None,
+            tracking_params={"campaign": f"campaign_{rng.randrange(20)}"}
+        ))
+    return service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=200_000)
+    parser.add_argument('--months', type=int, default=24)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    service = build_service(args.orders, args.months)
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    frozen = service.freeze_closed_segments()
+    freeze_time = time.perf_counter() - start
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+
+    print(f"orders: {args.orders}, segments frozen: {frozen}/{len(service.segments)} in {freeze_time:.2f}s")
+    print(f"live orders: {len(service.orders)}")
+    print(f"memory before freeze: {before / 2**20:.1f} MiB, after: {after / 2**20:.1f} MiB")
+
+    for label, from_date in (("hot (last 30 days)", datetime.now() - timedelta(days=30)),
+                             ("all history", None)):
+        start = time.perf_counter()
+        for i in range(20):
+            service.get_orders_for_publisher(f"publisher_{i}", from_date=from_date)
+        print(f"get_orders_for_publisher {label}: {(time.perf_counter() - start) / 20 * 1e3:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
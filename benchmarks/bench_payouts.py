@@ -0,0 +1,66 @@
+"""
+Times month-end payout statements: one get_orders_for_publisher call per
+publisher versus the PayoutService job (single pass, partitioned
+aggregation) in-process and on process pools.
+
+Usage:
+    python -m benchmarks.bench_payouts [--orders 600000] [--months 6] [--workers 0 1 2 4]
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app.services.order_segments import segment_bounds, segment_key
+from app.services.payout_service import PayoutService, aggregate_rows, statement_row_kind
+from benchmarks.bench_order_segments import build_service
+
+
+def per_publisher(service, period_start: datetime, period_end: datetime) -> int:
+    """Baseline: lists the orders of each publisher one at a time."""
+    publishers = {order.publisher_id for order in service.iter_orders(period_start, period_end)}
+    orders = 0
+    for publisher_id in sorted(publishers):
+        orders_of_period = [order for order in service.get_orders_for_publisher(
+            publisher_id, from_date=period_start, to_date=period_end) if order.order_date < period_end]
+        rows = [
+            (order.publisher_id, order.advertiser_id, kind, order.amount, order.commission)
+            for order, kind in ((order, statement_row_kind(order, period_start, period_end))
+                                for order in orders_of_period)
+            if kind is not None
+        ]
+        aggregate_rows(rows)
+        orders += len(rows)
+    return orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=600_000)
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    args = parser.parse_args()
+
+    service = build_service(args.orders, args.months)
+    service.freeze_closed_segments()
+    # A month old enough for all its orders to be final
+    period_start, period_end = segment_bounds(segment_key(datetime.now() - timedelta(days=75)))
+    print(f"period {period_start:%Y-%m}, {args.orders} orders over {args.months} months")
+
+    start = time.perf_counter()
+    orders = per_publisher(service, period_start, period_end)
+    print(f"{'per publisher':<18}{time.perf_counter() - start:>8.2f}s  ({orders} orders)")
+
+    for workers in args.workers:
+        payouts = PayoutService(service, workers=workers)
+        with tempfile.TemporaryDirectory() as output_dir:
+            start = time.perf_counter()
+            summary = payouts.generate_statements(period_start, period_end, output_dir, args.format)
+            elapsed = time.perf_counter() - start
+        print(f"{f'job, {workers} workers':<18}{elapsed:>8.2f}s  ({summary['orders']} orders, "
+              f"{summary['statements']} statements)")
+
+
+if __name__ == '__main__':
+    main()
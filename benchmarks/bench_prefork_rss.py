@@ -0,0 +1,105 @@
+"""
+Measures per-worker unique memory (USS) of forked workers reading the order store.
+
+The master builds the services once, then forks workers that each serve
+publisher queries; the private memory of each worker is read from
+/proc/<pid>/smaps_rollup (Linux only). Runs once as a plain fork and once
+with the warm start used by PREFORK (closed segments frozen + gc.freeze()).
+
+Usage:
+    python -m benchmarks.bench_prefork_rss [--orders 5000000] [--workers 8]
+"""
+import argparse
+import gc
+import os
+import sys
+
+from app import create_app
+from app.utils.prefork import warm_start
+from benchmarks.bench_order_segments import build_service
+
+
+class AllowAllAccess:
+    """Grants every publisher access to every advertiser."""
+
+    def check_publisher_access(self, publisher_id: str, advertiser_id: str) -> bool:
+        return True
+
+
+def unique_set_size(pid: int) -> int:
+    """Returns the private (unshared) memory of a process in bytes."""
+    total = 0
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+def run_workers(app, workers: int, queries: int) -> list:
+    """Forks workers that query the app, returning their unique memory."""
+    children = []
+    for worker in range(workers):
+        ready_read, ready_write = os.pipe()
+        release_read, release_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            os.close(release_write)
+            client = app.test_client()
+            for i in range(queries):
+                client.get(f"/api_membership/orders?publisher_id=publisher_{(worker * queries + i) % 1000}")
+            gc.collect()
+            os.write(ready_write, b"1")
+            os.read(release_read, 1)
+            os._exit(0)
+        os.close(ready_write)
+        os.close(release_read)
+        children.append((pid, ready_read, release_write))
+
+    sizes = []
+    for pid, ready_read, release_write in children:
+        os.read(ready_read, 1)
+        sizes.append(unique_set_size(pid))
+        os.write(release_write, b"1")
+        os.waitpid(pid, 0)
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=500_000)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--mode', choices=('plain', 'warm'), default=None,
+                        help="Run only one mode (each mode builds its own store)")
+    args = parser.parse_args()
+
+    if not sys.platform.startswith('linux'):
+        raise SystemExit("smaps_rollup is only available on Linux")
+
+    for mode in ([args.mode] if args.mode else ['plain', 'warm']):
+        app = create_app({'TESTING': True, 'RATE_LIMIT_ENABLED': False})
+        services = app.extensions['api_membership']
+        services.build_all()
+        order_service = build_service(args.orders, args.months, application_service=AllowAllAccess())
+        services.__dict__['order_service'] = order_service
+
+        if mode == 'warm':
+            warm_start(services)
+
+        sizes = run_workers(app, args.workers, args.queries)
+        mean = sum(sizes) / len(sizes)
+        print(f"{mode}: {args.workers} workers, {args.orders} orders, "
+              f"mean unique memory per worker {mean / 2**20:.1f} MiB "
+              f"(min {min(sizes) / 2**20:.1f}, max {max(sizes) / 2**20:.1f})")
+
+        if mode == 'warm':
+            gc.unfreeze()
+        del services, order_service, app
+        gc.collect()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Measures the per-request overhead of the rate limiting primitives.
+
+Usage:
+    python -m benchmarks.bench_rate_limiting [--calls 1000000] [--keys 10000]
+"""
+import argparse
+import time
+
+from app.utils.rate_limiting import LoadShedder, TokenBucketLimiter
+
+
+def bench_token_bucket(calls: int, keys: int) -> float:
+    """Returns the mean cost of TokenBucketLimiter.acquire in nanoseconds."""
+    limiter = TokenBucketLimiter(rate=1_000_000, burst=1_000_000)
+    publisher_ids = [f"publisher_{i}" for i in range(keys)]
+    acquire = limiter.acquire
+
+    start = time.perf_counter()
+    for i in range(calls):
+        acquire(publisher_ids[i % keys])
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def bench_load_shedder(calls: int) -> float:
+    """Returns the mean cost of a LoadShedder enter/exit pair in nanoseconds."""
+    shedder = LoadShedder(max_in_flight=64)
+    enter, exit_ = shedder.enter, shedder.exit
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        enter()
+        exit_()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=1_000_000)
+    parser.add_argument('--keys', type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"token bucket acquire: {bench_token_bucket(args.calls, args.keys):.0f} ns/call")
+    print(f"load shedder enter+exit: {bench_load_shedder(args.calls):.0f} ns/call")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Validation cost per item of large payloads: compiled pydantic schemas
+versus the hand-rolled parsing the routes used before.
+
+Usage:
+    python -m benchmarks.bench_schemas --items 10000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.api.schemas import OrdersQuery, TrackOrderBody
+
+
+def make_payloads(count: int, seed: int = 42) -> List[dict]:
+    rng = random.Random(seed)
+    return [{
+        "advertiser_id": f"user_{rng.randrange(3)}",
+        "publisher_id": f"publisher_{rng.randrange(1000)}",
+        "user_id": str(rng.randrange(1_000_000)),
+        "amount": round(rng.uniform(5, 300), 2),
+        "tracking_params": {"campaign": f"campaign_{rng.randrange(20)}", "source": "mobile"}
+    } for _ in range(count)]
+
+
+def parse_ad_hoc(raw: bytes) -> list:
+    """The checks track_order did by hand, applied to each item."""
+    items = []
+    for data in json.loads(raw):
+        advertiser_id = data.get('advertiser_id')
+        publisher_id = data.get('publisher_id')
+        user_id = data.get('user_id')
+        amount = data.get('amount')
+        tracking_params = data.get('tracking_params')
+        if not all([advertiser_id, publisher_id, user_id, amount]):
+            raise ValueError("All mandatory fields are required")
+        items.append((advertiser_id, publisher_id, user_id, float(amount), tracking_params))
+    return items
+
+
+def parse_dates_ad_hoc(queries: List[dict]) -> list:
+    return [(query['publisher_id'], datetime.fromisoformat(query['from_date']), datetime.fromisoformat(query['to_date']))
+            for query in queries]
+
+
+def timed(label: str, function, items: int, repeat: int):
+    best = min(_run(function) for _ in range(repeat))
+    print(f"{label:<44} {best / items * 1e6:8.2f} us/item")
+
+
+def _run(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.items)
+    raw = json.dumps(payloads).encode()
+    adapter = TypeAdapter(List[TrackOrderBody])
+
+    print(f"Track order payloads ({args.items} items, {len(raw) / 1e6:.1f} MB)")
+    timed("ad-hoc (json.loads + get/all/float)", lambda: parse_ad_hoc(raw), args.items, args.repeat)
+    timed("schema, validate_json on the raw body", lambda: adapter.validate_json(raw), args.items, args.repeat)
+    timed("schema, json.loads + validate_python", lambda: adapter.validate_python(json.loads(raw)),
+          args.items, args.repeat)
+    timed("schema, model_validate per item",
+          lambda: [TrackOrderBody.model_validate(item) for item in json.loads(raw)], args.items, args.repeat)
+
+    queries = [{"publisher_id": payload["publisher_id"], "from_date": "2025-01-01T00:00:00",
+                "to_date": "2025-03-31T23:59:59"} for payload in payloads]
+    query_adapter = TypeAdapter(List[OrdersQuery])
+    print(f"\nOrder queries with dates ({args.items} items)")
+    timed("ad-hoc (datetime.fromisoformat)", lambda: parse_dates_ad_hoc(queries), args.items, args.repeat)
+    timed("schema, validate_python", lambda: query_adapter.validate_python(queries), args.items, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
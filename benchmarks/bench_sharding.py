@@ -0,0 +1,72 @@
+"""
+Measures order tracking and order listing throughput with orders held in
+process (1 shard) or partitioned by publisher across shard processes.
+
+Each thread drives its own publisher, so with N shards up to N calls run
+in parallel in the shard processes; on a single CPU the pipe round trips
+are pure overhead.
+
+Usage:
+    python -m benchmarks.bench_sharding [--shards 1 2 4] [--threads 8] [--calls 2000] [--orders 200]
+"""
+import argparse
+import os
+import threading
+import time
+
+from app.models import ApplicationStatus
+from app.services.container import ServiceContainer
+
+
+def run_threads(threads: int, work) -> float:
+    workers = [threading.Thread(target=work, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def measure(shards: int, threads: int, calls: int, orders: int):
+    services = ServiceContainer({'ORDER_SHARDS': shards})
+    application_service, order_service = services.application_service, services.order_service
+    publishers = [f"bench_publisher_{index}" for index in range(threads)]
+    for publisher_id in publishers:
+        _, _, application = application_service.apply_to_advertiser(publisher_id, "user_1")
+        application_service.update_application_status(application.id, ApplicationStatus.APPROVED)
+
+    per_thread = calls // threads
+
+    def track(index):
+        for call in range(per_thread):
+            order_service.track_order("user_1", publishers[index], str(call), 10.0)
+
+    def list_orders(index):
+        for _ in range(per_thread):
+            order_service.get_orders_for_publisher(publishers[index], limit=orders)
+
+    track_time = run_threads(threads, track)
+    list_time = run_threads(threads, list_orders)
+    if services.is_sharded:
+        services.shard_router.close()
+    return per_thread * threads / track_time, per_thread * threads / list_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=200, help="Orders returned per listing")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s), {args.threads} threads")
+    print(f"{'shards':<8}{'track (calls/s)':>18}{'list (calls/s)':>18}")
+    for shards in args.shards:
+        track_rate, list_rate = measure(shards, args.threads, args.calls, args.orders)
+        print(f"{shards:<8}{track_rate:>18.0f}{list_rate:>18.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Measures read latency of a whale publisher's order listing while writer
+threads track orders and update statuses, with snapshot reads (the
+service as is) or with one lock shared by readers and writers.
+
+Usage:
+    python -m benchmarks.bench_snapshots [--orders 20000] [--readers 2] [--writers 4] [--duration 5]
+"""
+import argparse
+import threading
+import time
+from unittest.mock import MagicMock
+
+from app.models import OrderStatus
+from app.services.application_service import ApplicationService
+from app.services.order_service import OrderService
+from benchmarks.loadtest import percentile
+
+
+class CoarseLockOrderService(OrderService):
+    """Baseline: every read and write holds the same lock."""
+
+    def __init__(self, *args, **kwargs):
+        self.coarse_lock = threading.RLock()
+        super().__init__(*args, **kwargs)
+
+    def get_orders_for_publisher(self, *args, **kwargs):
+        with self.coarse_lock:
+            return super().get_orders_for_publisher(*args, **kwargs)
+
+    def track_order(self, *args, **kwargs):
+        with self.coarse_lock:
+            return super().track_order(*args, **kwargs)
+
+    def update_order_status(self, *args, **kwargs):
+        with self.coarse_lock:
+            return super().update_order_status(*args, **kwargs)
+
+
+def run(service_class, orders: int, readers: int, writers: int, duration: float):
+    application_service = MagicMock(spec=ApplicationService)
+    application_service.check_publisher_access.return_value = True
+    service = service_class(application_service)
+    whale = [service.track_order("user_1", "whale", str(i), 10.0).id for i in range(orders)]
+
+    latencies, writes = [], [0] * writers
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            start = time.perf_counter()
+            service.get_orders_for_publisher("whale")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    def write(index):
+        count = 0
+        while not stop.is_set():
+            order = service.track_order("user_1", f"publisher_{index}", str(count), 10.0)
+            service.update_order_status(whale[count % len(whale)], OrderStatus.CONFIRMED)
+            service.update_order_status(order.id, OrderStatus.CONFIRMED)
+            count += 1
+        writes[index] = count
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    threads += [threading.Thread(target=write, args=(index,)) for index in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'reads': len(latencies),
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1],
+        'writes_per_s': sum(writes) * 3 / duration,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=20_000, help="Orders of the publisher being listed")
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'':<14}{'reads':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'writes/s':>12}")
+    for name, service_class in (('snapshots', OrderService), ('coarse lock', CoarseLockOrderService)):
+        result = run(service_class, args.orders, args.readers, args.writers, args.duration)
+        print(f"{name:<14}{result['reads']:>8}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+              f"{result['max_ms']:>10.1f}{result['writes_per_s']:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Measures webhook delivery throughput against a local stub HTTP server.
+
+Usage:
+    python -m benchmarks.bench_webhooks [--events 50000] [--publishers 10] [--batch-size 100]
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.event_log import EventLog
+from app.services.webhook_dispatcher import WebhookDispatcher
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Accepts every batch."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=50_000)
+    parser.add_argument('--publishers', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    dispatcher = WebhookDispatcher(batch_size=args.batch_size, batch_interval=0.005, allow_private=True)
+    event_log = EventLog()
+    event_log.subscribe(dispatcher.handle_event)
+    for publisher in range(args.publishers):
+        dispatcher.register(f"publisher_{publisher}", f"http://127.0.0.1:{server.server_port}/p{publisher}")
+
+    start = time.perf_counter()
+    for i in range(args.events):
+        event_log.append("order.tracked", f"publisher_{i % args.publishers}", "user_1", str(i), "pending",
+                         data={"amount": 10.0, "commission": 0.5})
+    enqueue_time = time.perf_counter() - start
+    dispatcher.flush(timeout=300)
+    elapsed = time.perf_counter() - start
+
+    print(f"request path (append + hand-over): {enqueue_time / args.events * 1e6:.1f} us/event")
+    print(f"delivered {dispatcher.stats['delivered']} events in {dispatcher.stats['batches']} batches: "
+          f"{dispatcher.stats['delivered'] / elapsed:.0f} events/s")
+
+    dispatcher.stop()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
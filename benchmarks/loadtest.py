@@ -0,0 +1,341 @@
+"""
+End-to-end load test of the API with a weighted mix of requests.
+
+The app is seeded with synthetic publishers, applications and orders, then
+driven either in-process through its WSGI interface or over a local socket
+served by werkzeug. Results (throughput, latency percentiles, error rates,
+overall and per operation) are printed as JSON so runs can be compared
+across commits.
+
+Usage:
+    python -m benchmarks.loadtest --transport wsgi --concurrency 8 --duration 10 \\
+        --mix get_orders=70,track_order=20,get_advertisers=10 --output run.json
+    python -m benchmarks.loadtest --compare baseline.json run.json
+"""
+import argparse
+import http.client
+import json
+import math
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.test import EnvironBuilder
+
+from app import create_app
+from app.models import ApplicationStatus
+
+DEFAULT_MIX = "get_orders=70,track_order=20,get_advertisers=10"
+PERCENTILES = (50, 95, 99, 99.9)
+
+Request = Tuple[str, str, Optional[Dict]]
+
+
+def _get_orders(rng: random.Random, seed: Dict) -> Request:
+    return "GET", f"/api_membership/orders?publisher_id={rng.choice(seed['publishers'])}", None
+
+
+def _track_order(rng: random.Random, seed: Dict) -> Request:
+    return "POST", "/api_membership/orders/track", {
+        "advertiser_id": rng.choice(seed['advertisers']),
+        "publisher_id": rng.choice(seed['publishers']),
+        "user_id": str(rng.randrange(1_000_000)),
+        "amount": round(rng.uniform(5, 300), 2),
+        "tracking_params": {"campaign": f"campaign_{rng.randrange(20)}"}
+    }
+
+
+def _get_advertisers(rng: random.Random, seed: Dict) -> Request:
+    return "GET", "/api_membership/advertisers", None
+
+
+def _get_advertiser(rng: random.Random, seed: Dict) -> Request:
+    return "GET", f"/api_membership/advertisers/{rng.choice(seed['advertisers'])}", None
+
+
+def _get_campaign_report(rng: random.Random, seed: Dict) -> Request:
+    return "GET", f"/api_membership/reports/campaigns?publisher_id={rng.choice(seed['publishers'])}", None
+
+
+def _batch(rng: random.Random, seed: Dict) -> Request:
+    publisher_id = rng.choice(seed['publishers'])
+    return "POST", "/api_membership/batch", {"requests": [
+        {"method": "GET", "path": f"/api_membership/advertisers/{rng.choice(seed['advertisers'])}"},
+        {"method": "GET", "path": f"/api_membership/orders?publisher_id={publisher_id}"},
+        {"method": "GET", "path": f"/api_membership/advertisers?publisher_id={publisher_id}"},
+    ]}
+
+
+OPERATIONS: Dict[str, Callable[[random.Random, Dict], Request]] = {
+    "get_orders": _get_orders,
+    "track_order": _track_order,
+    "get_advertisers": _get_advertisers,
+    "get_advertiser": _get_advertiser,
+    "get_campaign_report": _get_campaign_report,
+    "batch": _batch,
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parses a 'name=weight,...' workload mix."""
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}, expected one of {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def seed_app(app, publishers: int, orders: int, seed: int = 42) -> Dict:
+    """
+    Fills the services of an app with synthetic data.
+
+    Every publisher gets approved applications to all advertisers, and orders
+    are spread over them.
+
+    Returns:
+        The publisher and advertiser IDs used by the workload
+    """
+    services = app.extensions['api_membership']
+    advertisers = [advertiser.id for advertiser in services.advertiser_service.get_all_advertisers()]
+    publisher_ids = [f"load_publisher_{i}" for i in range(publishers)]
+
+    application_service = services.application_service
+    for publisher_id in publisher_ids:
+        for advertiser_id in advertisers:
+            _, _, application = application_service.apply_to_advertiser(publisher_id, advertiser_id)
+            application_service.update_application_status(application.id, ApplicationStatus.APPROVED)
+
+    rng = random.Random(seed)
+    order_service = services.order_service
+    for _ in range(orders):
+        order_service.track_order(rng.choice(advertisers), rng.choice(publisher_ids), str(rng.randrange(1_000_000)),
+                                  round(rng.uniform(5, 300), 2), {"campaign": f"campaign_{rng.randrange(20)}"})
+    return {"publishers": publisher_ids, "advertisers": advertisers}
+
+
+class WsgiTransport:
+    """Calls the app in-process through its WSGI interface."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, method: str, path: str, body: Optional[Dict]) -> int:
+        environ = EnvironBuilder(path=path, method=method, json=body).get_environ()
+        status = []
+        chunks = self.app(environ, lambda status_line, headers, exc_info=None: status.append(status_line))
+        try:
+            for _ in chunks:
+                pass
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        return int(status[0].split()[0])
+
+
+class SocketTransport:
+    """Sends requests over HTTP keep-alive connections, one per thread."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._local = threading.local()
+
+    def __call__(self, method: str, path: str, body: Optional[Dict]) -> int:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            raise
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    """Request handler without per-request logging, which would skew the latencies."""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def percentile(sorted_values: List[float], rank: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values), max(1, math.ceil(rank / 100 * len(sorted_values)))) - 1
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    """Builds the statistics of a set of requests."""
+    latencies = sorted(latencies)
+    count = len(latencies)
+    summary = {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 6) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+    }
+    for rank in PERCENTILES:
+        summary[f"p{str(rank).replace('.', '')}_ms"] = round(percentile(latencies, rank) * 1e3, 3)
+    return summary
+
+
+def run_load_test(transport: Callable, seed: Dict, mix: Dict[str, float], concurrency: int = 4,
+                  duration: Optional[float] = None, requests: Optional[int] = None,
+                  random_seed: int = 42) -> Dict:
+    """
+    Drives the app with a weighted mix of requests from several threads.
+
+    Args:
+        transport: Callable sending (method, path, body) and returning the status code
+        seed: Publisher and advertiser IDs available to the workload
+        mix: Weight of each operation
+        concurrency: Number of client threads
+        duration: Run time in seconds
+        requests: Total number of requests (used when no duration is given)
+        random_seed: Seed of the request generators
+
+    Returns:
+        The overall and per-operation statistics
+    """
+    if duration is None and requests is None:
+        raise ValueError("Either duration or requests is required")
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = {name: ([], [0]) for name in names}
+    results_lock = threading.Lock()
+    remaining = [requests]
+    deadline = time.perf_counter() + duration if duration else None
+
+    def take_request() -> bool:
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        with results_lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker(worker_id: int):
+        rng = random.Random(random_seed + worker_id)
+        local = {name: ([], [0]) for name in names}
+        while take_request():
+            name = rng.choices(names, weights)[0]
+            method, path, body = OPERATIONS[name](rng, seed)
+            start = time.perf_counter()
+            try:
+                failed = transport(method, path, body) >= 400
+            except Exception:
+                failed = True
+            local[name][0].append(time.perf_counter() - start)
+            local[name][1][0] += failed
+        with results_lock:
+            for name, (latencies, errors) in local.items():
+                results[name][0].extend(latencies)
+                results[name][1][0] += errors[0]
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = [latency for latencies, _ in results.values() for latency in latencies]
+    all_errors = sum(errors[0] for _, errors in results.values())
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "overall": summarize(all_latencies, all_errors, elapsed),
+        "operations": {name: summarize(latencies, errors[0], elapsed)
+                       for name, (latencies, errors) in results.items()},
+    }
+
+
+def compare(baseline: Dict, current: Dict) -> Dict:
+    """Computes the relative change of the overall statistics between two runs."""
+    changes = {}
+    for key, value in current["overall"].items():
+        previous = baseline["overall"].get(key)
+        if isinstance(value, (int, float)) and previous:
+            changes[key] = round((value - previous) / previous * 100, 2)
+    return {"baseline": baseline.get("commit"), "current": current.get("commit"), "change_percent": changes}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transport', choices=('wsgi', 'socket'), default='wsgi')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--requests', type=int, default=None, help="Fixed number of requests instead of a duration")
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--publishers', type=int, default=100)
+    parser.add_argument('--orders', type=int, default=20_000)
+    parser.add_argument('--rate-limit', action='store_true', help="Keep per-publisher rate limiting enabled")
+    parser.add_argument('--output', help="Write the JSON results to this file")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as baseline_file, open(args.compare[1]) as current_file:
+            print(json.dumps(compare(json.load(baseline_file), json.load(current_file)), indent=2))
+        return
+
+    app = create_app({'TESTING': True, 'DEBUG': False, 'RATE_LIMIT_ENABLED': args.rate_limit})
+    seed = seed_app(app, args.publishers, args.orders)
+
+    server = None
+    if args.transport == 'socket':
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietRequestHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        transport = SocketTransport('127.0.0.1', server.server_port)
+    else:
+        transport = WsgiTransport(app)
+
+    results = run_load_test(transport, seed, parse_mix(args.mix), args.concurrency,
+                            duration=None if args.requests else args.duration, requests=args.requests)
+    results.update({
+        "commit": _git_commit(),
+        "config": {key: getattr(args, key) for key in
+                   ('transport', 'concurrency', 'duration', 'requests', 'mix', 'publishers', 'orders')},
+        "python": sys.version.split()[0],
+    })
+    if server is not None:
+        server.shutdown()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,17 @@
+import os
 from app import create_app
 
-app = create_app()
+prefork = os.environ.get('PREFORK', '').lower() in ('1', 'true', 'yes')
+workers = int(os.environ.get('WEB_WORKERS', '1'))
+shards = int(os.environ.get('ORDER_SHARDS', '1'))
+if workers > 1 and not prefork:
+    # Pre-forked workers don't share their state, so more than one worker must be asked for explicitly
+    raise SystemExit("WEB_WORKERS > 1 requires PREFORK=1; see 'Multi-worker deployment' in the README")
+app = create_app({'PREFORK': prefork, 'ORDER_SHARDS': shards})
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    if prefork:
+        from app.utils.prefork import serve_prefork
+        serve_prefork(app, host='0.0.0.0', port=5000, workers=workers)
+    else:
+        app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,87 @@
+import json
+import os
+import time
+
+from app import create_app
+from app.utils.access_log import ACCESS_LOG_FILE, AccessLog
+
+
+def record(status: int = 200):
+    return (1735689600.0, 'GET', '/api_membership/orders', status, 0.0012, 'publisher_1', None, None)
+
+
+def read_lines(path: str):
+    with open(path, encoding='utf-8') as log_file:
+        return [json.loads(line) for line in log_file]
+
+
+def test_full_buffer_drops_and_counts_records(tmp_path):
+    """Records beyond the buffer are dropped without blocking, then the rest is written."""
+    access_log = AccessLog(str(tmp_path), buffer_size=2)
+    assert [access_log.record(record()) for _ in range(3)] == [True, True, False]
+    access_log.flush()
+
+    assert access_log.stats == {"buffered": 0, "written": 2, "dropped": 1, "rotations": 0}
+    assert read_lines(access_log.path)[0] == {
+        'time': '2025-01-01T00:00:00.000+00:00', 'method': 'GET', 'route': '/api_membership/orders',
+        'status': 200, 'latency_ms': 1.2, 'publisher_id': 'publisher_1', 'advertiser_id': None, 'order_id': None
+    }
+
+
+def test_files_rotate_by_size(tmp_path):
+    """A file past max_bytes is rotated, and only backup_count rotated files are kept."""
+    access_log = AccessLog(str(tmp_path), batch_size=1, max_bytes=100, backup_count=2)
+    for status in (200, 201, 400, 404):
+        access_log.record(record(status))
+    access_log.close()
+
+    assert access_log.rotations == 4
+    assert sorted(os.listdir(tmp_path)) == [f"{ACCESS_LOG_FILE}.1", f"{ACCESS_LOG_FILE}.2"]
+    assert [line['status'] for line in read_lines(f"{access_log.path}.1")] == [404]
+
+
+def test_requests_are_logged_by_the_writer(tmp_path):
+    """create_app logs each request's route, IDs, status and order when ACCESS_LOG_DIR is set."""
+    app = create_app({'TESTING': True, 'ACCESS_LOG_DIR': str(tmp_path),
+                      'ACCESS_LOG_OPTIONS': {'flush_interval': 0.01}})
+    client = app.test_client()
+    response = client.post('/api_membership/orders/track', json={
+        'advertiser_id': 'user_1', 'publisher_id': 'publisher_1', 'user_id': '1', 'amount': 20
+    })
+    client.get('/api_membership/advertisers/unknown')
+    access_log = app.extensions['access_log']
+    access_log.close()
+
+    tracked, missing = read_lines(access_log.path)
+    assert (tracked['route'], tracked['status'], tracked['publisher_id'], tracked['advertiser_id']) == (
+        '/api_membership/orders/track', 201, 'publisher_1', 'user_1'
+    )
+    assert tracked['order_id'] == response.get_json()['data']['id']
+    assert tracked['latency_ms'] > 0
+    assert (missing['route'], missing['status'], missing['advertiser_id']) == (
+        '/api_membership/advertisers/<string:advertiser_id>', 404, 'unknown'
+    )
+
+
+def test_forked_child_starts_its_own_writer(tmp_path):
+    """A process forked after the writer started (prefork worker) writes its records to its own file."""
+    access_log = AccessLog(str(tmp_path), flush_interval=0.01)
+    access_log.start()
+    access_log.record(record(201))
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            access_log.record(record(404))
+            deadline = time.monotonic() + 5
+            while access_log.written < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            os._exit(0 if access_log.written == 1 else 1)
+        finally:
+            os._exit(2)
+    _, exit_status = os.waitpid(pid, 0)
+    access_log.close()
+
+    assert os.waitstatus_to_exitcode(exit_status) == 0
+    assert [line['status'] for line in read_lines(str(tmp_path / f"access-{pid}.ndjson"))] == [404]
+    assert [line['status'] for line in read_lines(access_log.path)] == [201]
@@ -0,0 +1,65 @@
+import json
+from unittest.mock import MagicMock
+
+BATCH_URL = '/api_membership/batch'
+
+
+def post_batch(client, requests, **options):
+    response = client.post(BATCH_URL, json={"requests": requests, **options})
+    return response, json.loads(response.data)
+
+
+def test_batch_executes_sub_requests_in_order(client):
+    """Results come back in order, and reads see the writes made before them."""
+    response, data = post_batch(client, [
+        {"method": "GET", "path": "/api_membership/advertisers/user_1"},
+        {"method": "POST", "path": "/api_membership/orders/track",
+         "body": {"advertiser_id": "user_1", "publisher_id": "publisher_1", "user_id": "42", "amount": 80}},
+        {"method": "GET", "path": "/api_membership/orders?publisher_id=publisher_1"},
+        {"method": "GET", "path": "/api_membership/advertisers/nonexistent_id"},
+    ])
+
+    assert response.status_code == 200
+    assert data['message'] == "4 requests executed"
+    statuses = [result['status'] for result in data['data']]
+    assert statuses == [200, 201, 200, 404]
+    order_id = data['data'][1]['body']['data']['id']
+    assert order_id in [order['id'] for order in data['data'][2]['body']['data']]
+
+
+def test_batch_dedupes_identical_reads(app, client):
+    """Identical reads are executed once and share their result."""
+    advertiser_service = app.extensions['api_membership'].advertiser_service
+    advertiser_service.get_all_advertisers = MagicMock(wraps=advertiser_service.get_all_advertisers)
+
+    _, data = post_batch(client, [{"path": "/api_membership/advertisers"}] * 3 +
+                         [{"path": "/api_membership/advertisers/user_2"}], parallel=True)
+
+    assert [result['status'] for result in data['data']] == [200] * 4
+    assert data['data'][0] == data['data'][2]
+    assert advertiser_service.get_all_advertisers.call_count == 1
+
+
+def test_batch_rejects_invalid_requests(client):
+    """Malformed batches, nested batches and oversized batches are refused."""
+    for requests in [None, [], [{"path": "advertisers"}], [{"method": "POST", "path": BATCH_URL}]]:
+        response, data = post_batch(client, requests)
+        assert response.status_code == 400
+        assert data['success'] is False
+
+    response, data = post_batch(client, [{"path": "/api_membership/advertisers"}] * 51)
+    assert response.status_code == 400
+    assert "50" in data['message']
+
+
+def test_batch_sub_requests_are_rate_limited(app):
+    """Sub-requests go through the same per-publisher limits as direct calls."""
+    limiter = app.extensions['rate_limiters']['api_membership.track_order']
+    limiter.acquire = MagicMock(return_value=2.0)
+
+    _, data = post_batch(app.test_client(), [
+        {"method": "POST", "path": "/api_membership/orders/track",
+         "body": {"advertiser_id": "user_1", "publisher_id": "publisher_1", "user_id": "1", "amount": 10}}
+    ])
+
+    assert data['data'][0]['status'] == 429
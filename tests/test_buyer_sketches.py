@@ -0,0 +1,93 @@
+import pickle
+from datetime import datetime, timedelta
+
+from app.models import Order
+from app.services.buyer_sketches import BuyerSketches
+from app.utils.hyperloglog import HyperLogLog, relative_error
+
+
+def test_hyperloglog_estimates_within_error_bound():
+    """Estimates stay within 3 standard errors, sparse or dense, and merge without double counting."""
+    first, second = HyperLogLog(), HyperLogLog()
+    first.update(f"buyer_{i}" for i in range(50_000))
+    second.update(f"buyer_{i}" for i in range(25_000, 60_000))
+    assert abs(first.count() - 50_000) <= 3 * relative_error() * 50_000
+    assert first.registers is not None
+
+    small = HyperLogLog()
+    small.update(["a", "b", "a", "c"])
+    assert small.registers is None and small.count() == 3
+
+    merged = first.copy().merge(second).merge(small)
+    assert abs(merged.count() - 60_003) <= 3 * relative_error() * 60_003
+    assert first.count() != merged.count()
+
+
+def test_hyperloglog_serialization_round_trip():
+    """Sparse and dense sketches survive bytes and pickling (shard IPC)."""
+    for buyers in (10, 10_000):
+        sketch = HyperLogLog(10)
+        sketch.update(str(i) for i in range(buyers))
+        restored = HyperLogLog.from_bytes(sketch.to_bytes())
+        assert restored.precision == 10 and restored.count() == sketch.count()
+        assert pickle.loads(pickle.dumps(sketch)).count() == sketch.count()
+
+
+def test_buyer_sketches_merge_days_and_pairs():
+    """A buyer ordering on several days or from several publishers is counted once."""
+    sketches = BuyerSketches(retention_days=30)
+    start = datetime(2025, 3, 1)
+    for day in range(3):
+        for publisher_id in ("publisher_1", "publisher_2"):
+            for user in range(100):
+                sketches.add(Order(id=0, advertiser_id="user_1", publisher_id=publisher_id, user_id=str(user),
+                                   amount=1.0, commission=0.1, order_date=start + timedelta(days=day)))
+
+    daily = sketches.daily_sketches(advertiser_id="user_1", from_date=start + timedelta(days=1))
+    assert sorted(daily) == [(start + timedelta(days=1)).date(), (start + timedelta(days=2)).date()]
+    assert BuyerSketches.from_bytes(sketches.to_bytes()).daily_sketches("publisher_2")[start.date()].count() == 100
+
+    sketches.add(Order(id=0, advertiser_id="user_1", publisher_id="publisher_1", user_id="1", amount=1.0,
+                       commission=0.1, order_date=start + timedelta(days=40)))
+    assert len(sketches.daily_sketches("publisher_1")) == 1
+
+
+def test_get_unique_buyers_endpoint(client):
+    """The report estimates distinct buyers, per day if asked, and validates its query."""
+    for user_id in ("1", "2", "1"):
+        client.post('/api_membership/orders/track', json={
+            'advertiser_id': 'user_1', 'publisher_id': 'publisher_1', 'user_id': user_id, 'amount': 20
+        })
+
+    today = datetime.now().date().isoformat()
+    response = client.get('/api_membership/reports/unique-buyers',
+                          query_string={'publisher_id': 'publisher_1', 'from_date': today, 'by_day': 'true'})
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['unique_buyers'] == 2
+    assert data['relative_error'] == 0.0163
+    assert data['days'] == [{'date': today, 'unique_buyers': 2}]
+
+    response = client.get('/api_membership/reports/unique-buyers')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "Invalid request: Publisher login or Advertiser ID required"
+
+
+def test_reports_merge_outside_the_ingest_lock(monkeypatch):
+    """Merging a report's sketches doesn't hold the lock order ingestion needs."""
+    sketches = BuyerSketches()
+    for publisher in range(3):
+        for user in range(2000):
+            sketches.add(Order(id=0, advertiser_id="user_1", publisher_id=f"publisher_{publisher}",
+                               user_id=str(user), amount=1.0, commission=0.1, order_date=datetime(2025, 3, 1)))
+    merge = HyperLogLog.merge
+    locked_merges = []
+
+    def checked_merge(sketch, other):
+        locked_merges.append(sketches._lock.locked())
+        return merge(sketch, other)
+
+    monkeypatch.setattr(HyperLogLog, "merge", checked_merge)
+    daily = sketches.daily_sketches(advertiser_id="user_1")
+    assert locked_merges == [False, False]
+    assert abs(daily[datetime(2025, 3, 1).date()].count() - 2000) <= 3 * relative_error() * 2000
@@ -0,0 +1,139 @@
+import json
+import threading
+import pytest
+from app import create_app
+from app.models import ApplicationStatus, OrderStatus
+from app.services.advertiser_service import AdvertiserService
+from app.services.application_service import ApplicationService
+from app.services.event_log import EventLog
+from app.services.order_service import OrderService
+
+
+def append(event_log, publisher_id="publisher_1", entity_id=1):
+    return event_log.append("order.tracked", publisher_id, "user_1", entity_id, "pending")
+
+
+def test_read_returns_events_after_sequence():
+    """Events are numbered and read incrementally, optionally per publisher."""
+    event_log = EventLog()
+    append(event_log, "publisher_1", 1)
+    append(event_log, "publisher_2", 2)
+    append(event_log, "publisher_1", 3)
+
+    events, next_seq, resync = event_log.read(0, "publisher_1")
+    assert [event.entity_id for event in events] == [1, 3]
+    assert (next_seq, resync) == (3, False)
+
+    events, next_seq, resync = event_log.read(1)
+    assert [event.seq for event in events] == [2, 3]
+    assert event_log.read(3) == ([], 3, False)
+
+
+def test_read_signals_resync_when_behind_retention():
+    """Readers behind the retained window are told to resync."""
+    event_log = EventLog(retention=3)
+    for i in range(5):
+        append(event_log, entity_id=i)
+
+    assert event_log.read(0) == ([], 5, True)
+    assert event_log.read(9) == ([], 5, True)
+    events, _, resync = event_log.read(2)
+    assert not resync
+    assert [event.seq for event in events] == [3, 4, 5]
+
+
+def test_wait_wakes_up_on_append():
+    """Long-poll readers are woken up by new events."""
+    event_log = EventLog()
+    timer = threading.Timer(0.05, append, args=(event_log,))
+    timer.start()
+
+    assert event_log.wait(0, timeout=5)
+    assert not event_log.wait(1, timeout=0.01)
+    timer.join()
+
+
+def test_services_publish_events():
+    """Orders and applications publish their changes to the log."""
+    event_log = EventLog()
+    application_service = ApplicationService(AdvertiserService(), event_log=event_log)
+    order_service = OrderService(application_service, event_log=event_log)
+
+    _, _, application = application_service.apply_to_advertiser("publisher_3", "user_1")
+    application_service.update_application_status(application.id, ApplicationStatus.APPROVED)
+    order = order_service.track_order("user_1", "publisher_3", "1", 80.0)
+    order_service.update_order_status(order.id, OrderStatus.CONFIRMED)
+
+    events, _, _ = event_log.read(0, "publisher_3")
+    assert [(event.type, event.status, event.previous_status) for event in events] == [
+        ("application.created", "pending", None),
+        ("application.status_changed", "approved", "pending"),
+        ("order.tracked", "pending", None),
+        ("order.status_changed", "confirmed", "pending"),
+    ]
+    assert events[2].data["commission"] == pytest.approx(4.0)
+
+
+def test_get_events(client):
+    """Tests the long-poll events endpoint."""
+    client.post('/api_membership/orders/track', json={
+        "advertiser_id": "user_1", "publisher_id": "publisher_1", "user_id": "1", "amount": 20})
+
+    response = client.get('/api_membership/events?publisher_id=publisher_1&since=0')
+    data = json.loads(response.data)['data']
+    assert response.status_code == 200
+    assert [event['type'] for event in data['events']] == ["order.tracked"]
+
+    response = client.get(f"/api_membership/events?publisher_id=publisher_1&since={data['next_seq']}&wait=0.01")
+    assert json.loads(response.data)['data']['events'] == []
+
+    response = client.get('/api_membership/events?publisher_id=publisher_1&since=999')
+    assert json.loads(response.data)['data']['resync'] is True
+
+    assert client.get('/api_membership/events').status_code == 400
+
+
+def test_get_events_stream(client):
+    """Tests the Server-Sent Events stream."""
+    client.post('/api_membership/orders/track', json={
+        "advertiser_id": "user_1", "publisher_id": "publisher_1", "user_id": "1", "amount": 20})
+
+    response = client.get('/api_membership/events?publisher_id=publisher_1&stream=1&duration=0')
+    body = response.get_data(as_text=True)
+    assert response.mimetype == 'text/event-stream'
+    assert "event: order.tracked" in body
+    assert "id: 1" in body
+
+
+def test_event_streams_are_capped_apart_from_requests():
+    """Streams don't hold in-flight slots, are limited on their own and can't last longer than the cap."""
+    app = create_app({'TESTING': True, 'MAX_IN_FLIGHT': 1, 'MAX_EVENT_STREAMS': 1})
+    client = app.test_client()
+    url = '/api_membership/events?publisher_id=publisher_1&stream=1&duration=5'
+    client.post('/api_membership/orders/track', json={
+        "advertiser_id": "user_1", "publisher_id": "publisher_1", "user_id": "1", "amount": 20})
+
+    stream = client.get(url, buffered=False)
+    assert stream.status_code == 200
+    assert app.extensions['load_shedder'].in_flight == 0
+    assert client.get('/api_membership/advertisers').status_code == 200
+    assert client.get(url, buffered=False).status_code == 503
+    stream.close()
+    assert app.extensions['event_stream_shedder'].in_flight == 0
+
+    response = client.get('/api_membership/events?publisher_id=publisher_1&stream=1&duration=301')
+    assert response.status_code == 400
+
+
+def test_failing_listener_does_not_fail_the_write(client, app):
+    """A listener raising is logged and counted; the order is still tracked and other listeners run."""
+    services = app.extensions['api_membership']
+    received = []
+    services.event_log.subscribe(lambda event: 1 / 0)
+    services.event_log.subscribe(received.append)
+
+    response = client.post('/api_membership/orders/track', json={
+        "advertiser_id": "user_1", "publisher_id": "publisher_1", "user_id": "1", "amount": 20})
+    assert response.status_code == 201
+    assert services.event_log.listener_errors == 1
+    assert [event.type for event in received] == ["order.tracked"]
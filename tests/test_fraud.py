@@ -0,0 +1,156 @@
+import json
+import sys
+import threading
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from app.models import Order, OrderStatus
+from app.services.application_service import ApplicationService
+from app.services.fraud_service import FraudService, VelocityRule
+from app.services.order_service import OrderService
+from app.utils.velocity import SlidingWindowCounter
+
+
+def make_order(user_id="1", publisher_id="publisher_1", advertiser_id="user_1", amount=10.0, order_date=None):
+    """Builds an order for the detector."""
+    return Order(id=1, advertiser_id=advertiser_id, publisher_id=publisher_id, user_id=user_id,
+                 amount=amount, commission=amount * 0.05, order_date=order_date or datetime(2025, 3, 1, 12, 0))
+
+
+def test_sliding_window_expires_old_buckets():
+    """Events leave the window once it has slid past them."""
+    window = SlidingWindowCounter(window_seconds=60, bucket_seconds=10)
+
+    window.add("key", 0, 5.0)
+    window.add("key", 30, 5.0)
+    assert window.get("key", 55) == (2, 10.0)
+    assert window.get("key", 65) == (1, 5.0)
+    assert window.get("key", 1000) == (0, 0.0)
+
+
+def test_sliding_window_is_bounded():
+    """Keys with an empty window are purged first, then the oldest keys."""
+    window = SlidingWindowCounter(window_seconds=60, bucket_seconds=10, max_keys=3)
+    window.add("expired", 0)
+    for i in range(10):
+        window.add(f"user_{i}", 100)
+
+    assert len(window) <= 3
+    assert window.get("expired", 100) == (0, 0.0)
+    assert window.get("user_0", 100) == (0, 0.0)
+    assert window.get("user_9", 100) == (1, 0.0)
+
+
+def test_user_velocity_holds_orders():
+    """A user ordering too fast gets the following orders held."""
+    fraud_service = FraudService(rules=[VelocityRule(name="user_velocity", scope='user', max_orders=2)])
+    orders = [make_order() for _ in range(3)]
+
+    assert [fraud_service.inspect(order) for order in orders] == [[], [], ["user_velocity"]]
+    assert orders[2].status == OrderStatus.HELD
+    assert orders[2].hold_reason == "user_velocity"
+    assert orders[0].hold_reason is None
+    assert fraud_service.get_metrics()["rule_hits"] == {"user_velocity": 1}
+
+
+def test_flag_rules_only_count_hits():
+    """Flag rules record metrics without holding the order."""
+    fraud_service = FraudService(rules=[
+        VelocityRule(name="pair_amount", scope='publisher_advertiser', max_amount=15.0, action='flag')])
+    fraud_service.inspect(make_order())
+    order = make_order()
+
+    assert fraud_service.inspect(order) == ["pair_amount"]
+    assert order.hold_reason is None
+    assert fraud_service.held == 0
+
+
+def test_window_slides_with_order_dates():
+    """Orders spread over time don't trigger the rule."""
+    fraud_service = FraudService(rules=[VelocityRule(name="user_velocity", scope='user', max_orders=1)])
+    start = datetime(2025, 3, 1)
+
+    hits = [fraud_service.inspect(make_order(order_date=start + timedelta(hours=i))) for i in range(3)]
+    assert hits == [[], [], []]
+
+
+def test_unknown_scope_is_rejected():
+    """Rules must use a known scope."""
+    with pytest.raises(ValueError):
+        FraudService(rules=[VelocityRule(name="bad", scope='country', max_orders=1)])
+
+
+def test_track_order_runs_detector():
+    """The detector runs on the ingest path of OrderService."""
+    application_service = MagicMock(spec=ApplicationService)
+    application_service.check_publisher_access.return_value = True
+    fraud_service = FraudService(rules=[VelocityRule(name="user_velocity", scope='user', max_orders=1)])
+    order_service = OrderService(application_service, fraud_service=fraud_service)
+
+    order_service.track_order("user_1", "publisher_1", "42", 10.0)
+    order = order_service.track_order("user_1", "publisher_1", "42", 10.0)
+
+    assert order.hold_reason == "user_velocity"
+    assert order.order_date is not None
+
+
+def test_held_order_must_be_released_before_confirmation():
+    """Held orders can't be confirmed until set back to pending."""
+    application_service = MagicMock(spec=ApplicationService)
+    application_service.check_publisher_access.return_value = True
+    fraud_service = FraudService(rules=[VelocityRule(name="user_velocity", scope='user', max_orders=1)])
+    order_service = OrderService(application_service, fraud_service=fraud_service)
+
+    order_service.track_order("user_1", "publisher_1", "42", 10.0)
+    order = order_service.track_order("user_1", "publisher_1", "42", 10.0)
+    assert order.status == OrderStatus.HELD
+
+    with pytest.raises(ValueError):
+        order_service.update_order_status(order.id, OrderStatus.CONFIRMED)
+
+    released = order_service.update_order_status(order.id, OrderStatus.PENDING)
+    assert released.hold_reason is None
+    assert order_service.update_order_status(order.id, OrderStatus.CONFIRMED).status == OrderStatus.CONFIRMED
+
+
+def test_get_fraud_metrics(client):
+    """Tests retrieving the rule hit metrics."""
+    response = client.get('/api_membership/fraud/metrics')
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert "rule_hits" in data['data']
+
+
+
+def test_inspect_is_thread_safe():
+    """Concurrent ingest threads neither lose window updates nor break purges."""
+    fraud_service = FraudService(rules=[
+        VelocityRule(name="user_velocity", scope='user', max_orders=10_000),
+        VelocityRule(name="publisher_burst", scope='publisher', max_orders=10_000)], max_keys=20)
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def track_orders(thread):
+        barrier.wait()
+        try:
+            for i in range(5000):
+                fraud_service.inspect(make_order(user_id=f"{thread}_{i}"))
+        except Exception as error:
+            errors.append(error)
+
+    switch_interval = sys.getswitchinterval()
+    # Switches threads as often as possible, so unsynchronized updates interleave
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=track_orders, args=(thread,)) for thread in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert errors == []
+    timestamp = make_order().order_date.timestamp()
+    assert fraud_service.windows[('publisher', 600)].get("publisher_1", timestamp) == (20_000, 200_000.0)
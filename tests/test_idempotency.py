@@ -0,0 +1,93 @@
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from app.services.application_service import ApplicationService
+from app.services.order_service import OrderService
+from app.utils.idempotency import BloomFilter, IdempotencyCache
+
+
+@pytest.fixture
+def order_service():
+    """Initializes an OrderService whose publishers always have access."""
+    application_service = MagicMock(spec=ApplicationService)
+    application_service.check_publisher_access.return_value = True
+    return OrderService(application_service)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Every inserted key must be reported as present."""
+    bloom = BloomFilter(1000)
+    keys = [f"ref-{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other-{i}" in bloom for i in range(1000))
+    assert false_positives < 50
+
+
+def test_cache_evicts_oldest_keys_beyond_capacity():
+    """The cache never holds more than its capacity."""
+    cache = IdempotencyCache(capacity=10)
+    for i in range(25):
+        cache.put(f"key-{i}", i)
+
+    assert len(cache) == 10
+    assert cache.get("key-0") is None
+    assert cache.get("key-24") == 24
+
+
+def test_cache_expires_keys(monkeypatch):
+    """Keys are forgotten once their TTL has elapsed."""
+    cache = IdempotencyCache(capacity=10, ttl=60)
+    cache.put("key", "order-1")
+
+    now = time.monotonic()
+    monkeypatch.setattr('app.utils.idempotency.time.monotonic', lambda: now + 61)
+
+    assert cache.get("key") is None
+
+
+def test_track_order_replay_returns_original_order(order_service):
+    """Retries carrying the same key don't create new orders."""
+    first = order_service.track_order("user_1", "publisher_1", "1", 10.0, idempotency_key="ref-42")
+    replay = order_service.track_order("user_1", "publisher_1", "1", 10.0, idempotency_key="ref-42")
+
+    assert replay is first
+    assert len([o for o in order_service.orders.values() if o.amount == 10.0]) == 1
+
+
+def test_idempotency_keys_are_scoped_by_advertiser(order_service):
+    """Two advertisers may use the same order reference."""
+    first = order_service.track_order("user_1", "publisher_1", "1", 10.0, idempotency_key="ref-42")
+    second = order_service.track_order("user_2", "publisher_1", "1", 10.0, idempotency_key="ref-42")
+
+    assert first.id != second.id
+
+
+def test_concurrent_retries_create_one_order(order_service):
+    """Retries racing with the same key all get the order created by the first one."""
+    # A slow fraud check between the first lookup and the write lock lets every retry miss the cache
+    order_service.fraud_service = MagicMock()
+    order_service.fraud_service.inspect.side_effect = lambda order: time.sleep(0.002)
+    threads, keys = 8, 20
+    barrier = threading.Barrier(threads)
+    results = [[] for _ in range(threads)]
+
+    def retry(results_of_thread):
+        for key in range(keys):
+            barrier.wait()
+            order = order_service.track_order("user_1", "publisher_1", "1", 20.0, idempotency_key=f"ref-{key}")
+            results_of_thread.append(order.id)
+
+    workers = [threading.Thread(target=retry, args=(results_of_thread,)) for results_of_thread in results]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert all(results_of_thread == results[0] for results_of_thread in results)
+    assert len(set(results[0])) == keys
+    tracked = [order for order in order_service.orders.values() if order.amount == 20.0]
+    assert len(tracked) == keys
@@ -0,0 +1,95 @@
+import json
+import pytest
+from app.utils.id_generator import IdGenerator, SnowflakeIdGenerator, decode_id, encode_id
+
+
+def test_ids_are_monotonic_and_time_ordered():
+    """IDs increase even when the clock stalls or goes back, and encode their creation time."""
+    now = [1_750_000_000_000]
+    generator = SnowflakeIdGenerator(shard_id=3, clock=lambda: now[0])
+
+    first = generator.next_id()
+    second = generator.next_id()
+    now[0] -= 5000
+    third = generator.next_id()
+    now[0] += 10_000
+    fourth = generator.next_id()
+
+    assert first < second < third < fourth
+    assert SnowflakeIdGenerator.timestamp_ms(first) == 1_750_000_000_000
+    assert SnowflakeIdGenerator.shard_of(fourth) == 3
+    assert generator.min_id(generator.datetime_of(fourth)) <= fourth
+
+
+def test_sequence_overflow_borrows_next_millisecond():
+    generator = SnowflakeIdGenerator(clock=lambda: 1_750_000_000_000)
+    ids = [generator.next_id() for _ in range(5000)]
+
+    assert ids == sorted(set(ids))
+    assert SnowflakeIdGenerator.timestamp_ms(ids[-1]) == 1_750_000_000_001
+
+
+def test_shards_never_collide():
+    clock = lambda: 1_750_000_000_000
+    ids = {SnowflakeIdGenerator(shard_id=shard, clock=clock).next_id() for shard in range(8)}
+    assert len(ids) == 8
+
+    with pytest.raises(ValueError):
+        SnowflakeIdGenerator(shard_id=512)
+    with pytest.raises(TypeError):
+        IdGenerator()
+
+
+def test_imported_ids_never_collide_with_live_ids():
+    """Imported IDs use their own bit, so a wrapped import counter can't produce a live ID."""
+    generator = SnowflakeIdGenerator(shard_id=5, clock=lambda: 1_750_000_000_000)
+    live = {generator.next_id() for _ in range(10)}
+    at = generator.datetime_of(min(live))
+    imported = [generator.next_id(at=at) for _ in range(4096 + 10)]
+
+    assert live.isdisjoint(imported)
+    assert all(SnowflakeIdGenerator.is_imported(entity_id) for entity_id in imported)
+    assert not any(SnowflakeIdGenerator.is_imported(entity_id) for entity_id in live)
+    assert {SnowflakeIdGenerator.shard_of(entity_id) for entity_id in imported} == {5}
+    assert generator.datetime_of(imported[0]) == at
+    assert generator.min_id(at) <= min(imported)
+
+
+def test_api_ids_roundtrip():
+    assert decode_id(encode_id(123456789)) == 123456789
+    for value in ["", "-1", "abc", "1" * 20]:
+        with pytest.raises(ValueError):
+            decode_id(value)
+
+
+def test_order_ids_follow_order_dates(app):
+    """Orders sort by ID like by date, and the ID locates the order's segment."""
+    order_service = app.extensions['api_membership'].order_service
+    orders = [order_service.track_order("user_1", "publisher_1", str(i), 10.0) for i in range(5)]
+
+    assert [order.id for order in orders] == sorted(order.id for order in orders)
+    assert [order.order_date for order in orders] == sorted(order.order_date for order in orders)
+    assert order_service.id_generator.datetime_of(orders[0].id) == orders[0].order_date
+
+
+def test_orders_pagination(client):
+    """after_id and limit page through a publisher's orders oldest first."""
+    for i in range(5):
+        client.post('/api_membership/orders/track',
+                    json={"advertiser_id": "user_1", "publisher_id": "publisher_1", "user_id": str(i), "amount": 10})
+
+    seen = []
+    cursor = ""
+    while True:
+        response = client.get(f'/api_membership/orders?publisher_id=publisher_1&limit=2{cursor}')
+        page = json.loads(response.data)['data']
+        if not page:
+            break
+        seen.extend(order['id'] for order in page)
+        cursor = f"&after_id={page[-1]['id']}"
+
+    assert len(seen) == 6
+    assert [int(order_id) for order_id in seen] == sorted(int(order_id) for order_id in seen)
+
+    response = client.get('/api_membership/orders?publisher_id=publisher_1&after_id=abc')
+    assert response.status_code == 400
@@ -0,0 +1,105 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+from app.models import ApplicationStatus, OrderStatus
+from app.services.advertiser_service import AdvertiserService
+from app.services.leaderboard_service import Leaderboard, LeaderboardService, period_of
+
+
+def test_leaderboard_ranks_and_corrects_lazily():
+    """Entries are ranked by commission; decreases are applied on the next read."""
+    board = Leaderboard()
+    board.add("a", 10.0)
+    board.add("b", 5.0)
+    board.add("c", 7.0)
+    board.add("b", 4.0)
+    assert board.top(2) == [("a", 10.0, 1), ("b", 9.0, 2)]
+
+    board.subtract("a", 10.0)
+    board.subtract("b", 4.0)
+    assert board.top(5) == [("c", 7.0, 1), ("b", 5.0, 1)]
+    assert len(board) == 2
+
+
+def test_boards_follow_order_events(app):
+    """Confirmed orders feed the advertiser and category boards; cancellations take them off."""
+    services = app.extensions['api_membership']
+    application_service, order_service = services.application_service, services.order_service
+    for publisher_id in ("publisher_7", "publisher_8"):
+        _, _, application = application_service.apply_to_advertiser(publisher_id, "user_2")
+        application_service.update_application_status(application.id, ApplicationStatus.APPROVED)
+
+    leaderboards = services.leaderboard_service
+    orders = [order_service.track_order("user_2", publisher_id, user_id, amount)
+              for publisher_id, user_id, amount in [("publisher_7", "1", 100.0), ("publisher_8", "2", 300.0),
+                                                    ("publisher_8", "3", 60.0)]]
+    period = period_of(datetime.now())
+    assert leaderboards.get_leaderboard('advertiser', "user_2", period) == []
+
+    for order in orders:
+        order_service.update_order_status(order.id, OrderStatus.CONFIRMED)
+    assert [row["publisher_id"] for row in leaderboards.get_leaderboard('advertiser', "user_2", period)] == [
+        "publisher_8", "publisher_7"
+    ]
+    order_service.update_order_status(orders[1].id, OrderStatus.CANCELLED)
+    rows = leaderboards.get_leaderboard('advertiser', "user_2", period)
+    assert [(row["rank"], row["publisher_id"], row["commission"], row["orders"]) for row in rows] == [
+        (1, "publisher_7", 5.0, 1), (2, "publisher_8", 3.0, 1)
+    ]
+
+
+def test_boards_are_attached_with_the_order_store(app, monkeypatch):
+    """Building the order store attaches the leaderboards, so the first board read doesn't scan orders."""
+    services = app.extensions['api_membership']
+    order_service = services.order_service
+    assert services.is_built('leaderboard_service')
+
+    order = order_service.track_order("user_1", "publisher_1", "1", 100.0)
+    order_service.update_order_status(order.id, OrderStatus.CONFIRMED)
+    monkeypatch.setattr(order_service, "iter_orders", MagicMock(side_effect=AssertionError("orders scanned")))
+    rows = services.leaderboard_service.get_leaderboard('advertiser', "user_1", period_of(datetime.now()))
+    assert [(row["publisher_id"], row["orders"]) for row in rows] == [("publisher_1", 1)]
+
+
+def test_counted_statuses_are_configurable(app):
+    """Pending orders can be ranked too; held orders never are unless configured."""
+    services = app.extensions['api_membership']
+    leaderboards = LeaderboardService(services.advertiser_service,
+                                      counted_statuses=[OrderStatus.PENDING, OrderStatus.CONFIRMED])
+    leaderboards.attach(services.order_service, services.event_log)
+
+    services.order_service.track_order("user_1", "publisher_1", "1", 100.0)
+    rows = leaderboards.get_leaderboard('advertiser', "user_1", period_of(datetime.now()))
+    assert [(row["publisher_id"], row["orders"]) for row in rows] == [("publisher_1", 1)]
+
+
+def test_boards_beyond_retention_expire():
+    """Only the most recent months are kept; category boards rank advertisers."""
+    service = LeaderboardService(AdvertiserService(), retention_periods=2)
+    for month in (1, 2, 3):
+        service._count("publisher_1", "user_1", datetime(2025, month, 1), 1.0, 1)
+    assert {key[2] for key in service.boards} == {"2025-02", "2025-03"}
+    assert service.get_leaderboard('category', "Mode", "2025-03") == [
+        {"rank": 1, "advertiser_id": "user_1", "commission": 1.0, "orders": 1}
+    ]
+
+
+def test_get_leaderboards_endpoint(client):
+    """The endpoint serves the top N of a board and validates its query."""
+    response = client.post('/api_membership/orders/track', json={
+        'advertiser_id': 'user_1', 'publisher_id': 'publisher_1', 'user_id': '1', 'amount': 200
+    })
+    order_id = int(response.get_json()['data']['id'])
+    client.application.extensions['api_membership'].order_service.update_order_status(order_id,
+                                                                                     OrderStatus.CONFIRMED)
+
+    response = client.get('/api_membership/leaderboards', query_string={'category': 'Mode', 'limit': 1})
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['category'] == 'Mode'
+    assert [entry['advertiser_id'] for entry in data['entries']] == ['user_1']
+
+    response = client.get('/api_membership/leaderboards', query_string={'advertiser_id': 'user_1',
+                                                                         'period': '2025-13'})
+    assert response.get_json()['message'] == "Invalid period format (YYYY-MM required)"
+    response = client.get('/api_membership/leaderboards')
+    assert response.status_code == 400
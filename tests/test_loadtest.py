@@ -0,0 +1,28 @@
+from app import create_app
+from benchmarks.loadtest import WsgiTransport, compare, parse_mix, percentile, run_load_test, seed_app
+
+
+def test_percentile_nearest_rank():
+    """Percentiles use the nearest rank, so high ranks of small samples return the maximum."""
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 99.9) == 100.0
+    assert percentile([], 50) == 0.0
+
+
+def test_load_test_smoke():
+    """A short in-process run reports every operation of the mix without errors."""
+    app = create_app({'TESTING': True, 'RATE_LIMIT_ENABLED': False})
+    seed = seed_app(app, publishers=5, orders=50)
+    mix = parse_mix("get_orders=70,track_order=20,get_advertisers=10")
+
+    results = run_load_test(WsgiTransport(app), seed, mix, concurrency=2, requests=60)
+
+    assert results["overall"]["requests"] == 60
+    assert results["overall"]["errors"] == 0
+    assert set(results["operations"]) == set(mix)
+    assert results["overall"]["p50_ms"] <= results["overall"]["p999_ms"]
+
+    changes = compare(results, results)["change_percent"]
+    assert changes["throughput_rps"] == 0
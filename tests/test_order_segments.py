@@ -0,0 +1,127 @@
+import gc
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from app.models import Order, OrderStatus
+from app.services.application_service import ApplicationService
+from app.services.order_segments import FrozenSegment, HotSegment, segment_key, segment_overlaps
+from app.services.order_service import OrderService
+from app.utils.prefork import warm_start
+
+
+@pytest.fixture
+def order_service(tmp_path):
+    """Initializes an OrderService writing frozen segments to a temporary directory."""
+    application_service = MagicMock(spec=ApplicationService)
+    application_service.check_publisher_access.return_value = True
+    return OrderService(application_service, cold_storage_dir=str(tmp_path))
+
+
+def make_order(order_id, order_date, status=OrderStatus.CONFIRMED, publisher_id="publisher_9"):
+    """Builds an order of a given month."""
+    return Order(id=order_id, advertiser_id="user_1", publisher_id=publisher_id, user_id="1", amount=100.0,
+                 commission=5.0, status=status, order_date=order_date, tracking_params={"campaign": "c"})
+
+
+def test_segment_overlaps():
+    """Segments outside the requested range are pruned."""
+    assert segment_overlaps((2025, 2), datetime(2025, 2, 10), None)
+    assert not segment_overlaps((2025, 1), datetime(2025, 2, 1), None)
+    assert not segment_overlaps((2025, 3), None, datetime(2025, 2, 28))
+
+
+def test_frozen_segment_roundtrip():
+    """Freezing keeps every field of the orders."""
+    segment = HotSegment((2025, 1))
+    order = make_order(1, datetime(2025, 1, 5, 10, 30, 15, 123456))
+    order.validation_date = datetime(2025, 1, 20)
+    segment.add(order)
+    segment.add(make_order(2, datetime(2025, 1, 6), publisher_id="publisher_8"))
+
+    frozen = FrozenSegment.from_hot(segment)
+
+    assert frozen.get_order(1) == order
+    assert frozen.get_order("missing") is None
+    assert [o.id for o in frozen.iter_publisher_orders("publisher_8")] == [2]
+    assert list(frozen.iter_publisher_orders("publisher_7")) == []
+
+
+def test_closed_past_segments_are_frozen(order_service, tmp_path):
+    """Past months with only final orders leave the live order map."""
+    order_service._store_order(make_order(1, datetime(2024, 11, 3)))
+    order_service._store_order(make_order(2, datetime(2024, 12, 3), status=OrderStatus.PENDING))
+
+    assert order_service.freeze_closed_segments() == 1
+    assert order_service.segments[(2024, 11)].frozen
+    assert not order_service.segments[(2024, 12)].frozen
+    assert 1 not in order_service.orders
+    assert (tmp_path / "orders-2024-11.seg").exists()
+
+    assert order_service.get_order(1).id == 1
+    orders = order_service.get_orders_for_publisher("publisher_9", from_date=datetime(2024, 11, 1))
+    assert [order.id for order in orders] == [1, 2]
+
+
+def test_status_updates_thaw_a_frozen_segment_once(order_service):
+    """Updates of a frozen month thaw it once; it stays hot until its refreeze delay passed."""
+    for order_id in range(1, 11):
+        order_service._store_order(make_order(order_id, datetime(2024, 11, 3)))
+    order_service.freeze_closed_segments()
+
+    for order_id in range(1, 11):
+        assert order_service.update_order_status(order_id, OrderStatus.CANCELLED).status == OrderStatus.CANCELLED
+    assert not order_service.segments[(2024, 11)].frozen
+    assert order_service.get_order(1).status == OrderStatus.CANCELLED
+
+    order_service._freeze_if_due(datetime.now() + order_service.refreeze_delay)
+    assert order_service.segments[(2024, 11)].frozen
+    assert order_service.get_order(10).status == OrderStatus.CANCELLED
+
+
+def test_closed_segments_are_frozen_when_the_month_changes(order_service):
+    """Months closed since the last freeze are frozen by the first write of the next month."""
+    order_service._store_order(make_order(1, datetime(2024, 11, 3), status=OrderStatus.PENDING))
+    order_service.update_order_status(1, OrderStatus.CONFIRMED)
+    order_service.track_order("user_1", "publisher_9", "1", 10.0)
+    assert not order_service.segments[(2024, 11)].frozen
+
+    order_service._freeze_if_due(datetime.now() + timedelta(days=31))
+    assert order_service.segments[(2024, 11)].frozen
+
+
+def test_closed_sample_months_are_frozen_at_startup():
+    """Past months already closed when the service starts are frozen right away."""
+    service = OrderService(MagicMock(spec=ApplicationService),
+                           publisher_filter=lambda publisher_id: publisher_id == "publisher_1")
+
+    assert all(segment.frozen for segment in service.segments.values())
+
+
+def test_date_range_prunes_frozen_segments(order_service, monkeypatch):
+    """Frozen segments outside the date range are never decompressed."""
+    order_service._store_order(make_order(1, datetime(2024, 11, 3)))
+    order_service.freeze_closed_segments()
+
+    load = MagicMock(side_effect=AssertionError("segment decompressed"))
+    monkeypatch.setattr(order_service.segments[(2024, 11)], "_load_columns", load)
+
+    assert order_service.get_orders_for_publisher("publisher_9", from_date=datetime(2025, 1, 1)) == []
+
+
+def test_warm_start_keeps_open_segments_hot(order_service):
+    """The pre-fork warm start only freezes closed months; months with pending orders stay hot."""
+    order_service._store_order(make_order(1, datetime(2024, 10, 3), status=OrderStatus.CONFIRMED))
+    order_service._store_order(make_order(2, datetime(2024, 11, 3), status=OrderStatus.PENDING))
+    order_service._store_order(make_order(3, datetime.now(), status=OrderStatus.CONFIRMED))
+    services = MagicMock()
+    services.order_service = order_service
+
+    try:
+        warm_start(services)
+    finally:
+        gc.unfreeze()
+
+    assert order_service.segments[(2024, 10)].frozen
+    assert not order_service.segments[(2024, 11)].frozen
+    assert not order_service.segments[segment_key(datetime.now())].frozen
+    assert order_service.orders[2].status == OrderStatus.PENDING
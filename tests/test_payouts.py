@@ -0,0 +1,164 @@
+import csv
+import json
+from datetime import datetime
+from unittest.mock import MagicMock
+import pytest
+from app.models import Order, OrderStatus
+from app.services.application_service import ApplicationService
+from app.services.order_segments import segment_bounds, segment_key
+from app.services.order_service import OrderService
+from app.services.payout_service import PayoutService
+
+PERIOD = (datetime(2024, 11, 1), datetime(2024, 12, 1))
+
+
+@pytest.fixture
+def order_service():
+    """OrderService holding orders of November 2024 for two publishers."""
+    application_service = MagicMock(spec=ApplicationService)
+    service = OrderService(application_service)
+    orders = [
+        # (publisher, advertiser, status, amount, order date, validation date, closing date)
+        ("publisher_a", "user_1", OrderStatus.CONFIRMED, 100.0, datetime(2024, 11, 2), datetime(2024, 11, 2), None),
+        ("publisher_a", "user_1", OrderStatus.CONFIRMED, 50.0, datetime(2024, 11, 3), datetime(2024, 11, 3), None),
+        # Confirmed then cancelled within the month: never paid, so nothing to claw back
+        ("publisher_a", "user_1", OrderStatus.CANCELLED, 40.0, datetime(2024, 11, 4), datetime(2024, 11, 4),
+         datetime(2024, 11, 20)),
+        ("publisher_a", "user_2", OrderStatus.REJECTED, 20.0, datetime(2024, 11, 5), None, datetime(2024, 11, 6)),
+        ("publisher_b", "user_1", OrderStatus.CONFIRMED, 10.0, datetime(2024, 11, 30, 23), datetime(2024, 11, 30),
+         None),
+        ("publisher_b", "user_1", OrderStatus.PENDING, 10.0, datetime(2024, 11, 6), None, None),
+        ("publisher_b", "user_1", OrderStatus.CONFIRMED, 999.0, datetime(2024, 12, 1), datetime(2024, 12, 1), None),
+        # Paid by the October statement and cancelled in November: clawed back
+        ("publisher_a", "user_1", OrderStatus.CANCELLED, 40.0, datetime(2024, 10, 10), datetime(2024, 10, 15),
+         datetime(2024, 11, 10)),
+        # Confirmed after October's statement, so never paid
+        ("publisher_a", "user_1", OrderStatus.CANCELLED, 60.0, datetime(2024, 10, 20), datetime(2024, 11, 2),
+         datetime(2024, 11, 12)),
+        # Clawed back by the October statement already
+        ("publisher_a", "user_1", OrderStatus.CANCELLED, 80.0, datetime(2024, 9, 5), datetime(2024, 9, 6),
+         datetime(2024, 10, 1)),
+    ]
+    for index, (publisher_id, advertiser_id, status, amount, order_date, validation_date,
+                closing_date) in enumerate(orders):
+        service._store_order(Order(
+            id=service.id_generator.next_id(at=order_date), advertiser_id=advertiser_id,
+            publisher_id=publisher_id, user_id=str(index), amount=amount, commission=amount * 0.05,
+            status=status, order_date=order_date, validation_date=validation_date, closing_date=closing_date
+        ))
+    return service
+
+
+def read_statements(output_dir, payouts, statement_format='ndjson'):
+    statements = []
+    for partition in range(payouts.partitions):
+        with open(payouts.statement_path(str(output_dir), partition, statement_format)) as statement_file:
+            if statement_format == 'ndjson':
+                statements.extend(json.loads(line) for line in statement_file)
+            else:
+                statements.extend(csv.DictReader(statement_file))
+    return sorted(statements, key=lambda statement: (statement["publisher_id"], statement.get("advertiser_id", "")))
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_statements_aggregate_per_publisher_and_advertiser(order_service, tmp_path, workers):
+    """Confirmed commissions and clawbacks are totalled per advertiser, in-process or on a pool."""
+    payouts = PayoutService(order_service, workers=workers, partitions=3, chunk_size=2)
+    summary = payouts.generate_statements(*PERIOD, str(tmp_path))
+
+    assert summary == {"orders": 6, "statements": 2, "files_written": 3, "partitions_skipped": 0}
+    publisher_a, publisher_b = read_statements(tmp_path, payouts)
+    assert [(line["advertiser_id"], line["confirmed_orders"], line["commission"], line["cancelled_orders"],
+             line["rejected_orders"], line["adjustments"]) for line in publisher_a["advertisers"]] == [
+        ("user_1", 2, 7.5, 1, 0, -2.0), ("user_2", 0, 0.0, 0, 1, 0.0)
+    ]
+    assert publisher_a["net_commission"] == 5.5
+    assert publisher_b["advertisers"][0]["confirmed_amount"] == 10.0
+
+
+def test_order_cancelled_in_its_month_is_not_clawed_back(tmp_path):
+    """An order confirmed then cancelled before its statement counts as cancelled, without adjustment."""
+    service = OrderService(MagicMock(spec=ApplicationService))
+    order = service.track_order("user_1", "publisher_c", "1", 100.0)
+    service.update_order_status(order.id, OrderStatus.CONFIRMED)
+    service.update_order_status(order.id, OrderStatus.CANCELLED)
+
+    period = segment_bounds(segment_key(order.order_date))
+    payouts = PayoutService(service, workers=0, partitions=1)
+    payouts.generate_statements(*period, str(tmp_path), now=period[1])
+
+    statement = next(line for line in read_statements(tmp_path, payouts) if line["publisher_id"] == "publisher_c")
+    assert [(line["confirmed_orders"], line["cancelled_orders"], line["adjustments"])
+            for line in statement["advertisers"]] == [(0, 1, 0.0)]
+    assert statement["net_commission"] == 0.0
+
+
+def statement_lines(service, period, output_dir):
+    """Generates the statements of a period for one order and returns its advertiser lines."""
+    payouts = PayoutService(service, workers=0, partitions=1)
+    payouts.generate_statements(*period, str(output_dir))
+    return [(line["confirmed_orders"], line["commission"], line["cancelled_orders"], line["adjustments"])
+            for statement in read_statements(output_dir, payouts) for line in statement["advertisers"]]
+
+
+def store_order(validation_date, closing_date, status):
+    """OrderService holding one October 2024 order with a 5.00 commission."""
+    service = OrderService(MagicMock(spec=ApplicationService))
+    order_date = datetime(2024, 10, 10)
+    service._store_order(Order(
+        id=service.id_generator.next_id(at=order_date), advertiser_id="user_1", publisher_id="publisher_a",
+        user_id="1", amount=100.0, commission=5.0, status=status, order_date=order_date,
+        validation_date=validation_date, closing_date=closing_date
+    ))
+    return service
+
+
+def test_statement_evaluates_orders_as_of_period_end(tmp_path):
+    """An order cancelled after its month ended is paid by that month's statement, even generated later."""
+    service = store_order(datetime(2024, 10, 15), datetime(2024, 11, 3), OrderStatus.CANCELLED)
+
+    assert statement_lines(service, (datetime(2024, 10, 1), datetime(2024, 11, 1)), tmp_path / "october") == [
+        (1, 5.0, 0, 0.0)]
+    assert statement_lines(service, PERIOD, tmp_path / "november") == [(0, 0.0, 0, -5.0)]
+
+
+def test_order_confirmed_late_is_paid_when_confirmed(tmp_path):
+    """An order still pending at its month's end is paid by the statement of the month it was confirmed in."""
+    service = store_order(datetime(2024, 11, 5), None, OrderStatus.CONFIRMED)
+
+    assert statement_lines(service, (datetime(2024, 10, 1), datetime(2024, 11, 1)), tmp_path / "october") == []
+    assert statement_lines(service, PERIOD, tmp_path / "november") == [(1, 5.0, 0, 0.0)]
+
+
+def test_csv_statements(order_service, tmp_path):
+    """CSV statements have one row per publisher and advertiser."""
+    payouts = PayoutService(order_service, workers=0, partitions=2)
+    payouts.generate_statements(*PERIOD, str(tmp_path), statement_format='csv')
+
+    rows = read_statements(tmp_path, payouts, 'csv')
+    assert [(row["publisher_id"], row["advertiser_id"], row["net_commission"]) for row in rows] == [
+        ("publisher_a", "user_1", "5.5"), ("publisher_a", "user_2", "0.0"), ("publisher_b", "user_1", "0.5")
+    ]
+
+
+def test_rerun_resumes_from_checkpoint(order_service, tmp_path):
+    """Partitions already written are skipped; another job can't reuse the directory."""
+    payouts = PayoutService(order_service, workers=0, partitions=4)
+    payouts.generate_statements(*PERIOD, str(tmp_path))
+    checkpoint = json.loads((tmp_path / "checkpoint.json").read_text())
+    checkpoint["completed"] = [0, 1]
+    (tmp_path / "checkpoint.json").write_text(json.dumps(checkpoint))
+
+    summary = payouts.generate_statements(*PERIOD, str(tmp_path))
+    assert (summary["files_written"], summary["partitions_skipped"]) == (2, 2)
+    assert len(read_statements(tmp_path, payouts)) == 2
+
+    with pytest.raises(ValueError):
+        payouts.generate_statements(*PERIOD, str(tmp_path), statement_format='csv')
+
+
+def test_open_period_is_rejected(order_service, tmp_path):
+    """Statements are only generated once the period has ended."""
+    with pytest.raises(ValueError):
+        PayoutService(order_service, workers=0).generate_statements(*PERIOD, str(tmp_path),
+                                                                     now=datetime(2024, 11, 20))
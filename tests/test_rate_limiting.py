@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+import pytest
+from app import create_app
+from app.utils.rate_limiting import LoadShedder, TokenBucketLimiter
+
+
+def test_token_bucket_allows_burst_then_limits():
+    """A bucket accepts `burst` requests at once, then asks to wait."""
+    limiter = TokenBucketLimiter(rate=1.0, burst=3)
+
+    assert [limiter.acquire("publisher_1", now=100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    retry_after = limiter.acquire("publisher_1", now=100.0)
+    assert retry_after == pytest.approx(1.0)
+
+    assert limiter.acquire("publisher_1", now=101.0) == 0.0
+
+
+def test_token_bucket_keys_are_independent():
+    """One publisher exhausting its bucket doesn't affect the others."""
+    limiter = TokenBucketLimiter(rate=1.0, burst=1)
+
+    assert limiter.acquire("publisher_1", now=0.0) == 0.0
+    assert limiter.acquire("publisher_1", now=0.0) > 0
+    assert limiter.acquire("publisher_2", now=0.0) == 0.0
+
+
+def test_token_bucket_purges_full_buckets():
+    """Refilled buckets are dropped once too many keys are tracked."""
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, max_keys=10)
+    for i in range(10):
+        limiter.acquire(f"publisher_{i}", now=0.0)
+    limiter.acquire("publisher_late", now=50.0)
+
+    assert len(limiter._buckets) == 1
+
+
+class _YieldingBuckets(dict):
+    """Bucket dict yielding to other threads between the read and the write of a bucket."""
+
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        time.sleep(0)
+        return value
+
+
+def test_token_bucket_is_thread_safe():
+    """Concurrent requests of one publisher can't take more than the burst."""
+    limiter = TokenBucketLimiter(rate=1.0, burst=20)
+    limiter._buckets = _YieldingBuckets()
+    barrier = threading.Barrier(8)
+    allowed = []
+
+    def send_requests():
+        barrier.wait()
+        allowed.append(sum(limiter.acquire("publisher_1", now=0.0) == 0.0 for _ in range(50)))
+
+    threads = [threading.Thread(target=send_requests) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(allowed) == 20
+
+
+def test_load_shedder_rejects_above_threshold():
+    """Requests beyond max_in_flight are shed until a slot is released."""
+    shedder = LoadShedder(max_in_flight=1)
+
+    assert shedder.enter()
+    assert not shedder.enter()
+    shedder.exit()
+    assert shedder.enter()
+
+
+def test_track_order_returns_429_with_retry_after():
+    """A publisher flooding the endpoint gets 429 with Retry-After."""
+    app = create_app({
+        'TESTING': True,
+        'RATE_LIMITS': {'api_membership.track_order': {'rate': 0.1, 'burst': 1}},
+    })
+    client = app.test_client()
+    payload = {"advertiser_id": "user_1", "publisher_id": "publisher_1", "user_id": "1", "amount": 10}
+
+    assert client.post('/api_membership/orders/track', json=payload).status_code == 201
+
+    response = client.post('/api_membership/orders/track', json=payload)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert not json.loads(response.data)['success']
+
+
+def test_load_shedding_returns_503():
+    """Requests are shed with 503 when too many are in flight."""
+    app = create_app({'TESTING': True, 'MAX_IN_FLIGHT': 0})
+
+    response = app.test_client().get('/api_membership/advertisers')
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
@@ -0,0 +1,134 @@
+import json
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from app.models import Order, OrderStatus
+from app.services.application_service import ApplicationService
+from app.services.order_service import OrderService
+from app.services.report_service import ReportService
+from app.services.tracking_index import OTHER_VALUE, TrackingParamIndex
+
+
+def make_order(order_id, tracking_params, publisher_id="publisher_9", amount=100.0,
+               status=OrderStatus.PENDING, order_date=None):
+    """Builds an order with tracking parameters."""
+    return Order(id=order_id, advertiser_id="user_1", publisher_id=publisher_id, user_id="1", amount=amount,
+                 commission=amount * 0.05, status=status, order_date=order_date or datetime(2025, 3, 1),
+                 tracking_params=tracking_params)
+
+
+@pytest.fixture
+def order_service():
+    """Initializes an OrderService whose publishers always have access."""
+    application_service = MagicMock(spec=ApplicationService)
+    application_service.check_publisher_access.return_value = True
+    return OrderService(application_service)
+
+
+def test_index_lookup_and_match():
+    """Postings are kept per publisher and intersected across filters."""
+    index = TrackingParamIndex()
+    index.add(make_order(1, {"campaign": "spring", "source": "mobile"}))
+    index.add(make_order(2, {"campaign": "spring", "source": "web"}))
+    index.add(make_order(3, {"campaign": "spring"}, publisher_id="publisher_8"))
+
+    assert list(index.lookup("publisher_9", "campaign", "spring")) == [1, 2]
+    assert index.match("publisher_9", [("campaign", "spring"), ("source", "web")]) == {2}
+    assert index.match("publisher_9", []) is None
+    assert index.lookup("publisher_9", "campaign", "winter") == []
+
+
+def test_index_cardinality_limits():
+    """High-cardinality params collapse into __other__ and extra keys are dropped."""
+    index = TrackingParamIndex(max_keys_per_publisher=1, max_values_per_key=2)
+    for i in range(5):
+        index.add(make_order(i, {"click_id": f"click-{i}", "junk": "x"}))
+
+    groups = dict(index.groups("publisher_9", "click_id"))
+    assert list(groups[OTHER_VALUE]) == [2, 3, 4]
+    assert index.overflowed_values == 3
+    assert index.dropped_keys == 5
+    assert index.lookup("publisher_9", "junk", "x") == []
+
+
+def test_index_key_budget_is_per_publisher():
+    """One publisher's junk keys don't stop other publishers' or campaign keys from being indexed."""
+    index = TrackingParamIndex(max_keys_per_publisher=2)
+    index.add(make_order(1, {f"junk_{i}": "x" for i in range(10)}, publisher_id="publisher_8"))
+    index.add(make_order(2, {"campaign": "spring", "junk_9": "x"}, publisher_id="publisher_8"))
+    index.add(make_order(3, {"campaign": "spring", "source": "web", "click_id": "c"}))
+
+    assert list(index.lookup("publisher_8", "campaign", "spring")) == [2]
+    assert index.lookup("publisher_8", "junk_9", "x") == []
+    assert index.match("publisher_9", [("campaign", "spring"), ("source", "web"), ("click_id", "c")]) == {3}
+    assert index.dropped_keys == 9
+
+
+def test_index_value_budget_is_per_publisher():
+    """One publisher's high-cardinality values don't push other publishers' values into __other__."""
+    index = TrackingParamIndex(max_values_per_key=2)
+    for i in range(5):
+        index.add(make_order(i, {"campaign": f"click-{i}"}, publisher_id="publisher_8"))
+    index.add(make_order(5, {"campaign": "spring"}))
+    index.add(make_order(6, {"campaign": "click-0"}))
+    index.add(make_order(7, {"campaign": "spring"}))
+
+    assert dict(index.groups("publisher_8", "campaign"))[OTHER_VALUE].tolist() == [2, 3, 4]
+    assert list(index.lookup("publisher_9", "campaign", "spring")) == [5, 7]
+    assert list(index.lookup("publisher_9", "campaign", "click-0")) == [6]
+    assert index.overflowed_values == 3
+
+
+def test_index_rejects_non_string_values():
+    """Non-string values aren't indexed, so 1 and "1" don't collide."""
+    index = TrackingParamIndex()
+    index.add(make_order(1, {"campaign": 1, "source": {"a": "b"}}))
+    index.add(make_order(2, {"campaign": "1"}))
+
+    assert list(index.lookup("publisher_9", "campaign", "1")) == [2]
+    assert index.lookup("publisher_9", "source", "{'a': 'b'}") == []
+    assert index.rejected_params == 2
+
+
+def test_campaign_report_groups_and_filters(order_service):
+    """The report aggregates per campaign and skips cancelled orders."""
+    for order in [
+        make_order(1, {"campaign": "spring", "source": "mobile"}, amount=100.0, status=OrderStatus.CONFIRMED),
+        make_order(2, {"campaign": "spring", "source": "web"}, amount=50.0),
+        make_order(3, {"campaign": "winter", "source": "mobile"}, amount=300.0),
+        make_order(4, {"campaign": "winter"}, amount=10.0, status=OrderStatus.CANCELLED),
+    ]:
+        order_service._store_order(order)
+    report_service = ReportService(order_service)
+
+    report = report_service.get_campaign_report("publisher_9")
+    assert [(row["value"], row["orders"], row["commission"]) for row in report] == \
+        [("winter", 1, 15.0), ("spring", 2, 7.5)]
+    assert report[1]["confirmed_commission"] == 5.0
+
+    report = report_service.get_campaign_report("publisher_9", filters=[("source", "mobile")])
+    assert [(row["value"], row["amount"]) for row in report] == [("winter", 300.0), ("spring", 100.0)]
+
+
+def test_campaign_report_reads_frozen_segments(order_service):
+    """Orders of frozen months are read back for the report."""
+    order_service._store_order(make_order(1, {"campaign": "autumn"}, status=OrderStatus.CONFIRMED,
+                                          order_date=datetime(2024, 10, 2)))
+    order_service.freeze_closed_segments()
+
+    report = ReportService(order_service).get_campaign_report("publisher_9", from_date=datetime(2024, 10, 1))
+    assert [(row["value"], row["confirmed_commission"]) for row in report] == [("autumn", 5.0)]
+
+
+def test_get_campaign_report(client):
+    """Tests the campaign report endpoint."""
+    response = client.get('/api_membership/reports/campaigns?publisher_id=publisher_1')
+    data = json.loads(response.data)
+    assert response.status_code == 200
+    assert data['data'][0]['value'] == "summer_sale"
+
+    response = client.get('/api_membership/reports/campaigns?publisher_id=publisher_1&filter=campaign')
+    assert response.status_code == 400
+
+    response = client.get('/api_membership/reports/campaigns')
+    assert response.status_code == 400
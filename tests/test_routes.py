@@ -90,3 +90,17 @@ def test_apply_to_advertiser(client):
         'advertiser_id': "user_2"
     })
     assert response.status_code == 201
+
+def test_track_order_replay_with_idempotency_key(client):
+    """Replays of a tracked order return the original order."""
+    payload = {"advertiser_id": "user_1", "publisher_id": "publisher_1", "user_id": "1", "amount": 20}
+    headers = {"Idempotency-Key": "postback-1"}
+
+    response = client.post('/api_membership/orders/track', json=payload, headers=headers)
+    assert response.status_code == 201
+    order_id = json.loads(response.data)['data']['id']
+
+    response = client.post('/api_membership/orders/track', json=payload, headers=headers)
+    data = json.loads(response.data)
+    assert response.status_code == 200
+    assert data['data']['id'] == order_id
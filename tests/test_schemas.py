@@ -0,0 +1,74 @@
+import json
+from datetime import datetime
+import pytest
+from pydantic import ValidationError
+from app.api.schemas import MAX_ORDER_AMOUNT, MAX_TRACKING_PARAMS, CampaignReportQuery, OrdersQuery, TrackOrderBody
+
+
+def test_track_order_body_coerces_types():
+    """Numbers are accepted for IDs and numeric strings for the amount."""
+    body = TrackOrderBody.model_validate_json(
+        '{"advertiser_id": "user_1", "publisher_id": "publisher_1", "user_id": 42, "amount": "19.90"}')
+    assert body.user_id == "42"
+    assert body.amount == 19.9
+    assert body.tracking_params is None
+
+    with pytest.raises(ValidationError):
+        TrackOrderBody.model_validate({"advertiser_id": "user_1", "publisher_id": "p", "user_id": "1", "amount": 0})
+
+
+@pytest.mark.parametrize("amount", ['"inf"', '"NaN"', "1e400", "Infinity", "NaN", str(MAX_ORDER_AMOUNT * 10)])
+def test_track_order_amount_is_finite_and_bounded(amount):
+    """Infinite, NaN and huge amounts are rejected, so they never reach a response or the fraud windows."""
+    with pytest.raises(ValidationError):
+        TrackOrderBody.model_validate_json(
+            '{"advertiser_id": "user_1", "publisher_id": "p", "user_id": "1", "amount": %s}' % amount)
+
+
+@pytest.mark.parametrize("tracking_params", [
+    {"campaign": 1},
+    {"campaign": {"name": "spring"}},
+    {"campaign": ["spring"]},
+    {f"key_{i}": "value" for i in range(MAX_TRACKING_PARAMS + 1)},
+    {"campaign": "x" * 257},
+])
+def test_tracking_params_must_be_bounded_strings(tracking_params):
+    """Tracking parameters are a bounded mapping of strings; numbers and nested values are rejected."""
+    body = {"advertiser_id": "user_1", "publisher_id": "p", "user_id": "1", "amount": 10,
+            "tracking_params": {"campaign": "spring"}}
+    assert TrackOrderBody.model_validate(body).tracking_params == {"campaign": "spring"}
+
+    with pytest.raises(ValidationError):
+        TrackOrderBody.model_validate_json(json.dumps({**body, "tracking_params": tracking_params}))
+
+
+def test_query_dates_are_naive():
+    """Dates with an offset are converted to naive local time, comparable with order dates."""
+    query = OrdersQuery.model_validate({"publisher_id": "p", "from_date": "2025-01-01",
+                                        "to_date": "2025-02-01T00:00:00+00:00"})
+    assert query.from_date == datetime(2025, 1, 1)
+    assert query.to_date.tzinfo is None
+
+    report_query = CampaignReportQuery.model_validate({"publisher_id": "p", "filter": ["source:mobile"]})
+    assert report_query.filters == [("source", "mobile")]
+    assert report_query.group_by == "campaign"
+
+
+def test_structured_validation_errors(client):
+    """Invalid requests get a 400 listing every invalid field."""
+    response = client.post('/api_membership/orders/track', json={"advertiser_id": "user_1", "amount": "abc"})
+    data = json.loads(response.data)
+
+    assert response.status_code == 400
+    assert data['success'] is False
+    assert data['message'] == "Publisher ID and User ID are required"
+    assert {error['field'] for error in data['errors']} == {"publisher_id", "user_id", "amount"}
+
+    response = client.get('/api_membership/reports/campaigns?publisher_id=p&filter=source')
+    assert json.loads(response.data)['message'] == "Invalid filter format (key:value required)"
+
+    response = client.post('/api_membership/orders/track', data="{", content_type='application/json')
+    assert json.loads(response.data)['message'] == "Invalid JSON data"
+
+    response = client.post('/api_membership/orders/track')
+    assert json.loads(response.data)['message'] == "JSON data required"
@@ -0,0 +1,119 @@
+import threading
+import time
+from datetime import datetime
+import pytest
+from app import create_app
+from app.models import ApplicationStatus, OrderStatus
+from app.services.leaderboard_service import period_of
+from app.services.sharding import CALL_TIMEOUT, ShardRouter, _WriteGate, shard_for
+
+
+@pytest.fixture(scope='module')
+def sharded_app():
+    """App whose orders and applications live in two shard processes."""
+    app = create_app({'TESTING': True, 'DEBUG': False, 'ORDER_SHARDS': 2, 'SHARD_ID': 0})
+    yield app
+    services = app.extensions['api_membership']
+    if services.is_built('shard_router'):
+        services.shard_router.close()
+
+
+def test_shard_for_is_stable_and_spread():
+    """Publishers hash to a fixed shard and are spread over every shard."""
+    assert shard_for("publisher_1", 4) == shard_for("publisher_1", 4)
+    assert {shard_for(f"publisher_{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_orders_are_routed_to_the_publisher_shard(sharded_app):
+    """Orders are tracked and read through the owning shard, and their ID points at it."""
+    client = sharded_app.test_client()
+    services = sharded_app.extensions['api_membership']
+    router = services.shard_router
+
+    response = client.post('/api_membership/orders/track', json={
+        'advertiser_id': 'user_1', 'publisher_id': 'publisher_1', 'user_id': '42', 'amount': 10
+    })
+    assert response.status_code == 201
+    order_id = int(response.get_json()['data']['id'])
+    assert router.for_id(order_id) is router.for_publisher("publisher_1")
+
+    response = client.get('/api_membership/orders', query_string={'publisher_id': 'publisher_1'})
+    assert order_id in [int(order['id']) for order in response.get_json()['data']]
+
+    order = services.order_service.update_order_status(order_id, OrderStatus.CONFIRMED)
+    assert order.status == OrderStatus.CONFIRMED
+    assert services.order_service.get_order(order_id).status == OrderStatus.CONFIRMED
+
+    # The shard's events reach the local change log
+    events, _, _ = services.event_log.read(0, "publisher_1")
+    assert [(event.type, event.entity_id) for event in events[-2:]] == [
+        ("order.tracked", order_id), ("order.status_changed", order_id)
+    ]
+
+
+def test_applications_are_routed_to_the_publisher_shard(sharded_app):
+    """A publisher approved on its shard can track orders for the advertiser."""
+    services = sharded_app.extensions['api_membership']
+    success, _, application = services.application_service.apply_to_advertiser("publisher_9", "user_2")
+    assert success
+    services.application_service.update_application_status(application.id, ApplicationStatus.APPROVED)
+    assert services.application_service.check_publisher_access("publisher_9", "user_2")
+
+    order = services.order_service.track_order("user_2", "publisher_9", "7", 20.0)
+    assert order.publisher_id == "publisher_9"
+
+
+def test_global_queries_merge_every_shard(sharded_app):
+    """Scattered queries return the orders of all shards, sorted by date, without duplicates."""
+    services = sharded_app.extensions['api_membership']
+    orders = list(services.order_service.iter_orders())
+
+    assert {"publisher_1", "publisher_2"} <= {order.publisher_id for order in orders}
+    assert len({order.id for order in orders}) == len(orders)
+    assert orders == sorted(orders, key=lambda order: (order.order_date, order.id))
+    assert services.fraud_service.get_metrics()['inspected'] >= 1
+
+
+def test_write_gate_holds_writes():
+    """Holding the gate waits for running writes and blocks new ones until released."""
+    gate = _WriteGate()
+    entered = threading.Event()
+
+    def write():
+        with gate.write():
+            entered.set()
+
+    with gate.hold():
+        writer = threading.Thread(target=write)
+        writer.start()
+        assert not entered.wait(0.1)
+    assert entered.wait(5)
+    writer.join()
+
+
+def test_leaderboards_follow_sharded_orders(sharded_app):
+    """Leaderboards attach to the sharded order service and rank its confirmed orders."""
+    services = sharded_app.extensions['api_membership']
+    order = services.order_service.track_order("user_1", "publisher_1", "5", 4000.0)
+    leaderboards = services.leaderboard_service
+
+    services.order_service.update_order_status(order.id, OrderStatus.CONFIRMED)
+    rows = leaderboards.get_leaderboard('advertiser', "user_1", period_of(datetime.now()))
+    assert rows[0]["publisher_id"] == "publisher_1"
+
+
+def test_calls_to_a_dead_shard_fail_fast():
+    """Once a shard process dies, its pending and new calls fail instead of waiting for the timeout."""
+    router = ShardRouter(1)
+    try:
+        shard = router.shards[0]
+        assert router.call(shard, 'order_service', 'freeze_closed_segments') == 0
+
+        shard.process.kill()
+        shard.process.join(5)
+        started = time.perf_counter()
+        with pytest.raises(RuntimeError):
+            router.call(shard, 'order_service', 'freeze_closed_segments')
+        assert time.perf_counter() - started < CALL_TIMEOUT / 10
+    finally:
+        router.close()
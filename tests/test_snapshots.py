@@ -0,0 +1,108 @@
+import threading
+from datetime import datetime
+from unittest.mock import MagicMock
+import pytest
+from app.models import Order, OrderStatus
+from app.services.advertiser_service import AdvertiserService
+from app.services.application_service import ApplicationService
+from app.services.order_service import OrderService
+
+
+@pytest.fixture
+def order_service(tmp_path):
+    """OrderService granting every access, with frozen segments on disk."""
+    application_service = MagicMock(spec=ApplicationService)
+    application_service.check_publisher_access.return_value = True
+    return OrderService(application_service, cold_storage_dir=str(tmp_path))
+
+
+def make_order(order_id, order_date, status=OrderStatus.PENDING):
+    return Order(id=order_id, advertiser_id="user_1", publisher_id="publisher_9", user_id="1", amount=100.0,
+                 commission=5.0, status=status, order_date=order_date)
+
+
+def test_pinned_snapshot_is_isolated_from_writes(order_service):
+    """A pinned reader sees neither new orders nor status changes made after it started."""
+    order = order_service.track_order("user_1", "publisher_9", "1", 10.0)
+
+    with order_service.snapshots.pin() as snapshot:
+        order_service.track_order("user_1", "publisher_9", "2", 20.0)
+        order_service.update_order_status(order.id, OrderStatus.CONFIRMED)
+
+        segment = snapshot.segments[max(snapshot.segments)]
+        pinned = list(segment.iter_publisher_orders("publisher_9", snapshot.version))
+        assert [(o.id, o.status) for o in pinned] == [(order.id, OrderStatus.PENDING)]
+
+    orders = order_service.get_orders_for_publisher("publisher_9")
+    assert [o.status for o in orders] == [OrderStatus.CONFIRMED, OrderStatus.PENDING]
+    # The order object handed out before the update was not mutated
+    assert order.status == OrderStatus.PENDING
+
+
+def test_old_versions_are_pruned_once_unpinned(order_service):
+    """Versions only pinned readers could see are dropped by the next update."""
+    order = order_service.track_order("user_1", "publisher_9", "1", 10.0)
+    with order_service.snapshots.pin():
+        order_service.update_order_status(order.id, OrderStatus.CONFIRMED)
+        order_service.update_order_status(order.id, OrderStatus.REJECTED)
+    order_service.update_order_status(order.id, OrderStatus.CANCELLED)
+
+    segment = order_service.segments[max(order_service.segments)]
+    head = segment.versions[order.id]
+    # Only the version of the snapshot being replaced is kept
+    assert [head.value.status, head.previous.value.status] == [OrderStatus.CANCELLED, OrderStatus.REJECTED]
+    assert head.previous.previous is None
+
+
+def test_replaced_segment_file_outlives_pinned_readers(order_service, tmp_path):
+    """Thawing a frozen segment keeps its file until no snapshot can read it."""
+    order_service._store_order(make_order(1, datetime(2024, 11, 3), status=OrderStatus.CONFIRMED))
+    order_service.freeze_closed_segments()
+
+    with order_service.snapshots.pin() as snapshot:
+        order_service.update_order_status(1, OrderStatus.CANCELLED)
+        assert [o.status for o in snapshot.segments[(2024, 11)].iter_orders()] == [OrderStatus.CONFIRMED]
+
+    order_service.track_order("user_1", "publisher_9", "2", 20.0)
+    assert list(tmp_path.iterdir()) == []
+    assert order_service.get_order(1).status == OrderStatus.CANCELLED
+
+    order_service.freeze_closed_segments()
+    assert [path.name for path in tmp_path.iterdir()] == ["orders-2024-11.seg"]
+
+
+def test_readers_run_concurrently_with_writers(order_service):
+    """Listings made while orders are tracked are consistent and never fail."""
+    errors, counts = [], []
+    done = threading.Event()
+
+    def read():
+        try:
+            while not done.is_set():
+                counts.append(len(order_service.get_orders_for_publisher("publisher_9")))
+        except Exception as error:
+            errors.append(error)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for i in range(2000):
+        order_service.track_order("user_1", "publisher_9", str(i), 10.0)
+    done.set()
+    for reader in readers:
+        reader.join()
+
+    assert not errors
+    assert len(order_service.get_orders_for_publisher("publisher_9")) == 2000
+
+
+def test_application_index_is_copy_on_write():
+    """Iterating a publisher's applications isn't affected by concurrent applications."""
+    application_service = ApplicationService(AdvertiserService())
+    applications = application_service.get_publisher_application("publisher_1")
+    first = next(applications)
+
+    application_service.apply_to_advertiser("publisher_1", "user_2")
+    assert list(applications) == []
+    assert len(list(application_service.get_publisher_application("publisher_1"))) == 2
+    assert first.advertiser_id == "user_1"
@@ -0,0 +1,66 @@
+import gc
+import subprocess
+import sys
+from datetime import datetime
+from app import create_app
+from app.services.order_segments import segment_key
+
+# Modules only needed once a request uses orders, payouts, shards or webhooks: importing the app must
+# not load them (checked by module rather than by wall-clock time, so the test doesn't depend on the machine)
+DEFERRED_MODULES = ('app.services.order_service', 'app.services.order_segments', 'app.services.payout_service',
+                    'app.services.sharding', 'app.services.webhook_dispatcher', 'app.services.fraud_service',
+                    'asyncio', 'multiprocessing')
+
+
+def run_python(code: str) -> str:
+    """Runs code in a fresh interpreter and returns its output."""
+    return subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+
+
+def test_import_defers_service_modules():
+    """Importing the app doesn't import the services or their heavy dependencies."""
+    output = run_python(
+        "import sys\n"
+        "import app\n"
+        f"print(' '.join(name for name in {DEFERRED_MODULES!r} if name in sys.modules))\n"
+    )
+
+    assert output.split() == []
+
+
+def test_services_are_created_lazily():
+    """create_app doesn't build services until a request needs them."""
+    app = create_app({'TESTING': True})
+    services = app.extensions['api_membership']
+
+    assert not services.is_built('order_service')
+    app.test_client().get('/api_membership/advertisers')
+    assert services.is_built('advertiser_service')
+    assert not services.is_built('order_service')
+
+
+def test_app_instances_are_isolated():
+    """Each app instance owns its own state."""
+    first, second = create_app({'TESTING': True}), create_app({'TESTING': True})
+    payload = {"publisher_id": "publisher_3", "advertiser_id": "user_3"}
+
+    assert first.test_client().post('/api_membership/applications', json=payload).status_code == 201
+    assert second.test_client().post('/api_membership/applications', json=payload).status_code == 201
+    assert first.test_client().post('/api_membership/applications', json=payload).status_code == 400
+
+
+def test_prefork_warm_start_builds_and_freezes_services():
+    """PREFORK builds every service and freezes closed past segments before forking."""
+    try:
+        app = create_app({'TESTING': True, 'PREFORK': True})
+        services = app.extensions['api_membership']
+
+        assert services.is_built('order_service') and services.is_built('leaderboard_service')
+        assert gc.get_freeze_count() > 0
+        assert all(segment.frozen == (key < segment_key(datetime.now()) and segment.is_closed())
+                   for key, segment in services.order_service.segments.items())
+    finally:
+        gc.unfreeze()
+
+    response = app.test_client().get('/api_membership/orders?publisher_id=publisher_1')
+    assert len(response.get_json()['data']) == 1
@@ -0,0 +1,218 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app import create_app
+from app.services.event_log import EventLog
+from app.services.webhook_dispatcher import WebhookDispatcher
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Records the POSTed batches and answers with the server's status code."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.batches.append(json.loads(body)['events'])
+        self.server.connections.add(self.client_address)
+        self.send_response(self.server.status_code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """Starts a local HTTP server standing for a publisher's webhook."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.batches = []
+    server.connections = set()
+    server.status_code = 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def dispatcher():
+    """Initializes a dispatcher with short delays."""
+    # The stub servers listen on loopback
+    dispatcher = WebhookDispatcher(batch_size=10, batch_interval=0.01, max_retries=2, backoff_base=0.01,
+                                   allow_private=True)
+    yield dispatcher
+    dispatcher.stop()
+
+
+def track(event_log, publisher_id="publisher_1", count=1):
+    for i in range(count):
+        event_log.append("order.tracked", publisher_id, "user_1", i, "pending", data={"amount": 10.0})
+
+
+def test_events_are_delivered_in_batches(stub_server, dispatcher):
+    """Order events reach the webhook in batches over a reused connection."""
+    event_log = EventLog()
+    event_log.subscribe(dispatcher.handle_event)
+    dispatcher.register("publisher_1", f"http://127.0.0.1:{stub_server.server_port}/hook")
+
+    track(event_log, count=25)
+    track(event_log, publisher_id="publisher_2")
+    event_log.append("application.created", "publisher_1", "user_1", "app-1", "pending")
+
+    assert dispatcher.flush()
+    events = [event for batch in stub_server.batches for event in batch]
+    assert [event['entity_id'] for event in events] == [str(i) for i in range(25)]
+    assert len(stub_server.batches) < 25
+    assert len(stub_server.connections) == 1
+    assert dispatcher.stats["delivered"] == 25
+
+
+def test_failed_batches_are_retried_then_dead_lettered(stub_server, dispatcher):
+    """A failing destination gets retries, then the batch is dead-lettered."""
+    stub_server.status_code = 500
+    event_log = EventLog()
+    event_log.subscribe(dispatcher.handle_event)
+    dispatcher.register("publisher_1", f"http://127.0.0.1:{stub_server.server_port}/hook")
+
+    track(event_log, count=3)
+
+    assert dispatcher.flush()
+    assert len(stub_server.batches) == 3
+    assert dispatcher.stats["retries"] == 2
+    assert dispatcher.dead_letters[0]["error"] == "HTTP 500"
+    assert len(dispatcher.dead_letters[0]["events"]) == 3
+
+
+def test_register_rejects_invalid_urls(dispatcher):
+    """Only http(s) URLs can be registered."""
+    with pytest.raises(ValueError):
+        dispatcher.register("publisher_1", "ftp://example.com")
+
+
+@pytest.mark.parametrize("url", ["http://127.0.0.1:8080/hook", "http://localhost/hook", "http://10.0.0.5/hook",
+                                 "http://192.168.1.1/hook", "http://169.254.169.254/latest/meta-data",
+                                 "http://[::1]/hook", "http://[::ffff:10.0.0.1]/hook", "http://0.0.0.0/hook"])
+def test_register_rejects_internal_addresses(url):
+    """Webhooks can't target loopback, private, link-local or reserved addresses."""
+    dispatcher = WebhookDispatcher()
+    with pytest.raises(ValueError, match="public address"):
+        dispatcher.register("publisher_1", url)
+    assert dispatcher.subscriptions == {}
+
+
+def test_destination_closing_mid_response_is_retried(dispatcher):
+    """A response cut short is retried, and later batches are still delivered."""
+    class ClosingHandler(StubHandler):
+        def do_POST(self):
+            if self.server.cut_responses:
+                self.server.cut_responses -= 1
+                self.rfile.read(int(self.headers['Content-Length']))
+                self.wfile.write(b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\npartial")
+                self.close_connection = True
+                return
+            super().do_POST()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ClosingHandler)
+    server.batches, server.connections, server.status_code, server.cut_responses = [], set(), 200, 1
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        event_log = EventLog()
+        event_log.subscribe(dispatcher.handle_event)
+        dispatcher.register("publisher_1", f"http://127.0.0.1:{server.server_port}/hook")
+
+        track(event_log, count=3)
+        assert dispatcher.flush()
+        server.cut_responses = 3
+        track(event_log, count=2)
+        assert dispatcher.flush()
+        track(event_log, count=1)
+        assert dispatcher.flush()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert dispatcher.stats["retries"] == 3
+    assert dispatcher.dead_letters[0]["error"].startswith("IncompleteReadError")
+    assert dispatcher.stats["delivered"] == 4
+
+
+class NoContentHandler(StubHandler):
+    """Acknowledges batches with a keep-alive 204 without Content-Length."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.batches.append(json.loads(body)['events'])
+        self.server.connections.add(self.client_address)
+        self.send_response(204)
+        self.end_headers()
+
+
+class ChunkedHandler(StubHandler):
+    """Acknowledges batches with a chunked body after an interim 100 Continue."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.batches.append(json.loads(body)['events'])
+        self.server.connections.add(self.client_address)
+        self.wfile.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        self.send_response(200)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self.wfile.write(b"3;ext=1\r\nok!\r\n2\r\n\r\n\r\n0\r\nX-Trailer: 1\r\n\r\n")
+
+
+@pytest.mark.parametrize("handler", [NoContentHandler, ChunkedHandler])
+def test_responses_without_content_length_keep_the_connection(dispatcher, handler):
+    """Bodyless and chunked acknowledgements are read to their end, without waiting for the timeout."""
+    dispatcher.timeout = 2.0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.batches, server.connections = [], set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        event_log = EventLog()
+        event_log.subscribe(dispatcher.handle_event)
+        dispatcher.register("publisher_1", f"http://127.0.0.1:{server.server_port}/hook")
+
+        track(event_log, count=3)
+        assert dispatcher.flush()
+        track(event_log, count=2)
+        assert dispatcher.flush()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert dispatcher.stats["delivered"] == 5
+    assert dispatcher.stats["retries"] == 0
+    assert len(server.batches) == 2
+    assert len(server.connections) == 1
+
+
+def test_track_order_pushes_webhook(stub_server):
+    """End to end: a tracked order is pushed to the registered webhook."""
+    app = create_app({'TESTING': True, 'PUBLISHER_API_KEYS': {'publisher_1': 'key-1', 'publisher_2': 'key-2'},
+                      'WEBHOOK_OPTIONS': {'allow_private': True}})
+    client = app.test_client()
+    headers = {'X-API-Key': 'key-1'}
+    try:
+        payload = {"publisher_id": "publisher_1", "url": f"http://127.0.0.1:{stub_server.server_port}/hook"}
+        assert client.post('/api_membership/webhooks', json=payload).status_code == 401
+        assert client.post('/api_membership/webhooks', json=payload,
+                           headers={'X-API-Key': 'key-2'}).status_code == 403
+        response = client.post('/api_membership/webhooks', json=payload, headers=headers)
+        assert response.status_code == 201
+
+        response = client.post('/api_membership/orders/track', json={
+            "advertiser_id": "user_1", "publisher_id": "publisher_1", "user_id": "1", "amount": 20})
+        order_id = json.loads(response.data)['data']['id']
+
+        assert app.extensions['api_membership'].webhook_dispatcher.flush()
+        assert stub_server.batches[0][0]['entity_id'] == order_id
+
+        response = client.get('/api_membership/webhooks/dead-letters?publisher_id=publisher_1', headers=headers)
+        assert json.loads(response.data)['data'] == []
+    finally:
+        app.extensions['api_membership'].webhook_dispatcher.stop()